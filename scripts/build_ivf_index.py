@@ -0,0 +1,114 @@
+"""Build the IVF retrieval index from MongoDB and report recall versus exact search."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+for path in (PROJECT_ROOT, SRC_ROOT):
+    str_path = str(path)
+    if str_path not in sys.path:
+        sys.path.insert(0, str_path)
+
+import numpy as np
+
+from sleep_assistant.config import load_environment
+from sleep_assistant.logging import configure_logging
+from sleep_assistant.services import IVFVectorStore, LocalVectorStore, create_mongodb_client
+from sleep_assistant.services.ivf_index import DEFAULT_NPROBE, resolve_index_path
+from sleep_assistant.services.vectorstore import load_vector_store_settings
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build an IVF-flat index over the knowledge-base vectors.")
+    parser.add_argument("--output", type=Path, help="Index directory (defaults to VECTOR_INDEX_PATH).")
+    parser.add_argument("--nlist", type=int, help="Number of k-means lists (defaults to 4 * sqrt(n)).")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE, help="Lists scanned per query.")
+    parser.add_argument("--iterations", type=int, default=20, help="k-means iterations.")
+    parser.add_argument("--report", action="store_true", help="Print recall and latency against exact search.")
+    parser.add_argument("--queries", type=int, default=200, help="Corpus rows sampled as report queries.")
+    parser.add_argument("--top-k", type=int, default=5, help="Neighbours compared per query.")
+    parser.add_argument(
+        "--nprobes",
+        default="1,2,4,8,16,32,64",
+        help="Comma-separated nprobe values to sweep in the report.",
+    )
+    return parser.parse_args(argv)
+
+
+def _ids(result) -> set[int]:
+    return {match.metadata["_row"] for match in result.matches}
+
+
+def report(exact: LocalVectorStore, index: IVFVectorStore, *, queries: int, top_k: int, nprobes: list[int]) -> None:
+    """Print recall@k and latency percentiles for exact search and each ``nprobe``."""
+
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(exact), min(queries, len(exact)), replace=False)
+    # Perturb corpus rows so queries resemble, but do not exactly equal, stored chunks.
+    noise = rng.standard_normal((rows.size, exact.dimensions)).astype(np.float32) * 0.02
+    query_vectors = exact.matrix[rows] + noise
+
+    def timed(search) -> tuple[list[set[int]], np.ndarray]:
+        found, latencies = [], []
+        for vector in query_vectors:
+            started = time.perf_counter()
+            result = search(vector)
+            latencies.append((time.perf_counter() - started) * 1000)
+            found.append(_ids(result))
+        return found, np.asarray(latencies)
+
+    truth, exact_ms = timed(lambda vector: exact.query(vector, top_k=top_k))
+    print(f"{'search':<12} {'recall@' + str(top_k):>10} {'p50 ms':>8} {'p95 ms':>8}")
+    print(f"{'exact':<12} {1.0:>10.3f} {np.percentile(exact_ms, 50):>8.2f} {np.percentile(exact_ms, 95):>8.2f}")
+    for nprobe in nprobes:
+        found, latency_ms = timed(lambda vector: index.query(vector, top_k=top_k, nprobe=nprobe))
+        recall = np.mean([len(got & want) / len(want) for got, want in zip(found, truth) if want])
+        print(
+            f"{'nprobe=' + str(nprobe):<12} {recall:>10.3f} "
+            f"{np.percentile(latency_ms, 50):>8.2f} {np.percentile(latency_ms, 95):>8.2f}"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    configure_logging()
+    load_environment()
+
+    settings = load_vector_store_settings()
+    exact = LocalVectorStore.from_collection(
+        settings.collection(create_mongodb_client()),
+        embedding_field=settings.embedding_field,
+        fields=settings.fields,
+        exclude_fields=settings.exclude_fields,
+        query_filter=settings.default_filter,
+    )
+    index = IVFVectorStore.build(
+        exact.matrix,
+        exact.metadata,
+        nlist=args.nlist,
+        nprobe=args.nprobe,
+        iterations=args.iterations,
+    )
+    target = index.save(args.output or resolve_index_path())
+    print(f"Wrote IVF index with {len(index)} vectors and {index.nlist} lists to {target}.")
+
+    if args.report:
+        # Same data and seed rebuild the same lists; row tags make results comparable.
+        tagged = [{"_row": row} for row in range(len(exact))]
+        report(
+            LocalVectorStore(exact.matrix, tagged),
+            IVFVectorStore.build(exact.matrix, tagged, nlist=index.nlist, iterations=args.iterations),
+            queries=args.queries,
+            top_k=args.top_k,
+            nprobes=[int(value) for value in args.nprobes.split(",") if value.strip()],
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,60 @@
+"""Snapshot the MongoDB knowledge base into a memory-mapped vector file."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+for path in (PROJECT_ROOT, SRC_ROOT):
+    str_path = str(path)
+    if str_path not in sys.path:
+        sys.path.insert(0, str_path)
+
+from sleep_assistant.config import load_environment
+from sleep_assistant.logging import configure_logging
+from sleep_assistant.services import LocalVectorStore, create_mongodb_client
+from sleep_assistant.services.vector_snapshot import resolve_snapshot_path, write_vector_snapshot
+from sleep_assistant.services.vectorstore import load_vector_store_settings
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build a quantized vector snapshot from MongoDB.")
+    parser.add_argument("--output", type=Path, help="Snapshot path (defaults to VECTOR_SNAPSHOT_PATH).")
+    parser.add_argument("--dtype", choices=("int8", "float16"), default="int8", help="Stored matrix precision.")
+    parser.add_argument(
+        "--no-float32",
+        action="store_true",
+        help="Omit the float32 rows used for rescoring to make the file smaller.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    configure_logging()
+    load_environment()
+
+    settings = load_vector_store_settings()
+    store = LocalVectorStore.from_collection(
+        settings.collection(create_mongodb_client()),
+        embedding_field=settings.embedding_field,
+        fields=settings.fields,
+        exclude_fields=settings.exclude_fields,
+        query_filter=settings.default_filter,
+    )
+    target = write_vector_snapshot(
+        args.output or resolve_snapshot_path(),
+        store.matrix,
+        store.metadata,
+        dtype=args.dtype,
+        include_float32=not args.no_float32,
+    )
+    print(f"Wrote {len(store)} vectors to {target}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,135 @@
+"""Ingest PDFs and text files into the MongoDB vector collection."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+for path in (PROJECT_ROOT, SRC_ROOT):
+    str_path = str(path)
+    if str_path not in sys.path:
+        sys.path.insert(0, str_path)
+
+from sleep_assistant.config import get_env, load_environment
+from sleep_assistant.ingest import (
+    IngestCheckpoint,
+    IngestPipeline,
+    apply_reingest,
+    discover_sources,
+    load_ingest_settings,
+    plan_reingest,
+)
+from sleep_assistant.logging import configure_logging
+from sleep_assistant.services import build_embedder, close_async_mongodb_clients, create_async_mongodb_client
+from sleep_assistant.services.vectorstore import load_vector_store_settings
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Chunk, embed and store documents for vector search.")
+    parser.add_argument("paths", nargs="+", type=Path, help="Files or directories (.pdf, .txt, .md).")
+    parser.add_argument(
+        "--root",
+        type=Path,
+        help="Directory document names are relative to (default: INGEST_ROOT, else the project root or common parent).",
+    )
+    parser.add_argument("--chunk-size", type=int, help="Maximum characters per chunk.")
+    parser.add_argument("--chunk-overlap", type=int, help="Characters shared by consecutive chunks.")
+    parser.add_argument("--batch-size", type=int, help="Chunks per embedding request.")
+    parser.add_argument("--embed-concurrency", type=int, help="Embedding requests in flight.")
+    parser.add_argument("--write-concurrency", type=int, help="bulk_write calls in flight.")
+    parser.add_argument("--checkpoint", type=Path, help="Checkpoint file (defaults to INGEST_CHECKPOINT_PATH).")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and re-ingest everything.")
+    parser.add_argument("--no-ocr", action="store_true", help="Do not OCR PDF pages without a text layer.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Diff against stored chunks and embed only new or changed ones (ignores the checkpoint).",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="With --incremental, report the diff without writing.")
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="With --incremental, also delete chunks of documents that are no longer in the given paths.",
+    )
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> int:
+    overrides = {
+        "chunk_size": args.chunk_size,
+        "chunk_overlap": args.chunk_overlap,
+        "batch_size": args.batch_size,
+        "embed_concurrency": args.embed_concurrency,
+        "write_concurrency": args.write_concurrency,
+        "checkpoint_path": args.checkpoint,
+        "ocr": False if args.no_ocr else None,
+    }
+    settings = dataclasses.replace(
+        load_ingest_settings(),
+        **{name: value for name, value in overrides.items() if value is not None},
+    )
+    raw_root = args.root or get_env("INGEST_ROOT")
+    documents = discover_sources(args.paths, root=Path(raw_root) if raw_root else None)
+    store_settings = load_vector_store_settings()
+    embedder = build_embedder()
+    collection = create_async_mongodb_client()[store_settings.database_name][store_settings.collection_name]
+    try:
+        if args.incremental or args.dry_run:
+            plan = await plan_reingest(
+                documents,
+                collection,
+                embedding_model=embedder.model,
+                settings=settings,
+                prune=args.prune,
+            )
+            if args.dry_run:
+                print(json.dumps({"dry_run": True, **plan.summary()}, indent=2))
+                return 0
+            summary = await apply_reingest(
+                plan,
+                embedder,
+                collection,
+                embedding_field=store_settings.embedding_field,
+                settings=settings,
+            )
+            print(json.dumps(summary, indent=2))
+            return 0
+
+        checkpoint = IngestCheckpoint(settings.checkpoint_path)
+        if args.restart:
+            checkpoint.reset()
+        pipeline = IngestPipeline(
+            embedder,
+            collection,
+            embedding_model=embedder.model,
+            embedding_field=store_settings.embedding_field,
+            settings=settings,
+            checkpoint=checkpoint,
+        )
+        report = await pipeline.run(documents)
+    finally:
+        await close_async_mongodb_clients()
+
+    print(
+        f"Ingested {report.written} chunks from {report.documents} documents "
+        f"({report.skipped_documents} unchanged since the last checkpoint) "
+        f"in {report.elapsed_seconds:.1f}s: {report.chunks_per_second:.1f} chunks/s."
+    )
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    configure_logging()
+    load_environment()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
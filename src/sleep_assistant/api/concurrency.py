@@ -0,0 +1,196 @@
+"""Per-session turn serialization and request coalescing for the chat router."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sleep_assistant.config import get_env
+
+logger = logging.getLogger(__name__)
+
+TurnRunner = Callable[[List[str]], Awaitable[Any]]
+
+
+class TurnPolicy(str, Enum):
+    """What to do when a message arrives while its session is mid-turn."""
+
+    QUEUE = "queue"
+    REJECT = "reject"
+    MERGE = "merge"
+
+
+class SessionBusyError(RuntimeError):
+    """Raised under the ``reject`` policy when a session already has a turn running."""
+
+    def __init__(self, session_id: str) -> None:
+        super().__init__(f"Session {session_id} is already processing a message.")
+        self.session_id = session_id
+
+
+@dataclass
+class _MergeBatch:
+    messages: List[str]
+    task: "asyncio.Task[Any]"
+
+
+@dataclass
+class _SessionSlot:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    users: int = 0
+    batch: Optional[_MergeBatch] = None
+
+
+class SessionTurnCoordinator:
+    """Serialize graph turns per session and share work between duplicate submissions.
+
+    Byte-identical messages for the same session that arrive while an identical turn
+    is still running share that turn's result instead of starting a second pipeline.
+    Other concurrent messages are handled according to ``policy``:
+
+    * ``queue`` – wait for the running turn, then run in arrival order.
+    * ``reject`` – fail fast with :class:`SessionBusyError` (HTTP 409 in the router).
+    * ``merge`` – fold every message that arrives during a running turn into one
+      follow-up turn whose result is returned to all of those callers.
+
+    Turns execute in their own tasks, so a caller disconnecting never cancels work
+    other callers are waiting on.
+    """
+
+    def __init__(self, policy: TurnPolicy = TurnPolicy.QUEUE) -> None:
+        self.policy = policy
+        self._slots: Dict[str, _SessionSlot] = {}
+        self._inflight: Dict[Tuple[str, str], "asyncio.Task[Any]"] = {}
+        self._counters = {"turns": 0, "coalesced": 0, "merged": 0, "rejected": 0, "queued": 0}
+
+    @staticmethod
+    def _message_key(session_id: str, message: str) -> Tuple[str, str]:
+        return session_id, hashlib.sha256(message.encode("utf-8")).hexdigest()
+
+    def _acquire_slot(self, session_id: str) -> _SessionSlot:
+        slot = self._slots.get(session_id)
+        if slot is None:
+            slot = self._slots[session_id] = _SessionSlot()
+        slot.users += 1
+        return slot
+
+    def _release_slot(self, session_id: str, slot: _SessionSlot) -> None:
+        slot.users -= 1
+        if slot.users <= 0 and self._slots.get(session_id) is slot:
+            del self._slots[session_id]
+
+    def is_busy(self, session_id: str) -> bool:
+        """Return True if a turn is running or scheduled for the session."""
+
+        return session_id in self._slots
+
+    async def run(self, session_id: str, message: str, runner: TurnRunner) -> Any:
+        """Run ``runner`` for ``message`` under the session's concurrency policy."""
+
+        key = self._message_key(session_id, message)
+        existing = self._inflight.get(key)
+        if existing is not None and not existing.done():
+            self._counters["coalesced"] += 1
+            logger.info("Coalesced duplicate submission for session %s.", session_id)
+            return await asyncio.shield(existing)
+
+        busy = self.is_busy(session_id)
+        if busy and self.policy is TurnPolicy.REJECT:
+            self._counters["rejected"] += 1
+            raise SessionBusyError(session_id)
+
+        pending_batch = self._slots[session_id].batch if busy else None
+        if self.policy is TurnPolicy.MERGE and pending_batch is not None:
+            pending_batch.messages.append(message)
+            self._counters["merged"] += 1
+            task = pending_batch.task
+        else:
+            if busy:
+                self._counters["queued"] += 1
+            # Claim the slot before scheduling so requests arriving in the same loop
+            # iteration already see the session as busy.
+            slot = self._acquire_slot(session_id)
+            messages = [message]
+            task = asyncio.ensure_future(self._execute(session_id, slot, messages, runner))
+            if busy and self.policy is TurnPolicy.MERGE:
+                slot.batch = _MergeBatch(messages=messages, task=task)
+
+        self._inflight[key] = task
+        task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Tuple[str, str], task: "asyncio.Task[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def _execute(
+        self,
+        session_id: str,
+        slot: _SessionSlot,
+        messages: List[str],
+        runner: TurnRunner,
+    ) -> Any:
+        try:
+            async with slot.lock:
+                if slot.batch is not None and slot.batch.messages is messages:
+                    # Close the batch so later arrivals start the next one.
+                    slot.batch = None
+                self._counters["turns"] += 1
+                return await runner(messages)
+        finally:
+            self._release_slot(session_id, slot)
+
+    @asynccontextmanager
+    async def exclusive(self, session_id: str) -> AsyncIterator[None]:
+        """Hold the session for a streamed turn; ``merge`` behaves like ``queue`` here."""
+
+        busy = self.is_busy(session_id)
+        if busy and self.policy is TurnPolicy.REJECT:
+            self._counters["rejected"] += 1
+            raise SessionBusyError(session_id)
+        if busy:
+            self._counters["queued"] += 1
+        slot = self._acquire_slot(session_id)
+        try:
+            async with slot.lock:
+                self._counters["turns"] += 1
+                yield
+        finally:
+            self._release_slot(session_id, slot)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the policy, active session count and coalescing counters."""
+
+        return {
+            "policy": self.policy.value,
+            "active_sessions": len(self._slots),
+            "inflight_turns": len(self._inflight),
+            **self._counters,
+        }
+
+
+def build_turn_coordinator() -> SessionTurnCoordinator:
+    """Create the coordinator configured through ``SESSION_CONCURRENCY_POLICY``."""
+
+    raw_policy = (get_env("SESSION_CONCURRENCY_POLICY") or TurnPolicy.QUEUE.value).strip().lower()
+    try:
+        policy = TurnPolicy(raw_policy)
+    except ValueError as exc:
+        raise SystemExit(
+            f"Unsupported SESSION_CONCURRENCY_POLICY '{raw_policy}'. Use queue, reject or merge."
+        ) from exc
+    logger.info("Session concurrency policy: %s.", policy.value)
+    return SessionTurnCoordinator(policy)
+
+
+__all__ = [
+    "SessionBusyError",
+    "SessionTurnCoordinator",
+    "TurnPolicy",
+    "build_turn_coordinator",
+]
@@ -3,14 +3,12 @@
 from __future__ import annotations
 
 from functools import lru_cache
-from typing import Dict
 
+from sleep_assistant.api.concurrency import SessionTurnCoordinator, build_turn_coordinator
+from sleep_assistant.api.sessions import SessionStore, build_session_store
 from sleep_assistant.graph import build_app
-from sleep_assistant.graph.state import ChatState
 
-Sessions = Dict[str, ChatState]
-
-_SESSIONS: Sessions = {}
+Sessions = SessionStore
 
 
 @lru_cache(maxsize=1)
@@ -20,10 +18,18 @@ def get_graph_app():
     return build_app()
 
 
-def get_sessions_store() -> Sessions:
-    """Return the in-memory session storage."""
+@lru_cache(maxsize=1)
+def get_sessions_store() -> SessionStore:
+    """Return the process-wide session store selected by ``SESSION_BACKEND``."""
+
+    return build_session_store()
+
+
+@lru_cache(maxsize=1)
+def get_turn_coordinator() -> SessionTurnCoordinator:
+    """Return the process-wide per-session turn coordinator."""
 
-    return _SESSIONS
+    return build_turn_coordinator()
 
 
-__all__ = ["Sessions", "get_graph_app", "get_sessions_store"]
+__all__ = ["SessionStore", "Sessions", "get_graph_app", "get_sessions_store", "get_turn_coordinator"]
@@ -4,10 +4,15 @@ from __future__ import annotations
 
 from fastapi import FastAPI
 
-from sleep_assistant.api.deps import get_graph_app
-from sleep_assistant.api.routers import chat_router
+from sleep_assistant.api.deps import get_graph_app, get_sessions_store
+from sleep_assistant.api.routers import chat_router, stats_router
 from sleep_assistant.config import load_environment
 from sleep_assistant.logging import configure_logging
+from sleep_assistant.services import (
+    close_async_mongodb_clients,
+    open_async_vector_stores,
+    prewarm_async_mongodb_clients,
+)
 
 
 def create_app() -> FastAPI:
@@ -18,12 +23,23 @@ def create_app() -> FastAPI:
 
     app = FastAPI(title="Sleep Assistant API", version="1.0.0")
     app.include_router(chat_router)
+    app.include_router(stats_router)
 
     @app.on_event("startup")
     async def _warm_graph() -> None:
-        """Warm the LangGraph application so first requests are fast."""
+        """Warm the LangGraph application and MongoDB pools so first requests are fast."""
 
         get_graph_app()
+        open_async_vector_stores()
+        await prewarm_async_mongodb_clients()
+
+    @app.on_event("shutdown")
+    async def _flush_sessions() -> None:
+        """Persist buffered session writes and close async MongoDB clients before the worker exits."""
+
+        if get_sessions_store.cache_info().currsize:
+            get_sessions_store().close()
+        await close_async_mongodb_clients()
 
     return app
 
@@ -3,6 +3,6 @@
 from __future__ import annotations
 
 from .chat import router as chat_router
+from .stats import router as stats_router
 
-__all__ = ["chat_router"]
-
+__all__ = ["chat_router", "stats_router"]
@@ -2,77 +2,319 @@
 
 from __future__ import annotations
 
+import json
 import logging
+from typing import Any, AsyncIterator, List, Mapping
 from uuid import uuid4
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from langchain_core.messages import AIMessage
 
-from sleep_assistant.api.deps import Sessions, get_graph_app, get_sessions_store
-from sleep_assistant.api.schemas import ChatRequest, ChatResponse, message_to_dict
+from sleep_assistant.api.concurrency import SessionBusyError, SessionTurnCoordinator, TurnPolicy
+from sleep_assistant.api.deps import Sessions, get_graph_app, get_sessions_store, get_turn_coordinator
+from sleep_assistant.api.schemas import (
+    ChatRequest,
+    ChatResponse,
+    MessagesPage,
+    ResponseMode,
+    SourceMetadata,
+    message_to_dict,
+)
 from sleep_assistant.api.validators import validate_user_message
-from sleep_assistant.graph.state import record_user_message
+from sleep_assistant.graph.events import ANSWER_NODES, RETRIEVAL_EVENT, ROUTE_EVENT
+from sleep_assistant.graph.state import ChatState, record_user_message
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+_FALLBACK_REPLY = "I'm not sure how to respond to that."
+_MAX_PAGE_SIZE = 200
+
+
+def _extract_reply(state: Mapping[str, Any]) -> str:
+    """Return the latest AI reply as a string."""
+
+    for msg in reversed(state.get("messages", [])):
+        if isinstance(msg, AIMessage):
+            content = msg.content
+            return content if isinstance(content, str) else str(content)
+    return _FALLBACK_REPLY
+
+
+def _extract_route(state: Mapping[str, Any]) -> str:
+    """Return the route that handled the latest turn."""
+
+    return state.get("current_route") or state.get("route", "sleep")
+
+
+def _sources_payload(retrievals: Any) -> List[SourceMetadata]:
+    """Project retrieval metadata onto the public source fields."""
+
+    sources_payload = []
+    for item in retrievals or []:
+        if isinstance(item, dict):
+            sources_payload.append(
+                SourceMetadata(
+                    text=item.get("text"),
+                    page_number=item.get("page_number"),
+                    source_document=item.get("source_document"),
+                    score=item.get("score"),
+                )
+            )
+    return sources_payload
+
+
+def _busy_error(exc: SessionBusyError) -> HTTPException:
+    """Translate a busy session into an HTTP 409 response."""
+
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+
+
+def _resolve_response_mode(requested: ResponseMode | None, header: str | None) -> ResponseMode:
+    """Pick the response mode from the request body, then the header, then default to full."""
+
+    if requested:
+        return requested
+    if header and header.strip().lower() == "delta":
+        return "delta"
+    return "full"
+
+
+async def _run_turn(
+    session_id: str,
+    messages: List[str],
+    graph_app: Any,
+    sessions: Sessions,
+) -> tuple[int, Mapping[str, Any]]:
+    """Record the user message(s) and run one graph turn; called with the session held.
+
+    Returns the transcript length before the turn alongside the updated state so
+    delta responses can slice out exactly the messages this turn added.
+    """
+
+    state = await sessions.asetdefault(session_id, {"messages": [], "user_history": []})
+    start_cursor = len(state.get("messages", []))
+    for message in messages:
+        record_user_message(state, message)
+    updated_state = await graph_app.ainvoke(state)
+    sessions[session_id] = updated_state
+    return start_cursor, updated_state
+
+
+def _format_sse(event: str, data: Any) -> str:
+    """Encode a server-sent event frame."""
+
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
 
 @router.post("", response_model=ChatResponse)
 async def chat_endpoint(
     request: ChatRequest,
     graph_app=Depends(get_graph_app),
     sessions: Sessions = Depends(get_sessions_store),
+    coordinator: SessionTurnCoordinator = Depends(get_turn_coordinator),
+    x_response_mode: str | None = Header(default=None),
 ) -> ChatResponse:
     """Process a chat turn routed through the LangGraph application."""
 
     session_id = request.session_id or str(uuid4())
+    response_mode = _resolve_response_mode(request.response_mode, x_response_mode)
     validation = validate_user_message(request.message)
     if not validation.is_valid:
         logger.info("Rejected message for session %s: %s", session_id, validation.error_message)
-        existing_state = sessions.get(session_id)
+        existing_messages = (await sessions.aget(session_id) or {}).get("messages", [])
         messages_payload = (
-            [message_to_dict(msg) for msg in existing_state.get("messages", [])] if existing_state else []
+            [message_to_dict(msg) for msg in existing_messages] if response_mode == "full" else []
         )
         return ChatResponse(
             session_id=session_id,
             reply=validation.error_message or "Please adjust your message and try again.",
             route="validation",
             messages=messages_payload,
+            cursor=len(existing_messages),
+            response_mode=response_mode,
         )
 
     message = request.message.strip()
-    state = sessions.setdefault(session_id, {"messages": [], "user_history": []})
-    record_user_message(state, message)
-    updated_state = graph_app.invoke(state)
-    sessions[session_id] = updated_state
+    try:
+        start_cursor, updated_state = await coordinator.run(
+            session_id,
+            message,
+            lambda messages: _run_turn(session_id, messages, graph_app, sessions),
+        )
+    except SessionBusyError as exc:
+        raise _busy_error(exc) from exc
 
-    # Extract reply from AI message, converting content to string if needed
-    reply = "I'm not sure how to respond to that."
-    for msg in reversed(updated_state.get("messages", [])):
-        if isinstance(msg, AIMessage):
-            content = msg.content
-            reply = content if isinstance(content, str) else str(content)
-            break
-    route = updated_state.get("current_route") or updated_state.get("route", "sleep")
+    reply = _extract_reply(updated_state)
+    route = _extract_route(updated_state)
     logger.info("Session %s used route '%s'.", session_id, route)
 
-    messages_payload = [message_to_dict(msg) for msg in updated_state.get("messages", [])]
-    sources_payload = []
-    for item in updated_state.get("retrievals", []) or []:
-        if isinstance(item, dict):
-            sources_payload.append(
-                {
-                    "text": item.get("text"),
-                    "page_number": item.get("page_number"),
-                    "source_document": item.get("source_document"),
-                    "score": item.get("score"),
-                }
-            )
+    all_messages = updated_state.get("messages", [])
+    visible_messages = all_messages[start_cursor:] if response_mode == "delta" else all_messages
     return ChatResponse(
         session_id=session_id,
         reply=reply,
         route=route,
-        messages=messages_payload,
-        sources=sources_payload,
+        messages=[message_to_dict(msg) for msg in visible_messages],
+        sources=_sources_payload(updated_state.get("retrievals")),
+        cached=bool(updated_state.get("answer_cache_hit")),
+        cursor=len(all_messages),
+        response_mode=response_mode,
+    )
+
+
+@router.get("/{session_id}/messages", response_model=MessagesPage)
+async def list_messages_endpoint(
+    session_id: str,
+    after: int = Query(default=0, ge=0, description="Return messages after this cursor."),
+    limit: int = Query(default=50, ge=1, le=_MAX_PAGE_SIZE),
+    sessions: Sessions = Depends(get_sessions_store),
+) -> MessagesPage:
+    """Return a page of a session transcript starting at the ``after`` cursor."""
+
+    state = await sessions.aget(session_id)
+    if state is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown session {session_id}.")
+
+    messages = state.get("messages", [])
+    page = messages[after : after + limit]
+    cursor = after + len(page)
+    return MessagesPage(
+        session_id=session_id,
+        messages=[message_to_dict(msg) for msg in page],
+        after=after,
+        cursor=cursor,
+        total=len(messages),
+        has_more=cursor < len(messages),
+    )
+
+
+async def _stream_turn(
+    session_id: str,
+    message: str,
+    graph_app: Any,
+    sessions: Sessions,
+    coordinator: SessionTurnCoordinator,
+) -> AsyncIterator[str]:
+    """Hold the session, then stream the turn's SSE frames."""
+
+    try:
+        async with coordinator.exclusive(session_id):
+            state = await sessions.asetdefault(session_id, {"messages": [], "user_history": []})
+            record_user_message(state, message)
+            async for frame in _stream_graph_events(session_id, state, graph_app, sessions):
+                yield frame
+    except SessionBusyError as exc:
+        yield _format_sse("error", {"session_id": session_id, "detail": str(exc)})
+
+
+async def _stream_graph_events(
+    session_id: str,
+    state: ChatState,
+    graph_app: Any,
+    sessions: Sessions,
+) -> AsyncIterator[str]:
+    """Yield SSE frames for one graph run: route, sources, tokens, then a summary."""
+
+    final_state: Mapping[str, Any] | None = None
+    streamed_tokens = False
+    try:
+        async for event in graph_app.astream_events(state, version="v2"):
+            kind = event["event"]
+            if kind == "on_custom_event":
+                if event["name"] == ROUTE_EVENT:
+                    yield _format_sse("route", event["data"])
+                elif event["name"] == RETRIEVAL_EVENT:
+                    sources = [source.model_dump() for source in _sources_payload(event["data"].get("retrievals"))]
+                    yield _format_sse("sources", {"sources": sources})
+            elif kind == "on_chat_model_stream":
+                if event.get("metadata", {}).get("langgraph_node") not in ANSWER_NODES:
+                    continue
+                content = getattr(event["data"].get("chunk"), "content", "")
+                if content:
+                    streamed_tokens = True
+                    yield _format_sse("token", {"text": content if isinstance(content, str) else str(content)})
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                final_state = event["data"].get("output")
+    except Exception:  # noqa: BLE001
+        logger.exception("Streaming turn failed for session %s.", session_id)
+        yield _format_sse("error", {"session_id": session_id, "detail": "The assistant failed to respond."})
+        return
+
+    if not isinstance(final_state, Mapping):
+        yield _format_sse("error", {"session_id": session_id, "detail": "The assistant returned no state."})
+        return
+
+    sessions[session_id] = final_state  # type: ignore[assignment]
+    reply = _extract_reply(final_state)
+    route = _extract_route(final_state)
+    logger.info("Session %s streamed route '%s'.", session_id, route)
+    if not streamed_tokens:
+        # Replies that never hit a chat model (e.g. no retrieval matches) arrive in one piece.
+        yield _format_sse("token", {"text": reply})
+
+    yield _format_sse(
+        "done",
+        {
+            "session_id": session_id,
+            "route": route,
+            "reply": reply,
+            "message_count": len(final_state.get("messages", [])),
+            "cursor": len(final_state.get("messages", [])),
+            "user_turns": len(final_state.get("user_history", [])),
+            "source_count": len(final_state.get("retrievals", []) or []),
+            "cached": bool(final_state.get("answer_cache_hit")),
+        },
+    )
+
+
+@router.post("/stream")
+async def chat_stream_endpoint(
+    request: ChatRequest,
+    graph_app=Depends(get_graph_app),
+    sessions: Sessions = Depends(get_sessions_store),
+    coordinator: SessionTurnCoordinator = Depends(get_turn_coordinator),
+) -> StreamingResponse:
+    """Stream a chat turn as server-sent events.
+
+    Events are emitted in order: ``route``, ``sources`` (sleep route only), ``token``
+    (one per generated chunk) and a final ``done`` summary of the session state.
+    """
+
+    session_id = request.session_id or str(uuid4())
+    validation = validate_user_message(request.message)
+    if not validation.is_valid:
+        logger.info("Rejected message for session %s: %s", session_id, validation.error_message)
+        reply = validation.error_message or "Please adjust your message and try again."
+        existing_state = await sessions.aget(session_id) or {}
+
+        async def _rejected() -> AsyncIterator[str]:
+            yield _format_sse("route", {"route": "validation"})
+            yield _format_sse("token", {"text": reply})
+            yield _format_sse(
+                "done",
+                {
+                    "session_id": session_id,
+                    "route": "validation",
+                    "reply": reply,
+                    "message_count": len(existing_state.get("messages", [])),
+                    "cursor": len(existing_state.get("messages", [])),
+                    "user_turns": len(existing_state.get("user_history", [])),
+                    "source_count": 0,
+                    "cached": False,
+                },
+            )
+
+        return StreamingResponse(_rejected(), media_type="text/event-stream")
+
+    if coordinator.policy is TurnPolicy.REJECT and coordinator.is_busy(session_id):
+        raise _busy_error(SessionBusyError(session_id))
+
+    message = request.message.strip()
+    return StreamingResponse(
+        _stream_turn(session_id, message, graph_app, sessions, coordinator),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
@@ -0,0 +1,22 @@
+"""Operational statistics endpoints for the Sleep Assistant API."""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends
+
+from sleep_assistant.api.deps import get_sessions_store, get_turn_coordinator
+from sleep_assistant.metrics import collect_stats
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+
+@router.get("")
+async def stats_endpoint(
+    sessions=Depends(get_sessions_store),
+    coordinator=Depends(get_turn_coordinator),
+) -> Dict[str, Any]:
+    """Return runtime counters for capacity planning and cache tuning."""
+
+    return {"sessions": sessions.stats(), "turns": coordinator.stats(), **collect_stats()}
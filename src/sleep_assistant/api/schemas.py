@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
 
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 from pydantic import BaseModel, Field
@@ -29,6 +29,9 @@ def message_to_dict(message: BaseMessage) -> Dict[str, str]:
     return {"role": role, "content": content_str}
 
 
+ResponseMode = Literal["full", "delta"]
+
+
 class ChatRequest(BaseModel):
     """Incoming chat request payload."""
 
@@ -37,6 +40,13 @@ class ChatRequest(BaseModel):
         default=None,
         description="Optional session identifier to continue an existing conversation.",
     )
+    response_mode: Optional[ResponseMode] = Field(
+        default=None,
+        description=(
+            "'full' returns the whole transcript; 'delta' returns only messages added this turn. "
+            "Falls back to the X-Response-Mode header, then 'full'."
+        ),
+    )
 
 
 class ChatResponse(BaseModel):
@@ -47,6 +57,23 @@ class ChatResponse(BaseModel):
     route: str
     messages: List[Dict[str, str]]
     sources: List["SourceMetadata"] = Field(default_factory=list)
+    cached: bool = Field(default=False, description="True when the reply came from the semantic answer cache.")
+    cursor: int = Field(
+        default=0,
+        description="Number of messages in the session; pass as 'after' to fetch anything newer.",
+    )
+    response_mode: ResponseMode = "full"
+
+
+class MessagesPage(BaseModel):
+    """A window of a session transcript for clients that need to resync."""
+
+    session_id: str
+    messages: List[Dict[str, str]]
+    after: int
+    cursor: int
+    total: int
+    has_more: bool
 
 
 class SourceMetadata(BaseModel):
@@ -58,4 +85,11 @@ class SourceMetadata(BaseModel):
     score: Optional[float] = None
 
 
-__all__ = ["ChatRequest", "ChatResponse", "SourceMetadata", "message_to_dict"]
+__all__ = [
+    "ChatRequest",
+    "ChatResponse",
+    "MessagesPage",
+    "ResponseMode",
+    "SourceMetadata",
+    "message_to_dict",
+]
@@ -0,0 +1,651 @@
+"""Conversation session storage for the FastAPI layer."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, MutableMapping, Protocol
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from pymongo import ReplaceOne
+from pymongo.collection import Collection
+
+from sleep_assistant import PROJECT_ROOT
+from sleep_assistant.config import get_env, get_int_env, require_env
+from sleep_assistant.graph.state import ChatState
+from sleep_assistant.services.mongodb_client import create_mongodb_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_TTL_SECONDS = 3600
+DEFAULT_SESSION_MAX_COUNT = 10_000
+DEFAULT_SESSION_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_SESSION_SQLITE_PATH = PROJECT_ROOT / "data" / "sessions.sqlite3"
+DEFAULT_SESSION_COLLECTION = "chat_sessions"
+DEFAULT_FLUSH_INTERVAL_MS = 200
+DEFAULT_FLUSH_BATCH_SIZE = 100
+
+# Rough per-object overheads used by the size estimate; exact accounting is not the goal.
+_STATE_OVERHEAD_BYTES = 512
+_MESSAGE_OVERHEAD_BYTES = 400
+_ENTRY_OVERHEAD_BYTES = 96
+
+
+def estimate_state_bytes(state: ChatState) -> int:
+    """Approximate the resident size of a session state."""
+
+    total = _STATE_OVERHEAD_BYTES
+    for message in state.get("messages", []) or []:
+        content = message.content
+        total += _MESSAGE_OVERHEAD_BYTES + len(content if isinstance(content, str) else str(content))
+    for entry in state.get("user_history", []) or []:
+        total += _ENTRY_OVERHEAD_BYTES + len(entry)
+    for item in state.get("retrievals", []) or []:
+        total += _ENTRY_OVERHEAD_BYTES + len(str(item.get("text") or ""))
+    return total
+
+
+@dataclass
+class _SessionEntry:
+    state: ChatState
+    size: int
+    last_access: float
+
+
+@dataclass
+class SessionStoreStats:
+    """Counters describing session store usage and evictions."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: dict[str, int] = field(default_factory=lambda: {"ttl": 0, "count": 0, "bytes": 0})
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": dict(self.evictions)}
+
+
+class SessionStore(MutableMapping[str, ChatState], ABC):
+    """Mapping of session ids to conversation state used by the chat router.
+
+    Implementations must support the plain dict operations the router relies on
+    (``get``, ``setdefault`` and item assignment) plus the lifecycle hooks below.
+    """
+
+    @abstractmethod
+    def stats(self) -> dict[str, Any]:
+        """Return backend-specific usage counters."""
+
+    async def aget(self, session_id: str) -> ChatState | None:
+        """Async ``get``; stores backed by durable storage load off the event loop."""
+
+        return self.get(session_id)
+
+    async def asetdefault(self, session_id: str, default: ChatState) -> ChatState:
+        """Async ``setdefault`` built on :meth:`aget`."""
+
+        state = await self.aget(session_id)
+        if state is None:
+            self[session_id] = default
+            return default
+        return state
+
+    def flush(self) -> None:
+        """Persist any buffered writes. In-memory stores have nothing to do."""
+
+    def close(self) -> None:
+        """Flush and release backend resources."""
+
+        self.flush()
+
+
+class BoundedSessionStore(SessionStore):
+    """In-memory session map with idle TTL, a session cap and an approximate byte budget.
+
+    Entries are kept in least-recently-used order, so the oldest idle session is
+    always at the front and every eviction is a single ``popitem``.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float | None = DEFAULT_SESSION_TTL_SECONDS,
+        max_sessions: int | None = DEFAULT_SESSION_MAX_COUNT,
+        max_bytes: int | None = DEFAULT_SESSION_MAX_BYTES,
+        size_estimator: Callable[[ChatState], int] = estimate_state_bytes,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._entries: OrderedDict[str, _SessionEntry] = OrderedDict()
+        self._ttl = ttl_seconds or None
+        self._max_sessions = max_sessions or None
+        self._max_bytes = max_bytes or None
+        self._size_estimator = size_estimator
+        self._clock = clock
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._stats = SessionStoreStats()
+
+    def __getitem__(self, session_id: str) -> ChatState:
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self._stats.misses += 1
+                raise KeyError(session_id)
+            self._stats.hits += 1
+            entry.last_access = now
+            self._entries.move_to_end(session_id)
+            return entry.state
+
+    def __setitem__(self, session_id: str, state: ChatState) -> None:
+        with self._lock:
+            now = self._clock()
+            size = self._size_estimator(state)
+            previous = self._entries.pop(session_id, None)
+            if previous is not None:
+                self._total_bytes -= previous.size
+            self._entries[session_id] = _SessionEntry(state=state, size=size, last_access=now)
+            self._total_bytes += size
+            self._expire(now)
+            self._enforce_limits()
+
+    def __delitem__(self, session_id: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(session_id)
+            self._total_bytes -= entry.size
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, session_id: object) -> bool:
+        with self._lock:
+            entry = self._entries.get(session_id)  # type: ignore[arg-type]
+            return entry is not None and not self._is_expired(entry, self._clock())
+
+    def setdefault(self, session_id: str, default: ChatState) -> ChatState:  # type: ignore[override]
+        with self._lock:
+            try:
+                return self[session_id]
+            except KeyError:
+                self[session_id] = default
+                return default
+
+    def _is_expired(self, entry: _SessionEntry, now: float) -> bool:
+        return self._ttl is not None and now - entry.last_access > self._ttl
+
+    def _expire(self, now: float) -> None:
+        """Drop idle sessions from the LRU front until the oldest one is still fresh."""
+
+        while self._entries:
+            session_id, entry = next(iter(self._entries.items()))
+            if not self._is_expired(entry, now):
+                break
+            self._evict(session_id, "ttl")
+
+    def _enforce_limits(self) -> None:
+        """Evict least-recently-used sessions until count and byte limits hold.
+
+        The most recently written session is never evicted, even if it alone exceeds
+        the byte budget, so an active conversation cannot lose its own history.
+        """
+
+        while len(self._entries) > 1:
+            if self._max_sessions is not None and len(self._entries) > self._max_sessions:
+                reason = "count"
+            elif self._max_bytes is not None and self._total_bytes > self._max_bytes:
+                reason = "bytes"
+            else:
+                break
+            self._evict(next(iter(self._entries)), reason)
+
+    def _evict(self, session_id: str, reason: str) -> None:
+        entry = self._entries.pop(session_id)
+        self._total_bytes -= entry.size
+        self._stats.evictions[reason] += 1
+        logger.debug("Evicted session %s (%s).", session_id, reason)
+
+    def stats(self) -> dict[str, Any]:
+        """Return usage counters, limits and current occupancy."""
+
+        with self._lock:
+            self._expire(self._clock())
+            return {
+                "backend": "memory",
+                "sessions": len(self._entries),
+                "approx_bytes": self._total_bytes,
+                "limits": {
+                    "ttl_seconds": self._ttl,
+                    "max_sessions": self._max_sessions,
+                    "max_bytes": self._max_bytes,
+                },
+                **self._stats.as_dict(),
+            }
+
+
+_ROLE_CODES = {"human": "h", "ai": "a", "system": "s"}
+_ROLE_CLASSES: Dict[str, type[BaseMessage]] = {"h": HumanMessage, "a": AIMessage, "s": SystemMessage}
+_SCALAR_KEYS = {"route": "r", "current_route": "c", "last_node": "n"}
+_COMPRESS_THRESHOLD_BYTES = 1024
+_RAW_PREFIX = b"j"
+_ZLIB_PREFIX = b"z"
+
+
+def serialize_state(state: ChatState) -> bytes:
+    """Encode the persistent parts of a session state into a compact byte string.
+
+    Messages become ``[role_code, content]`` pairs and keys are shortened; payloads
+    above a kilobyte are zlib-compressed. Transient per-turn keys are not stored.
+    """
+
+    messages: List[List[str]] = []
+    for message in state.get("messages", []) or []:
+        content = message.content
+        text = content if isinstance(content, str) else str(content)
+        messages.append([_ROLE_CODES.get(message.type, "a"), text])
+
+    payload: Dict[str, Any] = {"m": messages, "u": list(state.get("user_history", []) or [])}
+    for key, code in _SCALAR_KEYS.items():
+        value = state.get(key)  # type: ignore[misc]
+        if value:
+            payload[code] = value
+    retrievals = state.get("retrievals")
+    if retrievals:
+        payload["d"] = retrievals
+
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+    if len(raw) > _COMPRESS_THRESHOLD_BYTES:
+        return _ZLIB_PREFIX + zlib.compress(raw, 6)
+    return _RAW_PREFIX + raw
+
+
+def deserialize_state(blob: bytes) -> ChatState:
+    """Decode a byte string produced by :func:`serialize_state`."""
+
+    prefix, body = blob[:1], blob[1:]
+    if prefix == _ZLIB_PREFIX:
+        body = zlib.decompress(body)
+    payload = json.loads(body.decode("utf-8"))
+
+    state: Dict[str, Any] = {
+        "messages": [_ROLE_CLASSES.get(code, AIMessage)(content=text) for code, text in payload.get("m", [])],
+        "user_history": list(payload.get("u", [])),
+    }
+    for key, code in _SCALAR_KEYS.items():
+        if code in payload:
+            state[key] = payload[code]
+    if "d" in payload:
+        state["retrievals"] = payload["d"]
+    return state  # type: ignore[return-value]
+
+
+class SessionBackend(Protocol):
+    """Durable key/value storage for serialized session states."""
+
+    name: str
+
+    def load(self, session_id: str) -> bytes | None: ...
+
+    def save_many(self, items: Dict[str, bytes]) -> None: ...
+
+    def delete_many(self, session_ids: Iterable[str]) -> None: ...
+
+    def session_ids(self) -> List[str]: ...
+
+    def close(self) -> None: ...
+
+
+class SQLiteSessionBackend:
+    """Single-file session backend for local development and single-host deployments."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str | Path, *, ttl_seconds: float | None = None) -> None:
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._ttl = ttl_seconds or None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self._path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def load(self, session_id: str) -> bytes | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, updated_at FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        if self._ttl is not None and time.time() - row[1] > self._ttl:
+            return None
+        return bytes(row[0])
+
+    def save_many(self, items: Dict[str, bytes]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO sessions (id, data, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                    [(session_id, sqlite3.Binary(blob), now) for session_id, blob in items.items()],
+                )
+                if self._ttl is not None:
+                    self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self._ttl,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete_many(self, session_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM sessions WHERE id = ?", [(sid,) for sid in session_ids])
+
+    def session_ids(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT id FROM sessions")]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_TTL_INDEX_NAME = "updated_at_1"
+
+
+class MongoSessionBackend:
+    """MongoDB session backend shared by every worker and replica."""
+
+    name = "mongodb"
+
+    def __init__(self, collection: Collection, *, ttl_seconds: float | None = None) -> None:
+        self._collection = collection
+        self._sync_ttl_index(int(ttl_seconds) if ttl_seconds else None)
+
+    def _sync_ttl_index(self, expire_after: int | None) -> None:
+        """Create, retune or drop the ``updated_at`` TTL index to match ``SESSION_TTL``.
+
+        ``create_index`` rejects a changed ``expireAfterSeconds`` on an existing index,
+        so a changed TTL goes through ``collMod`` instead.
+        """
+
+        collection = self._collection
+        index = collection.index_information().get(_TTL_INDEX_NAME)
+        if index is None:
+            if expire_after:
+                collection.create_index("updated_at", name=_TTL_INDEX_NAME, expireAfterSeconds=expire_after)
+            return
+        current = index.get("expireAfterSeconds")
+        if current == expire_after:
+            return
+        if expire_after is None or current is None:
+            collection.drop_index(_TTL_INDEX_NAME)
+            if expire_after:
+                collection.create_index("updated_at", name=_TTL_INDEX_NAME, expireAfterSeconds=expire_after)
+        else:
+            collection.database.command(
+                "collMod",
+                collection.name,
+                index={"keyPattern": {"updated_at": 1}, "expireAfterSeconds": expire_after},
+            )
+        logger.info("Session TTL index changed from %s to %s seconds.", current, expire_after)
+
+    def load(self, session_id: str) -> bytes | None:
+        doc = self._collection.find_one({"_id": session_id}, projection={"data": 1})
+        return bytes(doc["data"]) if doc else None
+
+    def save_many(self, items: Dict[str, bytes]) -> None:
+        now = datetime.now(timezone.utc)
+        requests = [
+            ReplaceOne({"_id": session_id}, {"data": blob, "updated_at": now}, upsert=True)
+            for session_id, blob in items.items()
+        ]
+        if requests:
+            self._collection.bulk_write(requests, ordered=False)
+
+    def delete_many(self, session_ids: Iterable[str]) -> None:
+        ids = list(session_ids)
+        if ids:
+            self._collection.delete_many({"_id": {"$in": ids}})
+
+    def session_ids(self) -> List[str]:
+        return [doc["_id"] for doc in self._collection.find({}, projection={"_id": 1})]
+
+    def close(self) -> None:
+        """The Mongo client is owned by the caller."""
+
+
+@dataclass
+class _PendingWrite:
+    state: ChatState | None
+    blob: bytes | None
+
+
+class PersistentSessionStore(SessionStore):
+    """Session store that persists to a durable backend with write-behind batching.
+
+    Writes are serialized immediately but flushed by a background thread every
+    ``flush_interval_ms`` (or sooner once ``batch_size`` sessions are dirty), so the
+    backend round trip never sits on a chat turn. Reads see this worker's pending
+    and in-flight writes first and otherwise load from the backend, which makes
+    follow-up turns visible to other workers once the flush interval has passed.
+    """
+
+    def __init__(
+        self,
+        backend: SessionBackend,
+        *,
+        flush_interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS,
+        batch_size: int = DEFAULT_FLUSH_BATCH_SIZE,
+    ) -> None:
+        self._backend = backend
+        self._flush_interval = max(flush_interval_ms, 1) / 1000.0
+        self._batch_size = max(batch_size, 1)
+        self._pending: Dict[str, _PendingWrite] = {}
+        # The batch being written; reads must still see it until the backend commits.
+        self._inflight: Dict[str, _PendingWrite] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._counters = {"loads": 0, "misses": 0, "writes": 0, "batches": 0, "failures": 0}
+        self._writer = threading.Thread(target=self._run_writer, name="session-writer", daemon=True)
+        self._writer.start()
+
+    def _bump(self, key: str, delta: int = 1) -> None:
+        with self._lock:
+            self._counters[key] += delta
+
+    def _buffered(self, session_id: str) -> _PendingWrite | None:
+        with self._lock:
+            return self._pending.get(session_id) or self._inflight.get(session_id)
+
+    def _load(self, session_id: str) -> ChatState | None:
+        blob = self._backend.load(session_id)
+        if blob is None:
+            self._bump("misses")
+            return None
+        self._bump("loads")
+        return deserialize_state(blob)
+
+    def __getitem__(self, session_id: str) -> ChatState:
+        buffered = self._buffered(session_id)
+        state = buffered.state if buffered is not None else self._load(session_id)
+        if state is None:
+            raise KeyError(session_id)
+        return state
+
+    async def aget(self, session_id: str) -> ChatState | None:
+        buffered = self._buffered(session_id)
+        if buffered is not None:
+            return buffered.state
+        return await asyncio.to_thread(self._load, session_id)
+
+    def __setitem__(self, session_id: str, state: ChatState) -> None:
+        blob = serialize_state(state)
+        with self._lock:
+            self._pending[session_id] = _PendingWrite(state=state, blob=blob)
+            if len(self._pending) >= self._batch_size:
+                self._wakeup.set()
+
+    def __delitem__(self, session_id: str) -> None:
+        with self._lock:
+            self._pending[session_id] = _PendingWrite(state=None, blob=None)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            pending = {**self._inflight, **self._pending}
+        stored = set(self._backend.session_ids())
+        stored.update(sid for sid, item in pending.items() if item.state is not None)
+        stored.difference_update(sid for sid, item in pending.items() if item.state is None)
+        return iter(sorted(stored))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def setdefault(self, session_id: str, default: ChatState) -> ChatState:  # type: ignore[override]
+        try:
+            return self[session_id]
+        except KeyError:
+            self[session_id] = default
+            return default
+
+    def _run_writer(self) -> None:
+        while not self._closed.is_set():
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:  # noqa: BLE001
+                logger.exception("Session write-behind flush failed; will retry.")
+
+    def flush(self) -> None:
+        """Write every pending session to the backend in one batch."""
+
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+
+            saves = {sid: item.blob for sid, item in batch.items() if item.blob is not None}
+            deletes = [sid for sid, item in batch.items() if item.blob is None]
+            try:
+                if saves:
+                    self._backend.save_many(saves)  # type: ignore[arg-type]
+                if deletes:
+                    self._backend.delete_many(deletes)
+            except Exception:
+                with self._lock:
+                    self._counters["failures"] += 1
+                    # Keep newer writes that arrived during the failed flush.
+                    for sid, item in batch.items():
+                        self._pending.setdefault(sid, item)
+                    self._inflight = {}
+                raise
+            with self._lock:
+                self._inflight = {}
+                self._counters["writes"] += len(batch)
+                self._counters["batches"] += 1
+
+    def close(self) -> None:
+        """Stop the writer thread, flush remaining writes and close the backend."""
+
+        self._closed.set()
+        self._wakeup.set()
+        self._writer.join(timeout=5)
+        self.flush()
+        self._backend.close()
+
+    def stats(self) -> dict[str, Any]:
+        """Return write-behind counters and backend load statistics."""
+
+        with self._lock:
+            pending = len(self._pending)
+            counters = dict(self._counters)
+        return {
+            "backend": self._backend.name,
+            "pending_writes": pending,
+            "flush_interval_ms": int(self._flush_interval * 1000),
+            "batch_size": self._batch_size,
+            **counters,
+        }
+
+
+def _build_backend(backend_name: str, ttl_seconds: int | None) -> SessionBackend:
+    """Instantiate the durable backend named by ``SESSION_BACKEND``."""
+
+    if backend_name == "sqlite":
+        path = get_env("SESSION_SQLITE_PATH") or str(DEFAULT_SESSION_SQLITE_PATH)
+        logger.info("Persisting sessions to SQLite database '%s'.", path)
+        return SQLiteSessionBackend(path, ttl_seconds=ttl_seconds)
+
+    if backend_name == "mongodb":
+        database_name = require_env("MONGODB_DBNAME")
+        collection_name = get_env("SESSION_MONGODB_COLLECTION") or DEFAULT_SESSION_COLLECTION
+        client = create_mongodb_client(stats_name="mongodb_session_pool")
+        logger.info("Persisting sessions to MongoDB collection '%s.%s'.", database_name, collection_name)
+        return MongoSessionBackend(client[database_name][collection_name], ttl_seconds=ttl_seconds)
+
+    raise SystemExit(f"Unsupported SESSION_BACKEND '{backend_name}'. Use memory, sqlite or mongodb.")
+
+
+def build_session_store() -> SessionStore:
+    """Create the session store configured through ``SESSION_*`` environment variables."""
+
+    ttl_seconds = get_int_env("SESSION_TTL_SECONDS", DEFAULT_SESSION_TTL_SECONDS)
+    backend_name = (get_env("SESSION_BACKEND") or "memory").strip().lower()
+    if backend_name != "memory":
+        return PersistentSessionStore(
+            _build_backend(backend_name, ttl_seconds),
+            flush_interval_ms=get_int_env("SESSION_FLUSH_INTERVAL_MS", DEFAULT_FLUSH_INTERVAL_MS)
+            or DEFAULT_FLUSH_INTERVAL_MS,
+            batch_size=get_int_env("SESSION_FLUSH_BATCH_SIZE", DEFAULT_FLUSH_BATCH_SIZE) or DEFAULT_FLUSH_BATCH_SIZE,
+        )
+
+    store = BoundedSessionStore(
+        ttl_seconds=ttl_seconds,
+        max_sessions=get_int_env("SESSION_MAX_COUNT", DEFAULT_SESSION_MAX_COUNT),
+        max_bytes=get_int_env("SESSION_MAX_BYTES", DEFAULT_SESSION_MAX_BYTES),
+    )
+    limits = store.stats()["limits"]
+    logger.info(
+        "Session store limits: ttl=%ss, max_sessions=%s, max_bytes=%s.",
+        limits["ttl_seconds"],
+        limits["max_sessions"],
+        limits["max_bytes"],
+    )
+    return store
+
+
+__all__ = [
+    "BoundedSessionStore",
+    "MongoSessionBackend",
+    "PersistentSessionStore",
+    "SQLiteSessionBackend",
+    "SessionBackend",
+    "SessionStore",
+    "SessionStoreStats",
+    "build_session_store",
+    "deserialize_state",
+    "estimate_state_bytes",
+    "serialize_state",
+]
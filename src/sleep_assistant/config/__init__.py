@@ -4,10 +4,21 @@ from __future__ import annotations
 
 from .settings import (
     default_dotenv_path,
+    get_bool_env,
     get_env,
+    get_float_env,
+    get_int_env,
     load_environment,
     require_env,
 )
 
-__all__ = ["default_dotenv_path", "get_env", "load_environment", "require_env"]
+__all__ = [
+    "default_dotenv_path",
+    "get_bool_env",
+    "get_env",
+    "get_float_env",
+    "get_int_env",
+    "load_environment",
+    "require_env",
+]
 
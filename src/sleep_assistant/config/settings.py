@@ -45,5 +45,46 @@ def get_env(name: str, default: Optional[str] = None) -> Optional[str]:
     return os.environ.get(name, default)
 
 
-__all__ = ["default_dotenv_path", "get_env", "load_environment", "require_env"]
+def get_int_env(name: str, default: Optional[int] = None) -> Optional[int]:
+    """Fetch an integer environment variable or exit if it is malformed."""
+
+    raw_value = os.environ.get(name)
+    if raw_value is None or not raw_value.strip():
+        return default
+    try:
+        return int(raw_value)
+    except ValueError as exc:
+        raise SystemExit(f"Environment variable {name} must be an integer.") from exc
+
+
+def get_float_env(name: str, default: Optional[float] = None) -> Optional[float]:
+    """Fetch a numeric environment variable or exit if it is malformed."""
+
+    raw_value = os.environ.get(name)
+    if raw_value is None or not raw_value.strip():
+        return default
+    try:
+        return float(raw_value)
+    except ValueError as exc:
+        raise SystemExit(f"Environment variable {name} must be a number.") from exc
+
+
+def get_bool_env(name: str, default: bool = False) -> bool:
+    """Interpret common truthy strings (``1``, ``true``, ``yes``, ``on``) as True."""
+
+    raw_value = os.environ.get(name)
+    if raw_value is None or not raw_value.strip():
+        return default
+    return raw_value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+__all__ = [
+    "default_dotenv_path",
+    "get_bool_env",
+    "get_env",
+    "get_float_env",
+    "get_int_env",
+    "load_environment",
+    "require_env",
+]
 
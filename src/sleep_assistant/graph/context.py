@@ -0,0 +1,194 @@
+"""Token-budgeted conversation context shared by the LLM-calling nodes."""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from sleep_assistant.config import get_int_env
+from sleep_assistant.graph.state import ChatState
+from sleep_assistant.metrics import register_stats_provider
+
+DEFAULT_GENERAL_MAX_TOKENS = 1024
+DEFAULT_SLEEP_HISTORY_MAX_TOKENS = 768
+DEFAULT_ROUTER_MAX_TOKENS = 256
+DEFAULT_TOKEN_CACHE_SIZE = 50_000
+# Role and separator tokens OpenAI adds around every chat message.
+_MESSAGE_OVERHEAD_TOKENS = 4
+_CHARS_PER_TOKEN = 4
+
+
+def _content_text(message: BaseMessage) -> str:
+    content = message.content
+    return content if isinstance(content, str) else str(content)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate: about four characters per token, never fewer than the words."""
+
+    if not text:
+        return 0
+    return max(math.ceil(len(text) / _CHARS_PER_TOKEN), len(text.split()))
+
+
+def clip_text(text: str, max_tokens: int) -> str:
+    """Keep the start of ``text`` so that it fits within ``max_tokens``."""
+
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[: max(max_tokens, 1) * _CHARS_PER_TOKEN].rstrip() + " …"
+
+
+class ContextBuilder:
+    """Trim conversation history to per-node token budgets.
+
+    Message costs are cached under the message type and a digest of its text, so
+    a history reloaded from a persistent session backend (where messages get new
+    ids) still hits, and the cache holds no message bodies. The newest message is always kept, clipped if it alone
+    exceeds the budget, and older messages are added until the budget is spent.
+    """
+
+    def __init__(
+        self,
+        *,
+        general_max_tokens: int = DEFAULT_GENERAL_MAX_TOKENS,
+        sleep_history_max_tokens: int = DEFAULT_SLEEP_HISTORY_MAX_TOKENS,
+        router_max_tokens: int = DEFAULT_ROUTER_MAX_TOKENS,
+        cache_size: int = DEFAULT_TOKEN_CACHE_SIZE,
+    ) -> None:
+        self.general_max_tokens = max(general_max_tokens, 1)
+        self.sleep_history_max_tokens = max(sleep_history_max_tokens, 1)
+        self.router_max_tokens = max(router_max_tokens, 1)
+        self._cache_size = max(cache_size, 0)
+        self._cache: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"builds": 0, "trimmed": 0, "messages_dropped": 0, "cache_hits": 0, "cache_misses": 0}
+
+    def _bump(self, key: str, delta: int = 1) -> None:
+        with self._lock:
+            self._counts[key] += delta
+
+    def count(self, message: BaseMessage) -> int:
+        """Return the estimated prompt tokens for ``message``, including per-message overhead."""
+
+        text = _content_text(message)
+        key: Hashable = (message.type, hashlib.sha1(text.encode("utf-8")).digest())
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self._counts["cache_hits"] += 1
+                return cached
+            self._counts["cache_misses"] += 1
+        tokens = estimate_tokens(text) + _MESSAGE_OVERHEAD_TOKENS
+        if self._cache_size:
+            with self._lock:
+                self._cache[key] = tokens
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return tokens
+
+    def select(
+        self,
+        messages: Sequence[BaseMessage],
+        max_tokens: int,
+        *,
+        max_messages: Optional[int] = None,
+    ) -> List[BaseMessage]:
+        """Return the newest messages that fit within ``max_tokens``, oldest first.
+
+        System messages are always kept. The window never opens on an assistant
+        reply whose question was dropped.
+        """
+
+        self._bump("builds")
+        pinned = [message for message in messages if isinstance(message, SystemMessage)]
+        history = [message for message in messages if not isinstance(message, SystemMessage)]
+        if not history:
+            return list(pinned)
+
+        budget = max_tokens - sum(self.count(message) for message in pinned)
+        latest = history[-1]
+        latest_cost = self.count(latest)
+        if latest_cost > budget:
+            # The clipped copy is costed directly; caching it would only add an entry for one turn.
+            clipped = clip_text(_content_text(latest), budget - _MESSAGE_OVERHEAD_TOKENS)
+            latest = latest.model_copy(update={"content": clipped})
+            latest_cost = estimate_tokens(clipped) + _MESSAGE_OVERHEAD_TOKENS
+        budget -= latest_cost
+        selected = [latest]
+        for message in reversed(history[:-1]):
+            if max_messages is not None and len(selected) >= max_messages:
+                break
+            cost = self.count(message)
+            if cost > budget:
+                break
+            budget -= cost
+            selected.append(message)
+        selected.reverse()
+
+        while len(selected) > 1 and not isinstance(selected[0], HumanMessage):
+            selected.pop(0)
+        dropped = len(history) - len(selected)
+        if dropped or selected[-1] is not history[-1]:
+            self._bump("trimmed")
+            self._bump("messages_dropped", dropped)
+        return pinned + selected
+
+    def general_messages(self, state: ChatState) -> List[BaseMessage]:
+        """Messages sent to the general model."""
+
+        return self.select(state.get("messages") or [], self.general_max_tokens)
+
+    def history_lines(self, state: ChatState, *, max_messages: int) -> List[str]:
+        """``role: text`` lines for the sleep prompt's history slot."""
+
+        window = self.select(state.get("messages") or [], self.sleep_history_max_tokens, max_messages=max_messages)
+        return [f"{message.type}: {_content_text(message)}" for message in window]
+
+    def router_question(self, question: str) -> str:
+        """Clip the question handed to the router model; its start is enough to classify."""
+
+        return clip_text(question, self.router_max_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return build and trim counts plus token-cache usage."""
+
+        with self._lock:
+            counts = dict(self._counts)
+            entries = len(self._cache)
+        lookups = counts["cache_hits"] + counts["cache_misses"]
+        return {
+            **counts,
+            "cache_entries": entries,
+            "cache_hit_rate": (counts["cache_hits"] / lookups) if lookups else 0.0,
+            "budgets": {
+                "general": self.general_max_tokens,
+                "sleep_history": self.sleep_history_max_tokens,
+                "router": self.router_max_tokens,
+            },
+        }
+
+
+def build_context_builder() -> ContextBuilder:
+    """Create a :class:`ContextBuilder` from ``CONTEXT_*`` settings and publish it as ``context``."""
+
+    builder = ContextBuilder(
+        general_max_tokens=get_int_env("CONTEXT_GENERAL_MAX_TOKENS", DEFAULT_GENERAL_MAX_TOKENS)
+        or DEFAULT_GENERAL_MAX_TOKENS,
+        sleep_history_max_tokens=get_int_env("CONTEXT_SLEEP_HISTORY_MAX_TOKENS", DEFAULT_SLEEP_HISTORY_MAX_TOKENS)
+        or DEFAULT_SLEEP_HISTORY_MAX_TOKENS,
+        router_max_tokens=get_int_env("CONTEXT_ROUTER_MAX_TOKENS", DEFAULT_ROUTER_MAX_TOKENS)
+        or DEFAULT_ROUTER_MAX_TOKENS,
+        cache_size=get_int_env("CONTEXT_TOKEN_CACHE_SIZE", DEFAULT_TOKEN_CACHE_SIZE) or 0,
+    )
+    register_stats_provider("context", builder.stats)
+    return builder
+
+
+__all__ = ["ContextBuilder", "build_context_builder", "clip_text", "estimate_tokens"]
@@ -3,20 +3,36 @@
 from __future__ import annotations
 
 import logging
+from typing import Awaitable, Optional, Sequence
 
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph
 
-from sleep_assistant.config import load_environment
+from sleep_assistant.config import get_bool_env, load_environment
+from sleep_assistant.graph.context import build_context_builder
 from sleep_assistant.graph.edges import configure_edges
+from sleep_assistant.graph.events import ROUTE_EVENT, emit_event
 from sleep_assistant.graph.nodes import (
+    RouteDecision,
+    Speculation,
+    SpeculativeRetriever,
     build_router_chain,
     build_sleep_chain,
+    build_tiered_router,
+    make_async_general_node,
+    make_async_sleep_node,
     make_general_node,
     make_sleep_node,
-    router_node,
 )
 from sleep_assistant.graph.state import ChatState
-from sleep_assistant.services import build_chat_models, build_mongo_vector_store, create_mongodb_client
+from sleep_assistant.metrics import register_stats_provider
+from sleep_assistant.services import (
+    build_answer_cache,
+    build_chat_models,
+    build_single_flight,
+    build_vector_store,
+    create_mongodb_client,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -25,26 +41,78 @@ def build_app():
     """Compile the LangGraph application."""
 
     load_environment()
-    general_llm, sleep_llm, embedder = build_chat_models()
+    models = build_chat_models()
+    embedder = models.embedder
     mongo_client = create_mongodb_client()
-    vector_store = build_mongo_vector_store(mongo_client)
+    vector_store = build_vector_store(mongo_client)
+
+    router_chain = build_router_chain(models.router, build_single_flight("router"))
+    sleep_chain = build_sleep_chain(models.sleep, build_single_flight("sleep"))
+    context = build_context_builder()
+    tiered_router = build_tiered_router(router_chain, embedder, context)
+    register_stats_provider("router", tiered_router.stats)
+    answer_cache = build_answer_cache()
 
-    router_chain = build_router_chain(general_llm)
-    sleep_chain = build_sleep_chain(sleep_llm)
+    speculative_retriever: SpeculativeRetriever | None = None
+    if get_bool_env("SPECULATIVE_RETRIEVAL"):
+        speculative_retriever = SpeculativeRetriever(vector_store, embedder)
+        register_stats_provider("speculative_retrieval", speculative_retriever.stats)
+        logger.info("Speculative retrieval enabled: vector search starts once the lexical router tier abstains.")
 
     graph = StateGraph(ChatState)
 
-    def router_handler(state: ChatState) -> dict[str, object]:
-        selected_route = router_node(state, router_chain)
+    def _router_update(decision: RouteDecision) -> dict[str, object]:
         return {
-            "route": selected_route,
-            "current_route": selected_route,
+            "route": decision.route,
+            "current_route": decision.route,
             "last_node": "router",
+            "query_embedding": decision.embedding,
         }
 
-    graph.add_node("router", router_handler)
-    graph.add_node("general", make_general_node(general_llm))
-    graph.add_node("sleep", make_sleep_node(vector_store, embedder, sleep_chain))
+    def router_handler(state: ChatState) -> dict[str, object]:
+        return _router_update(tiered_router.route(state))
+
+    async def arouter_handler(state: ChatState) -> dict[str, object]:
+        speculation: Optional[Speculation] = None
+
+        def start_speculation() -> Optional[Awaitable[Sequence[float]]]:
+            # Called only after the lexical tier abstains, so greetings never embed.
+            nonlocal speculation
+            if speculative_retriever is not None:
+                speculation = speculative_retriever.start(state)
+            return speculation.shared_query_vector() if speculation else None
+
+        try:
+            decision = await tiered_router.aroute(state, start_query_vector=start_speculation)
+        except BaseException:
+            if speculation:
+                speculation.cancel()
+            raise
+        await emit_event(ROUTE_EVENT, {"route": decision.route, "tier": decision.tier})
+        update = _router_update(decision)
+        if speculative_retriever and speculation:
+            update["prefetched_retrieval"] = await speculative_retriever.finish(speculation, decision.route)
+        return update
+
+    # Each node carries a sync and an async implementation so ``invoke`` (CLI, Streamlit)
+    # and ``ainvoke`` (FastAPI) both run natively without blocking the event loop.
+    graph.add_node("router", RunnableLambda(router_handler, afunc=arouter_handler, name="router"))
+    graph.add_node(
+        "general",
+        RunnableLambda(
+            make_general_node(models.general, context),
+            afunc=make_async_general_node(models.general, context),
+            name="general",
+        ),
+    )
+    graph.add_node(
+        "sleep",
+        RunnableLambda(
+            make_sleep_node(vector_store, embedder, sleep_chain, answer_cache, context),
+            afunc=make_async_sleep_node(vector_store, embedder, sleep_chain, answer_cache, context),
+            name="sleep",
+        ),
+    )
 
     configure_edges(graph)
 
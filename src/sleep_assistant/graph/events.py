@@ -0,0 +1,28 @@
+"""Custom LangGraph events surfaced to streaming consumers."""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from langchain_core.callbacks.manager import adispatch_custom_event
+
+logger = logging.getLogger(__name__)
+
+ROUTE_EVENT = "sleep_assistant.route"
+RETRIEVAL_EVENT = "sleep_assistant.retrievals"
+
+# Nodes whose chat-model tokens make up the user-visible reply.
+ANSWER_NODES = frozenset({"general", "sleep"})
+
+
+async def emit_event(name: str, data: Any) -> None:
+    """Dispatch a custom event, ignoring calls made outside a traced graph run."""
+
+    try:
+        await adispatch_custom_event(name, data)
+    except RuntimeError:
+        logger.debug("Skipped custom event '%s' because no parent run is active.", name)
+
+
+__all__ = ["ANSWER_NODES", "RETRIEVAL_EVENT", "ROUTE_EVENT", "emit_event"]
@@ -2,15 +2,22 @@
 
 from __future__ import annotations
 
-from .general import make_general_node
-from .router import build_router_chain, router_node
-from .sleep import build_sleep_chain, make_sleep_node
+from .general import make_async_general_node, make_general_node
+from .router import RouteDecision, TieredRouter, arouter_node, build_router_chain, build_tiered_router, router_node
+from .sleep import Speculation, SpeculativeRetriever, build_sleep_chain, make_async_sleep_node, make_sleep_node
 
 __all__ = [
+    "RouteDecision",
+    "Speculation",
+    "SpeculativeRetriever",
+    "TieredRouter",
+    "arouter_node",
     "build_router_chain",
     "build_sleep_chain",
+    "build_tiered_router",
+    "make_async_general_node",
+    "make_async_sleep_node",
     "make_general_node",
     "make_sleep_node",
     "router_node",
 ]
-
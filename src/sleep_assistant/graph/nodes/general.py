@@ -3,27 +3,51 @@
 from __future__ import annotations
 
 import logging
-from typing import Dict
+from typing import Dict, Optional
 
-from langchain_openai import ChatOpenAI
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
 
+from sleep_assistant.graph.context import ContextBuilder
 from sleep_assistant.graph.state import ChatState
 
 logger = logging.getLogger(__name__)
 
 
-def make_general_node(general_llm: ChatOpenAI):
+def _general_update(reply: BaseMessage) -> Dict[str, object]:
+    """Return the state update emitted by the general node."""
+
+    return {
+        "messages": [reply],
+        "route": "general",
+        "current_route": "general",
+        "last_node": "general",
+        "retrievals": [],
+        "query_embedding": None,
+        "prefetched_retrieval": None,
+        "answer_cache_hit": False,
+    }
+
+
+def make_general_node(general_llm: BaseChatModel, context: Optional[ContextBuilder] = None):
     """Return a LangGraph node callable for general chit-chat."""
 
+    context = context or ContextBuilder()
+
     def node(state: ChatState) -> Dict[str, object]:
         logger.info("General node responding to latest message.")
-        messages = state.get("messages", [])
-        return {
-            "messages": [general_llm.invoke(messages)],
-            "route": "general",
-            "current_route": "general",
-            "last_node": "general",
-            "retrievals": [],
-        }
+        return _general_update(general_llm.invoke(context.general_messages(state)))
+
+    return node
+
+
+def make_async_general_node(general_llm: BaseChatModel, context: Optional[ContextBuilder] = None):
+    """Return the async variant of :func:`make_general_node` for ``ainvoke`` callers."""
+
+    context = context or ContextBuilder()
+
+    async def node(state: ChatState) -> Dict[str, object]:
+        logger.info("General node responding to latest message.")
+        return _general_update(await general_llm.ainvoke(context.general_messages(state)))
 
     return node
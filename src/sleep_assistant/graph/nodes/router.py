@@ -2,23 +2,68 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import math
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
 
-from langchain_openai import ChatOpenAI
+from langchain_core.language_models import BaseChatModel
 
-from sleep_assistant.graph.state import ChatState, get_last_user_message
-from sleep_assistant.graph.prompts.router import get_router_prompt
+from sleep_assistant.config import get_bool_env, get_float_env
+from sleep_assistant.graph.context import ContextBuilder
+from sleep_assistant.graph.prompts.router import GENERAL_EXAMPLES, SLEEP_EXAMPLES, get_router_prompt
+from sleep_assistant.graph.state import ChatState, QueryEmbedding, build_retrieval_query, get_last_user_message
+from sleep_assistant.services.single_flight import SingleFlight, SingleFlightChain
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_EMBEDDING_CONFIDENCE = 0.1
 
-def build_router_chain(router_llm: ChatOpenAI):
+_GREETING_PHRASES = (
+    r"hi+",
+    r"hello+",
+    r"hey+",
+    r"hiya",
+    r"howdy",
+    r"yo",
+    r"greetings",
+    r"good\s+(?:morning|afternoon|evening|day)",
+    r"how\s+are\s+(?:you|u)(?:\s+doing)?(?:\s+today)?",
+    r"how'?s\s+it\s+going",
+    r"what'?s\s+up",
+    r"nice\s+to\s+meet\s+you",
+)
+# Words that only count as greetings after a greeting phrase ("hi there", "hello again").
+_GREETING_SUFFIXES = (r"there", r"again", r"everyone")
+# Whole-message match on one or more greeting phrases, e.g. "Hello, how are you?".
+_GREETING_PATTERN = re.compile(
+    rf"^\s*(?:(?:{'|'.join(_GREETING_PHRASES)})(?:\s+(?:{'|'.join(_GREETING_SUFFIXES)}))?[\s,!.?]*)+$",
+    re.IGNORECASE,
+)
+
+
+def build_router_chain(router_llm: BaseChatModel, single_flight: Optional[SingleFlight] = None):
     """Return an LLM chain that classifies user inputs."""
 
     router_prompt = get_router_prompt()
+    if single_flight is not None:
+        return SingleFlightChain(router_prompt, router_llm, single_flight)
     return router_prompt | router_llm
 
 
+def _parse_judgment(judgment: object, latest_user: str) -> str:
+    """Map the raw router completion onto a graph route."""
+
+    content = getattr(judgment, "content", judgment)
+    text = content if isinstance(content, str) else str(content)
+    route = "general" if "general" in text.strip().lower() else "sleep"
+    logger.info("Router selected '%s' node for message: %s", route, latest_user)
+    return route
+
+
 def router_node(state: ChatState, router_chain) -> str:
     """Choose between the general and sleep branches."""
 
@@ -26,7 +71,292 @@ def router_node(state: ChatState, router_chain) -> str:
     if not latest_user:
         return "sleep"
 
-    judgment = router_chain.invoke({"question": latest_user}).content.strip().lower()
-    route = "general" if "general" in judgment else "sleep"
-    logger.info("Router selected '%s' node for message: %s", route, latest_user)
-    return route
+    judgment = router_chain.invoke({"question": latest_user})
+    return _parse_judgment(judgment, latest_user)
+
+
+async def arouter_node(state: ChatState, router_chain) -> str:
+    """Async variant of :func:`router_node`."""
+
+    latest_user = get_last_user_message(state)
+    if not latest_user:
+        return "sleep"
+
+    judgment = await router_chain.ainvoke({"question": latest_user})
+    return _parse_judgment(judgment, latest_user)
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    """Outcome of the tiered router for a single message."""
+
+    route: str
+    tier: str
+    confidence: Optional[float] = None
+    embedding: Optional[QueryEmbedding] = None
+
+
+def _normalize(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    if not norm:
+        return [0.0 for _ in vector]
+    return [value / norm for value in vector]
+
+
+def _centroid(vectors: Sequence[Sequence[float]]) -> List[float]:
+    summed = [0.0] * len(vectors[0])
+    for vector in vectors:
+        for index, value in enumerate(_normalize(vector)):
+            summed[index] += value
+    return _normalize(summed)
+
+
+class EmbeddingRouteClassifier:
+    """Nearest-centroid route classifier seeded with the router prompt examples.
+
+    Confidence is the cosine-similarity margin between the best and second-best
+    route centroids; callers fall back to the LLM when it is below their threshold.
+    """
+
+    def __init__(self, embedder: Any, seeds: Mapping[str, Sequence[str]]) -> None:
+        self._embedder = embedder
+        self._seeds = {route: list(examples) for route, examples in seeds.items() if examples}
+        self._centroids: Optional[Dict[str, List[float]]] = None
+        self._lock = threading.Lock()
+        self._async_lock: Optional[asyncio.Lock] = None
+
+    def _build_centroids(self, embeddings: Sequence[Sequence[float]]) -> Dict[str, List[float]]:
+        centroids: Dict[str, List[float]] = {}
+        offset = 0
+        for route, examples in self._seeds.items():
+            centroids[route] = _centroid(embeddings[offset : offset + len(examples)])
+            offset += len(examples)
+        logger.info("Router embedding centroids ready for routes: %s", list(centroids))
+        return centroids
+
+    def _seed_texts(self) -> List[str]:
+        return [example for examples in self._seeds.values() for example in examples]
+
+    def _ensure_centroids(self) -> Dict[str, List[float]]:
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    self._centroids = self._build_centroids(self._embedder.embed_documents(self._seed_texts()))
+        return self._centroids
+
+    async def _aensure_centroids(self) -> Dict[str, List[float]]:
+        if self._centroids is None:
+            if self._async_lock is None:
+                self._async_lock = asyncio.Lock()
+            async with self._async_lock:
+                if self._centroids is None:
+                    embeddings = await self._embedder.aembed_documents(self._seed_texts())
+                    self._centroids = self._build_centroids(embeddings)
+        return self._centroids
+
+    @staticmethod
+    def _score(centroids: Mapping[str, List[float]], vector: Sequence[float]) -> Tuple[str, float]:
+        query = _normalize(vector)
+        ranked = sorted(
+            ((sum(a * b for a, b in zip(query, centroid)), route) for route, centroid in centroids.items()),
+            reverse=True,
+        )
+        best_score, best_route = ranked[0]
+        runner_up = ranked[1][0] if len(ranked) > 1 else -1.0
+        return best_route, best_score - runner_up
+
+    def classify(self, vector: Sequence[float]) -> Tuple[str, float]:
+        """Return the closest route and the margin over the runner-up."""
+
+        return self._score(self._ensure_centroids(), vector)
+
+    async def aclassify(self, vector: Sequence[float]) -> Tuple[str, float]:
+        """Async variant of :meth:`classify`."""
+
+        return self._score(await self._aensure_centroids(), vector)
+
+
+async def _await_shared_vector(vector: Awaitable[Sequence[float]]) -> Optional[Sequence[float]]:
+    """Await an embedding shared by an optional optimisation; on failure the router embeds itself."""
+
+    try:
+        return await vector
+    except Exception:  # noqa: BLE001
+        logger.warning("Shared query embedding failed; routing with a fresh embedding.", exc_info=True)
+        return None
+
+
+class TieredRouter:
+    """Route messages through progressively more expensive tiers.
+
+    1. ``lexical`` – a compiled pattern that recognises obvious greetings.
+    2. ``embedding`` – nearest-centroid over the latest message's embedding, accepted
+       when the margin clears ``confidence_threshold``. The sleep node's retrieval
+       query is embedded in the same request and handed on, so the turn never
+       embeds the same text twice.
+    3. ``llm`` – the original router chain, used only when the cheaper tiers abstain.
+    """
+
+    TIERS = ("default", "lexical", "embedding", "llm")
+
+    def __init__(
+        self,
+        router_chain: Any,
+        *,
+        embedder: Any | None = None,
+        lexical_enabled: bool = True,
+        confidence_threshold: float = DEFAULT_EMBEDDING_CONFIDENCE,
+        context: Optional[ContextBuilder] = None,
+    ) -> None:
+        self._router_chain = router_chain
+        self._context = context or ContextBuilder()
+        self._embedder = embedder
+        self._lexical_enabled = lexical_enabled
+        self._confidence_threshold = confidence_threshold
+        self._classifier = (
+            EmbeddingRouteClassifier(embedder, {"general": GENERAL_EXAMPLES, "sleep": SLEEP_EXAMPLES})
+            if embedder is not None
+            else None
+        )
+        self._counts = {tier: 0 for tier in self.TIERS}
+        self._counts_lock = threading.Lock()
+
+    def _record(self, decision: RouteDecision, latest_user: str) -> RouteDecision:
+        with self._counts_lock:
+            self._counts[decision.tier] += 1
+        if decision.tier != "llm":
+            logger.info(
+                "Router %s tier selected '%s' node for message: %s", decision.tier, decision.route, latest_user
+            )
+        return decision
+
+    def _cheap_decision(self, latest_user: Optional[str]) -> Optional[RouteDecision]:
+        if not latest_user:
+            return RouteDecision(route="sleep", tier="default")
+        if self._lexical_enabled and _GREETING_PATTERN.match(latest_user):
+            return RouteDecision(route="general", tier="lexical", confidence=1.0)
+        return None
+
+    def _embedding_decision(
+        self, query_text: str, query_vector: Sequence[float], route: str, margin: float
+    ) -> Tuple[Optional[RouteDecision], QueryEmbedding]:
+        embedding: QueryEmbedding = {"text": query_text, "vector": list(query_vector)}
+        if margin >= self._confidence_threshold:
+            return RouteDecision(route=route, tier="embedding", confidence=margin, embedding=embedding), embedding
+        return None, embedding
+
+    def route(self, state: ChatState) -> RouteDecision:
+        """Return the route for the latest user message."""
+
+        latest_user = get_last_user_message(state)
+        decision = self._cheap_decision(latest_user)
+        if decision is not None:
+            return self._record(decision, latest_user or "")
+        assert latest_user is not None
+
+        embedding: Optional[QueryEmbedding] = None
+        if self._classifier is not None:
+            embedder: Any = self._embedder
+            query_text = build_retrieval_query(state, latest_user)
+            if query_text == latest_user:
+                vector = query_vector = embedder.embed_query(latest_user)
+            else:
+                # One request for both: the classifier needs the latest turn, retrieval the joined query.
+                vector, query_vector = embedder.embed_documents([latest_user, query_text])
+            route, margin = self._classifier.classify(vector)
+            decision, embedding = self._embedding_decision(query_text, query_vector, route, margin)
+            if decision is not None:
+                return self._record(decision, latest_user)
+
+        judgment = self._router_chain.invoke({"question": self._context.router_question(latest_user)})
+        route = _parse_judgment(judgment, latest_user)
+        return self._record(RouteDecision(route=route, tier="llm", embedding=embedding), latest_user)
+
+    async def aroute(
+        self,
+        state: ChatState,
+        *,
+        start_query_vector: Optional[Callable[[], Optional[Awaitable[Sequence[float]]]]] = None,
+    ) -> RouteDecision:
+        """Async variant of :meth:`route`.
+
+        ``start_query_vector`` is called once the lexical tier has abstained, so a
+        caller can start work that only pays off for expensive turns (speculative
+        retrieval). The embedding it returns for the retrieval query is shared
+        instead of issuing a second request.
+        """
+
+        latest_user = get_last_user_message(state)
+        decision = self._cheap_decision(latest_user)
+        if decision is not None:
+            return self._record(decision, latest_user or "")
+        assert latest_user is not None
+        query_vector = start_query_vector() if start_query_vector is not None else None
+
+        embedding: Optional[QueryEmbedding] = None
+        if self._classifier is not None:
+            query_text = build_retrieval_query(state, latest_user)
+            vector, shared_vector = await self._aembed(latest_user, query_text, query_vector)
+            route, margin = await self._classifier.aclassify(vector)
+            decision, embedding = self._embedding_decision(query_text, shared_vector, route, margin)
+            if decision is not None:
+                return self._record(decision, latest_user)
+
+        judgment = await self._router_chain.ainvoke({"question": self._context.router_question(latest_user)})
+        route = _parse_judgment(judgment, latest_user)
+        return self._record(RouteDecision(route=route, tier="llm", embedding=embedding), latest_user)
+
+    async def _aembed(
+        self,
+        latest_user: str,
+        query_text: str,
+        query_vector: Optional[Awaitable[Sequence[float]]],
+    ) -> Tuple[Sequence[float], Sequence[float]]:
+        """Embed the latest turn for classification and the retrieval query for the sleep node."""
+
+        embedder: Any = self._embedder
+        if query_vector is not None:
+            if query_text == latest_user:
+                shared = await _await_shared_vector(query_vector)
+                if shared is not None:
+                    return shared, shared
+            else:
+                vector, shared = await asyncio.gather(
+                    embedder.aembed_query(latest_user), _await_shared_vector(query_vector)
+                )
+                return vector, shared if shared is not None else await embedder.aembed_query(query_text)
+        if query_text == latest_user:
+            vector = await embedder.aembed_query(latest_user)
+            return vector, vector
+        vector, shared = await embedder.aembed_documents([latest_user, query_text])
+        return vector, shared
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many turns each tier decided."""
+
+        with self._counts_lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        return {
+            "decisions": counts,
+            "total": total,
+            "llm_share": (counts["llm"] / total) if total else 0.0,
+            "confidence_threshold": self._confidence_threshold,
+        }
+
+
+def build_tiered_router(
+    router_chain: Any,
+    embedder: Any | None = None,
+    context: Optional[ContextBuilder] = None,
+) -> TieredRouter:
+    """Create a :class:`TieredRouter` configured through ``ROUTER_*`` environment variables."""
+
+    embedding_enabled = get_bool_env("ROUTER_EMBEDDING_ENABLED", True)
+    return TieredRouter(
+        router_chain,
+        embedder=embedder if embedding_enabled else None,
+        lexical_enabled=get_bool_env("ROUTER_LEXICAL_ENABLED", True),
+        confidence_threshold=get_float_env("ROUTER_EMBEDDING_CONFIDENCE", DEFAULT_EMBEDDING_CONFIDENCE),  # type: ignore[arg-type]
+        context=context,
+    )
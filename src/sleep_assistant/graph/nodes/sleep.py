@@ -2,29 +2,46 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any, Dict, List, Optional
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Awaitable, Dict, List, Optional, Sequence, Tuple
 
-from langchain_core.messages import AIMessage
-from langchain_openai import OpenAIEmbeddings
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.embeddings import Embeddings
 
+from sleep_assistant.graph.context import ContextBuilder
+from sleep_assistant.graph.events import RETRIEVAL_EVENT, emit_event
 from sleep_assistant.graph.state import (
     MAX_USER_HISTORY,
     ChatState,
+    PrefetchedRetrieval,
     RetrievedDocument,
-    get_conversation_window,
+    build_retrieval_query,
     get_last_user_message,
-    get_recent_user_messages,
 )
 from sleep_assistant.graph.prompts.sleep import get_sleep_prompt
+from sleep_assistant.services.answer_cache import SemanticAnswerCache, document_set_signature
+from sleep_assistant.services.single_flight import SingleFlight, SingleFlightChain
 
 logger = logging.getLogger(__name__)
 
+# Words that usually tie a question to earlier turns ("what about that?", "tell me more").
+_FOLLOW_UP_PATTERN = re.compile(
+    r"\b(?:it|its|that|this|these|those|they|them|their|he|she|more|else|again|also|"
+    r"above|earlier|previous|same|instead)\b",
+    re.IGNORECASE,
+)
+
 
-def build_sleep_chain(sleep_llm):
+def build_sleep_chain(sleep_llm, single_flight: Optional[SingleFlight] = None):
     """Return an LLM chain for answering sleep-related questions."""
 
     sleep_prompt = get_sleep_prompt()
+    if single_flight is not None:
+        return SingleFlightChain(sleep_prompt, sleep_llm, single_flight)
     return sleep_prompt | sleep_llm
 
 
@@ -46,70 +63,300 @@ def _extract_text(metadata: Dict[str, object]) -> Optional[str]:
     return None
 
 
-def make_sleep_node(vector_store: Any, embedder: OpenAIEmbeddings, sleep_chain):
+def _build_history_text(state: ChatState, context: ContextBuilder) -> str:
+    """Return the formatted conversation window passed to the sleep prompt."""
+
+    history_lines = context.history_lines(state, max_messages=MAX_USER_HISTORY * 2)
+    return "\n".join(history_lines) if history_lines else "No prior conversation."
+
+
+def _collect_matches(results: Any) -> Tuple[List[str], List[RetrievedDocument]]:
+    """Convert vector store matches into prompt contexts and retrieval metadata."""
+
+    contexts: List[str] = []
+    retrievals: List[RetrievedDocument] = []
+    matches = getattr(results, "matches", None) or []
+    for match in matches:
+        metadata = getattr(match, "metadata", None) or {}
+        text = _extract_text(metadata)
+        if text:
+            page_number = metadata.get("page_number") or metadata.get("page")
+            source_document = metadata.get("source_document") or metadata.get("source")
+            label_parts = []
+            if source_document:
+                label_parts.append(f"Source: {source_document}")
+            if page_number is not None:
+                label_parts.append(f"Page: {page_number}")
+            label = f"[{', '.join(label_parts)}]\n" if label_parts else ""
+            contexts.append(f"{label}{text}".strip())
+
+            retrieved: RetrievedDocument = {"text": text}
+            if page_number is not None:
+                retrieved["page_number"] = page_number
+            if source_document:
+                retrieved["source_document"] = source_document
+            score = getattr(match, "score", None)
+            if score is not None:
+                retrieved["score"] = score
+            retrievals.append(retrieved)
+    return contexts, retrievals
+
+
+def _reusable_embedding(state: ChatState, query_text: str) -> Optional[List[float]]:
+    """Return the router's embedding when it was computed for this exact query text."""
+
+    embedding = state.get("query_embedding")
+    if embedding and embedding.get("text") == query_text:
+        return embedding.get("vector")
+    return None
+
+
+def _reusable_prefetch(state: ChatState, query_text: str) -> Optional[Tuple[List[float], Any]]:
+    """Return the speculative query vector and search results when they match this query text."""
+
+    prefetched = state.get("prefetched_retrieval")
+    if prefetched and prefetched.get("query_text") == query_text:
+        return prefetched.get("vector"), prefetched.get("results")
+    return None
+
+
+def _has_prior_reply(state: ChatState) -> bool:
+    return any(isinstance(message, AIMessage) for message in state.get("messages", []))
+
+
+def _answer_cache_eligible(state: ChatState, latest_user: str) -> bool:
+    """Return True for first-turn questions or ones that do not refer back to history."""
+
+    return not _has_prior_reply(state) or not _FOLLOW_UP_PATTERN.search(latest_user)
+
+
+def _answer_cache_storable(state: ChatState) -> bool:
+    """Only answers generated without prior conversation may be shared with other sessions."""
+
+    return not _has_prior_reply(state)
+
+
+def _message_text(message: BaseMessage) -> str:
+    content = message.content
+    return content if isinstance(content, str) else str(content)
+
+
+def _sleep_update(
+    ai_message: BaseMessage,
+    retrievals: List[RetrievedDocument],
+    *,
+    cache_hit: bool = False,
+) -> Dict[str, object]:
+    """Return the state update emitted by the sleep node."""
+
+    return {
+        "messages": [ai_message],
+        "route": "sleep",
+        "current_route": "sleep",
+        "last_node": "sleep",
+        "retrievals": retrievals,
+        "query_embedding": None,
+        "prefetched_retrieval": None,
+        "answer_cache_hit": cache_hit,
+    }
+
+
+def _no_match_message() -> AIMessage:
+    """Return the fallback reply used when retrieval produced no usable snippets."""
+
+    logger.info("Sleep node found no relevant MongoDB matches for the query.")
+    return AIMessage(
+        content="I'm not sure. I couldn't find relevant information about that in my sleep knowledge base."
+    )
+
+
+def _missing_question_update() -> Dict[str, object]:
+    """Return the state update used when no user question is available."""
+
+    return {"messages": [AIMessage(content="I didn't catch that. Could you repeat your question?")]}
+
+
+def make_sleep_node(
+    vector_store: Any,
+    embedder: Embeddings,
+    sleep_chain,
+    answer_cache: Optional[SemanticAnswerCache] = None,
+    context: Optional[ContextBuilder] = None,
+):
     """Build the LangGraph node for sleep-related responses."""
 
+    context = context or ContextBuilder()
+
     def node(state: ChatState) -> Dict[str, object]:
         latest_user = get_last_user_message(state) or ""
         if not latest_user:
-            return {"messages": [AIMessage(content="I didn't catch that. Could you repeat your question?")]}
+            return _missing_question_update()
 
-        recent_user_history = get_recent_user_messages(state, limit=MAX_USER_HISTORY)
-        if recent_user_history:
-            query_text = " ".join(recent_user_history[-2:])
-        else:
-            query_text = latest_user
+        query_text = build_retrieval_query(state, latest_user)
+        history_text = _build_history_text(state, context)
 
-        history_lines = get_conversation_window(state, limit=MAX_USER_HISTORY * 2)
-        history_text = "\n".join(history_lines) if history_lines else "No prior conversation."
-
-        query_embedding = embedder.embed_query(query_text)
+        query_embedding = _reusable_embedding(state, query_text) or embedder.embed_query(query_text)
         results = vector_store.query(vector=query_embedding, top_k=5, include_metadata=True)
+        contexts, retrievals = _collect_matches(results)
+        if not contexts:
+            return _sleep_update(_no_match_message(), retrievals)
 
-        contexts: List[str] = []
-        retrievals: List[RetrievedDocument] = []
-        matches = getattr(results, "matches", None) or []
-        for match in matches:
-            metadata = getattr(match, "metadata", None) or {}
-            text = _extract_text(metadata)
-            if text:
-                page_number = metadata.get("page_number") or metadata.get("page")
-                source_document = metadata.get("source_document") or metadata.get("source")
-                label_parts = []
-                if source_document:
-                    label_parts.append(f"Source: {source_document}")
-                if page_number is not None:
-                    label_parts.append(f"Page: {page_number}")
-                label = f"[{', '.join(label_parts)}]\n" if label_parts else ""
-                contexts.append(f"{label}{text}".strip())
-
-                retrieved: RetrievedDocument = {"text": text}
-                if page_number is not None:
-                    retrieved["page_number"] = page_number
-                if source_document:
-                    retrieved["source_document"] = source_document
-                score = getattr(match, "score", None)
-                if score is not None:
-                    retrieved["score"] = score
-                retrievals.append(retrieved)
-
-        if contexts:
-            combined_context = "\n\n".join(contexts)
-            logger.info("Sleep node retrieved %d document snippets from MongoDB vector search.", len(contexts))
-            ai_message = sleep_chain.invoke(
-                {"context": combined_context, "question": latest_user, "history": history_text}
-            )
+        cache_key = None
+        if answer_cache is not None and _answer_cache_eligible(state, latest_user):
+            cache_vector = query_embedding if query_text == latest_user else embedder.embed_query(latest_user)
+            cache_key = (cache_vector, document_set_signature(retrievals))
+            cached_answer = answer_cache.lookup(*cache_key)
+            if cached_answer is not None:
+                logger.info("Sleep node served a cached answer.")
+                return _sleep_update(AIMessage(content=cached_answer), retrievals, cache_hit=True)
+
+        combined_context = "\n\n".join(contexts)
+        logger.info("Sleep node retrieved %d document snippets from MongoDB vector search.", len(contexts))
+        ai_message = sleep_chain.invoke(
+            {"context": combined_context, "question": latest_user, "history": history_text}
+        )
+        if cache_key is not None and answer_cache is not None and _answer_cache_storable(state):
+            answer_cache.store(*cache_key, _message_text(ai_message))
+        return _sleep_update(ai_message, retrievals)
+
+    return node
+
+
+def make_async_sleep_node(
+    vector_store: Any,
+    embedder: Embeddings,
+    sleep_chain,
+    answer_cache: Optional[SemanticAnswerCache] = None,
+    context: Optional[ContextBuilder] = None,
+):
+    """Build the async variant of :func:`make_sleep_node`.
+
+    Embedding, vector search and generation are all awaited so a slow upstream call
+    never blocks the event loop serving other sessions.
+    """
+
+    context = context or ContextBuilder()
+
+    async def node(state: ChatState) -> Dict[str, object]:
+        latest_user = get_last_user_message(state) or ""
+        if not latest_user:
+            return _missing_question_update()
+
+        query_text = build_retrieval_query(state, latest_user)
+        history_text = _build_history_text(state, context)
+
+        prefetched = _reusable_prefetch(state, query_text)
+        if prefetched is not None:
+            query_embedding, results = prefetched
         else:
-            logger.info("Sleep node found no relevant MongoDB matches for the query.")
-            ai_message = AIMessage(
-                content="I'm not sure. I couldn't find relevant information about that in my sleep knowledge base."
+            query_embedding = _reusable_embedding(state, query_text) or await embedder.aembed_query(query_text)
+            results = await vector_store.aquery(vector=query_embedding, top_k=5, include_metadata=True)
+        contexts, retrievals = _collect_matches(results)
+        await emit_event(RETRIEVAL_EVENT, {"retrievals": retrievals})
+        if not contexts:
+            return _sleep_update(_no_match_message(), retrievals)
+
+        cache_key = None
+        if answer_cache is not None and _answer_cache_eligible(state, latest_user):
+            cache_vector = (
+                query_embedding if query_text == latest_user else await embedder.aembed_query(latest_user)
             )
+            cache_key = (cache_vector, document_set_signature(retrievals))
+            cached_answer = answer_cache.lookup(*cache_key)
+            if cached_answer is not None:
+                logger.info("Sleep node served a cached answer.")
+                return _sleep_update(AIMessage(content=cached_answer), retrievals, cache_hit=True)
+
+        combined_context = "\n\n".join(contexts)
+        logger.info("Sleep node retrieved %d document snippets from MongoDB vector search.", len(contexts))
+        ai_message = await sleep_chain.ainvoke(
+            {"context": combined_context, "question": latest_user, "history": history_text}
+        )
+        if cache_key is not None and answer_cache is not None and _answer_cache_storable(state):
+            answer_cache.store(*cache_key, _message_text(ai_message))
+        return _sleep_update(ai_message, retrievals)
+
+    return node
+
+
+@dataclass
+class Speculation:
+    """Handles for one in-flight speculative retrieval."""
+
+    query_text: str
+    latest_user: str
+    embed_task: "asyncio.Future[List[float]]"
+    search_task: "asyncio.Future[Any]"
+
+    def shared_query_vector(self) -> Awaitable[Sequence[float]]:
+        """Return the retrieval-query embedding future for the router to share."""
+
+        return self.embed_task
+
+    def cancel(self) -> None:
+        """Abandon the speculative requests."""
+
+        self.search_task.cancel()
+        self.embed_task.cancel()
+
+
+class SpeculativeRetriever:
+    """Start the sleep node's embedding and vector search before the route is known.
+
+    Almost every turn is routed to ``sleep``, so overlapping retrieval with the router
+    call hides two network round trips on the common path. Results are discarded
+    (and the requests cancelled) when the router picks ``general``.
+    """
+
+    def __init__(self, vector_store: Any, embedder: Any, *, top_k: int = 5) -> None:
+        self._vector_store = vector_store
+        self._embedder = embedder
+        self._top_k = top_k
+        self._counts = {"started": 0, "used": 0, "discarded": 0, "failed": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    async def _search(self, embed_task: "asyncio.Future[List[float]]") -> Any:
+        vector = await embed_task
+        return await self._vector_store.aquery(vector=vector, top_k=self._top_k, include_metadata=True)
+
+    def start(self, state: ChatState) -> Optional[Speculation]:
+        """Kick off retrieval for the query the sleep node would build from ``state``."""
+
+        latest_user = get_last_user_message(state)
+        if not latest_user:
+            return None
+        query_text = build_retrieval_query(state, latest_user)
+        embed_task = asyncio.ensure_future(self._embedder.aembed_query(query_text))
+        search_task = asyncio.ensure_future(self._search(embed_task))
+        self._count("started")
+        return Speculation(query_text, latest_user, embed_task, search_task)
+
+    async def finish(self, speculation: Speculation, route: str) -> Optional[PrefetchedRetrieval]:
+        """Hand the prefetched results to the sleep route, or cancel them for any other route."""
+
+        if route != "sleep":
+            speculation.cancel()
+            self._count("discarded")
+            return None
+        try:
+            results = await speculation.search_task
+        except Exception:  # noqa: BLE001
+            logger.warning("Speculative retrieval failed; the sleep node will retry.", exc_info=True)
+            self._count("failed")
+            return None
+        self._count("used")
         return {
-            "messages": [ai_message],
-            "route": "sleep",
-            "current_route": "sleep",
-            "last_node": "sleep",
-            "retrievals": retrievals,
+            "query_text": speculation.query_text,
+            "vector": speculation.embed_task.result(),
+            "results": results,
         }
 
-    return node
+    def stats(self) -> Dict[str, Any]:
+        """Return how often speculative retrieval was used or thrown away."""
+
+        with self._lock:
+            return dict(self._counts)
@@ -4,6 +4,27 @@ from __future__ import annotations
 
 from langchain_core.prompts import ChatPromptTemplate
 
+SLEEP_EXAMPLES = (
+    "Nutrition, supplements and recipes",
+    "Why do I feel tired in the morning?",
+    "What can help me relax at night?",
+    "How do I stop waking up in the middle of the night?",
+    "I feel exhausted all day. What should I do?",
+    "Foods that help with rest or recovery",
+)
+
+GENERAL_EXAMPLES = (
+    "Hi",
+    "Hello, how are you?",
+    "Good morning",
+    "Hey",
+    "Good evening",
+)
+
+
+def _format_examples(examples: tuple[str, ...]) -> str:
+    return "\n".join(f'- {{{{"message": "{example}"}}}}' for example in examples)
+
 
 def get_router_prompt() -> ChatPromptTemplate:
     """Return the classification prompt used to select the conversation route."""
@@ -28,22 +49,13 @@ def get_router_prompt() -> ChatPromptTemplate:
                 "No extra words or explanations.\n\n"
                 "Examples:\n\n"
                 'Sleep -> (respond "sleep")\n'
-                '- {{"message": "Nutrition, supplements and recipes"}}\n'
-                '- {{"message": "Why do I feel tired in the morning?"}}\n'
-                '- {{"message": "What can help me relax at night?"}}\n'
-                '- {{"message": "How do I stop waking up in the middle of the night?"}}\n'
-                '- {{"message": "I feel exhausted all day. What should I do?"}}\n'
-                '- {{"message": "Foods that help with rest or recovery"}}\n\n'
+                f"{_format_examples(SLEEP_EXAMPLES)}\n\n"
                 'General -> (respond "general")\n'
-                '- {{"message": "Hi"}}\n'
-                '- {{"message": "Hello, how are you?"}}\n'
-                '- {{"message": "Good morning"}}\n'
-                '- {{"message": "Hey"}}\n'
-                '- {{"message": "Good evening"}}',
+                f"{_format_examples(GENERAL_EXAMPLES)}",
             ),
             ("human", "{question}"),
         ]
     )
 
 
-__all__ = ["get_router_prompt"]
+__all__ = ["GENERAL_EXAMPLES", "SLEEP_EXAMPLES", "get_router_prompt"]
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import Annotated, List, Literal, TypedDict
+from typing import Annotated, Any, List, Literal, Optional, TypedDict
 
 from langchain_core.messages import BaseMessage, HumanMessage
 from langgraph.graph import add_messages
@@ -30,6 +30,24 @@ class ChatState(TypedDict, total=False):
     current_route: str
     last_node: str
     retrievals: List["RetrievedDocument"]
+    query_embedding: Optional["QueryEmbedding"]
+    prefetched_retrieval: Optional["PrefetchedRetrieval"]
+    answer_cache_hit: bool
+
+
+class QueryEmbedding(TypedDict):
+    """Embedding computed earlier in the turn, reusable when the text matches."""
+
+    text: str
+    vector: List[float]
+
+
+class PrefetchedRetrieval(TypedDict):
+    """Vector search results fetched speculatively while the router was deciding."""
+
+    query_text: str
+    vector: List[float]
+    results: Any
 
 
 class RetrievedDocument(TypedDict, total=False):
@@ -96,6 +114,15 @@ def get_conversation_window(state: "ChatState", limit: int = 6) -> List[str]:
     return list(reversed(recent))
 
 
+def build_retrieval_query(state: "ChatState", latest_user: str) -> str:
+    """Return the retrieval query built from the most recent user turns."""
+
+    recent_user_history = get_recent_user_messages(state, limit=MAX_USER_HISTORY)
+    if recent_user_history:
+        return " ".join(recent_user_history[-2:])
+    return latest_user
+
+
 def get_last_user_message(state: "ChatState") -> str | None:
     """Return the latest user utterance, if present."""
 
@@ -114,7 +141,10 @@ def get_last_user_message(state: "ChatState") -> str | None:
 __all__ = [
     "ChatState",
     "MAX_USER_HISTORY",
+    "PrefetchedRetrieval",
+    "QueryEmbedding",
     "RetrievedDocument",
+    "build_retrieval_query",
     "get_conversation_window",
     "get_last_user_message",
     "get_recent_user_messages",
@@ -0,0 +1,27 @@
+"""Knowledge-base ingestion: extraction, chunking, embedding and bulk writes."""
+
+from __future__ import annotations
+
+from .checkpoint import IngestCheckpoint
+from .chunking import Chunk, chunk_page, split_text
+from .incremental import ReingestPlan, apply_reingest, plan_reingest
+from .pipeline import IngestPipeline, IngestReport, IngestSettings, load_ingest_settings
+from .sources import SourceDocument, SourcePage, discover_sources, extract_pages
+
+__all__ = [
+    "Chunk",
+    "IngestCheckpoint",
+    "IngestPipeline",
+    "IngestReport",
+    "IngestSettings",
+    "ReingestPlan",
+    "SourceDocument",
+    "SourcePage",
+    "apply_reingest",
+    "chunk_page",
+    "discover_sources",
+    "extract_pages",
+    "load_ingest_settings",
+    "plan_reingest",
+    "split_text",
+]
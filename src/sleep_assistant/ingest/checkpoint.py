@@ -0,0 +1,67 @@
+"""JSON checkpoint recording which documents an ingest run has fully written."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Version 2 fingerprints include the embedding model and chunking parameters.
+_VERSION = 2
+
+
+class IngestCheckpoint:
+    """Map of completed document names to the fingerprint they had when ingested.
+
+    The pipeline's fingerprint covers the file, the embedding model and the
+    chunking parameters, so changing any of them re-ingests the document.
+
+    A document is recorded only after every one of its chunks has been written, so
+    a crashed run resumes by re-processing at most the documents in flight. Chunk
+    ids are deterministic, which makes re-writing those documents idempotent.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._completed: Dict[str, str] = {}
+        if path.exists():
+            try:
+                payload = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                logger.warning("Ignoring unreadable ingest checkpoint at %s.", path, exc_info=True)
+            else:
+                if payload.get("version") == _VERSION:
+                    self._completed = dict(payload.get("completed", {}))
+
+    def __len__(self) -> int:
+        return len(self._completed)
+
+    def is_complete(self, name: str, fingerprint: str) -> bool:
+        return self._completed.get(name) == fingerprint
+
+    def mark_complete(self, name: str, fingerprint: str) -> None:
+        self._completed[name] = fingerprint
+        self.save()
+
+    def save(self) -> None:
+        """Write atomically so a crash never leaves a truncated checkpoint."""
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(self.path.suffix + ".tmp")
+        temporary.write_text(
+            json.dumps({"version": _VERSION, "completed": self._completed}, indent=0, sort_keys=True),
+            encoding="utf-8",
+        )
+        os.replace(temporary, self.path)
+
+    def reset(self) -> None:
+        self._completed.clear()
+        if self.path.exists():
+            self.path.unlink()
+
+
+__all__ = ["IngestCheckpoint"]
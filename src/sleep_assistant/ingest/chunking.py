@@ -0,0 +1,151 @@
+"""Split extracted pages into overlapping chunks with deterministic ids."""
+
+from __future__ import annotations
+
+import hashlib
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator
+
+from sleep_assistant.ingest.sources import SourcePage
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_CHUNK_OVERLAP = 150
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """One embeddable piece of a page."""
+
+    id: str
+    source_document: str
+    page_number: int
+    chunk_index: int
+    text: str
+
+    @property
+    def content_hash(self) -> str:
+        return content_hash(self.text)
+
+    def to_document(self, *, embedding_model: str, params: Dict[str, int]) -> Dict[str, Any]:
+        """Return the MongoDB fields stored alongside the embedding.
+
+        The content hash, model and chunking parameters let a later incremental
+        ingest tell whether the stored embedding is still valid.
+        """
+
+        return {
+            "_id": self.id,
+            "text": self.text,
+            "source_document": self.source_document,
+            "page_number": self.page_number,
+            "chunk_index": self.chunk_index,
+            "content_hash": self.content_hash,
+            "embedding_model": embedding_model,
+            "chunk_params": params,
+        }
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_params(chunk_size: int, overlap: int) -> Dict[str, int]:
+    """Chunking parameters as stored on each chunk."""
+
+    return {"size": chunk_size, "overlap": overlap}
+
+
+def chunk_id(source_document: str, page_number: int, chunk_index: int) -> str:
+    """Stable id so re-running an ingest overwrites rather than duplicates chunks."""
+
+    key = f"{source_document}\x00{page_number}\x00{chunk_index}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def _overlap_tail(text: str, overlap: int) -> str:
+    """The last ``overlap`` characters of ``text``, without a leading partial word."""
+
+    if overlap <= 0 or not text:
+        return ""
+    if len(text) <= overlap:
+        return text
+    tail = text[-overlap:]
+    if text[-overlap - 1] != " ":
+        space = tail.find(" ")
+        tail = tail[space + 1 :] if space != -1 else ""
+    return tail
+
+
+def split_text(text: str, *, chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP) -> list[str]:
+    """Split ``text`` into chunks of at most ``chunk_size`` characters.
+
+    Boundaries are content-defined: once a chunk is half full it ends after the
+    first word whose hash hits a fixed pattern, or when the next word would not
+    fit. An edit therefore only moves the boundaries near it, and the chunks after
+    it come out identical, which lets incremental ingest reuse their embeddings.
+    Each chunk after the first starts with about ``overlap`` characters from the
+    end of the previous one.
+    """
+
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive.")
+    overlap = min(max(overlap, 0), chunk_size // 2)
+    body_max = max(chunk_size - overlap - (1 if overlap else 0), 1)
+    body_min = body_max // 2
+    # Expect a cut roughly a quarter of a window after the minimum (about six characters per word).
+    divisor = max(2, body_max // 24)
+
+    bodies: list[str] = []
+    current: list[str] = []
+    length = 0
+    for word in text.split():
+        if current and length + 1 + len(word) > body_max:
+            bodies.append(" ".join(current))
+            current, length = [], 0
+        if len(word) > body_max:
+            bodies.extend(word[start : start + body_max] for start in range(0, len(word), body_max))
+            continue
+        length += len(word) + (1 if current else 0)
+        current.append(word)
+        if length >= body_min and zlib.crc32(word.encode("utf-8")) % divisor == 0:
+            bodies.append(" ".join(current))
+            current, length = [], 0
+    if current:
+        bodies.append(" ".join(current))
+
+    pieces: list[str] = []
+    for index, body in enumerate(bodies):
+        tail = _overlap_tail(bodies[index - 1], overlap) if index else ""
+        pieces.append(f"{tail} {body}" if tail else body)
+    return pieces
+
+
+def chunk_page(
+    page: SourcePage,
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    overlap: int = DEFAULT_CHUNK_OVERLAP,
+) -> Iterator[Chunk]:
+    """Yield the chunks of one page in order."""
+
+    for index, text in enumerate(split_text(page.text, chunk_size=chunk_size, overlap=overlap)):
+        yield Chunk(
+            id=chunk_id(page.source_document, page.page_number, index),
+            source_document=page.source_document,
+            page_number=page.page_number,
+            chunk_index=index,
+            text=text,
+        )
+
+
+__all__ = [
+    "Chunk",
+    "DEFAULT_CHUNK_OVERLAP",
+    "DEFAULT_CHUNK_SIZE",
+    "chunk_id",
+    "chunk_page",
+    "chunk_params",
+    "content_hash",
+    "split_text",
+]
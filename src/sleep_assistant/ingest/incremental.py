@@ -0,0 +1,208 @@
+"""Incremental re-ingestion: embed only chunks whose content, model or chunking changed."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Sequence
+
+from langchain_core.embeddings import Embeddings
+from pymongo import DeleteMany, ReplaceOne
+from pymongo.asynchronous.collection import AsyncCollection
+
+from sleep_assistant.ingest.chunking import Chunk, chunk_page, chunk_params
+from sleep_assistant.ingest.pipeline import IngestSettings
+from sleep_assistant.ingest.sources import SourceDocument, extract_pages
+
+logger = logging.getLogger(__name__)
+
+_STATE_PROJECTION = {"_id": 1, "source_document": 1, "content_hash": 1, "embedding_model": 1, "chunk_params": 1}
+# Rough OpenAI tokenizer ratio, good enough for a cost estimate.
+_CHARS_PER_TOKEN = 4
+# Ids per $in filter; keeps each DeleteMany / find well under the 16 MB BSON limit.
+_ID_BATCH_SIZE = 10_000
+
+
+@dataclass
+class ReingestPlan:
+    """Diff between the chunks on disk and the chunks stored in the collection."""
+
+    embedding_model: str
+    params: Dict[str, int]
+    new: list[Chunk] = field(default_factory=list)
+    changed: list[Chunk] = field(default_factory=list)
+    unchanged: int = 0
+    unchanged_chars: int = 0
+    deleted_ids: list[str] = field(default_factory=list)
+    documents: int = 0
+    # New/changed chunk id -> stored chunk id with the same text and model, whose vector is copied.
+    reuse: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def to_write(self) -> list[Chunk]:
+        return self.new + self.changed
+
+    @property
+    def to_embed(self) -> list[Chunk]:
+        return [chunk for chunk in self.to_write if chunk.id not in self.reuse]
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts for the dry-run report; ``embeddings_saved`` covers unchanged and reused chunks."""
+
+        return {
+            "documents": self.documents,
+            "new": len(self.new),
+            "changed": len(self.changed),
+            "unchanged": self.unchanged,
+            "deleted": len(self.deleted_ids),
+            "reused": len(self.reuse),
+            "embeddings_saved": self.unchanged + len(self.reuse),
+            "approx_tokens_saved": (self.unchanged_chars + self._reused_chars()) // _CHARS_PER_TOKEN,
+            "approx_tokens_to_embed": sum(len(chunk.text) for chunk in self.to_embed) // _CHARS_PER_TOKEN,
+        }
+
+    def _reused_chars(self) -> int:
+        return sum(len(chunk.text) for chunk in self.to_write if chunk.id in self.reuse)
+
+
+async def _extract_chunks(document: SourceDocument, settings: IngestSettings) -> list[Chunk]:
+    pages = extract_pages(document, ocr=settings.ocr)
+    chunks: list[Chunk] = []
+    while (page := await asyncio.to_thread(next, pages, None)) is not None:
+        chunks.extend(chunk_page(page, chunk_size=settings.chunk_size, overlap=settings.chunk_overlap))
+    return chunks
+
+
+async def _load_vectors(collection: AsyncCollection, ids: list[str], embedding_field: str) -> Dict[str, list[float]]:
+    vectors: Dict[str, list[float]] = {}
+    for start in range(0, len(ids), _ID_BATCH_SIZE):
+        batch = ids[start : start + _ID_BATCH_SIZE]
+        async for doc in collection.find({"_id": {"$in": batch}}, {embedding_field: 1}):
+            if doc.get(embedding_field):
+                vectors[doc["_id"]] = doc[embedding_field]
+    return vectors
+
+
+async def plan_reingest(
+    documents: Sequence[SourceDocument],
+    collection: AsyncCollection,
+    *,
+    embedding_model: str,
+    settings: IngestSettings,
+    prune: bool = False,
+) -> ReingestPlan:
+    """Chunk ``documents`` and compare every chunk with its stored counterpart.
+
+    A stored chunk is reused only when its content hash, embedding model and
+    chunking parameters all match. Chunk ids are positional, so an edit near the
+    top of a file shifts every later chunk; a new or changed chunk whose text
+    matches any stored chunk embedded with the same model copies that vector
+    instead of being re-embedded. Stored chunks of the scanned documents that are
+    no longer produced are deleted; with ``prune``, so are chunks of documents
+    that are no longer on disk at all.
+    """
+
+    params = chunk_params(settings.chunk_size, settings.chunk_overlap)
+    plan = ReingestPlan(embedding_model=embedding_model, params=params, documents=len(documents))
+    names = {document.name for document in documents}
+
+    stored: Dict[str, Dict[str, Any]] = {}
+    cursor = collection.find({"source_document": {"$in": sorted(names)}}, _STATE_PROJECTION)
+    async for doc in cursor:
+        stored[doc["_id"]] = doc
+
+    by_hash = {
+        doc["content_hash"]: chunk_id
+        for chunk_id, doc in stored.items()
+        if doc.get("content_hash") and doc.get("embedding_model") == embedding_model
+    }
+
+    seen: set[str] = set()
+    for document in documents:
+        for chunk in await _extract_chunks(document, settings):
+            seen.add(chunk.id)
+            previous = stored.get(chunk.id)
+            if previous is None:
+                plan.new.append(chunk)
+            elif (
+                previous.get("content_hash") == chunk.content_hash
+                and previous.get("embedding_model") == embedding_model
+                and previous.get("chunk_params") == params
+            ):
+                plan.unchanged += 1
+                plan.unchanged_chars += len(chunk.text)
+                continue
+            else:
+                plan.changed.append(chunk)
+            source_id = by_hash.get(chunk.content_hash)
+            if source_id is not None:
+                plan.reuse[chunk.id] = source_id
+
+    plan.deleted_ids = [chunk_id for chunk_id in stored if chunk_id not in seen]
+    if prune:
+        missing = [name for name in await collection.distinct("source_document") if name not in names]
+        if missing:
+            async for doc in collection.find({"source_document": {"$in": missing}}, {"_id": 1}):
+                plan.deleted_ids.append(doc["_id"])
+    return plan
+
+
+async def apply_reingest(
+    plan: ReingestPlan,
+    embedder: Embeddings,
+    collection: AsyncCollection,
+    *,
+    embedding_field: str = "embedding",
+    settings: IngestSettings,
+) -> Dict[str, Any]:
+    """Embed the new and changed chunks, then apply every upsert and delete in one ``bulk_write``.
+
+    Vectors planned for reuse are read before the write, since their source chunk
+    may itself be replaced or deleted by it.
+    """
+
+    started = time.perf_counter()
+    stored_vectors = await _load_vectors(collection, sorted(set(plan.reuse.values())), embedding_field)
+    vectors: Dict[str, list[float]] = {}
+    for chunk_id, source_id in plan.reuse.items():
+        if source_id in stored_vectors:
+            vectors[chunk_id] = stored_vectors[source_id]
+    chunks = [chunk for chunk in plan.to_write if chunk.id not in vectors]
+    semaphore = asyncio.Semaphore(max(1, settings.embed_concurrency))
+
+    async def embed(batch: list[Chunk]) -> list[list[float]]:
+        async with semaphore:
+            return await embedder.aembed_documents([chunk.text for chunk in batch])
+
+    batches = [chunks[start : start + settings.batch_size] for start in range(0, len(chunks), settings.batch_size)]
+    for batch, embedded in zip(batches, await asyncio.gather(*(embed(batch) for batch in batches))):
+        vectors.update((chunk.id, vector) for chunk, vector in zip(batch, embedded))
+
+    operations: list[Any] = [
+        ReplaceOne(
+            {"_id": chunk.id},
+            {
+                **chunk.to_document(embedding_model=plan.embedding_model, params=plan.params),
+                embedding_field: vectors[chunk.id],
+            },
+            upsert=True,
+        )
+        for chunk in plan.to_write
+    ]
+    operations.extend(
+        DeleteMany({"_id": {"$in": plan.deleted_ids[start : start + _ID_BATCH_SIZE]}})
+        for start in range(0, len(plan.deleted_ids), _ID_BATCH_SIZE)
+    )
+    if operations:
+        result = await collection.bulk_write(operations, ordered=False)
+        logger.info(
+            "Re-ingest wrote %d upserts/replacements and deleted %d chunks.",
+            result.upserted_count + result.modified_count,
+            result.deleted_count,
+        )
+    return {**plan.summary(), "elapsed_seconds": round(time.perf_counter() - started, 2)}
+
+
+__all__ = ["ReingestPlan", "apply_reingest", "plan_reingest"]
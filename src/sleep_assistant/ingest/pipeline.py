@@ -0,0 +1,275 @@
+"""Streaming ingest: extract -> chunk -> embed -> write, with bounded queues between stages."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Sequence
+
+from langchain_core.embeddings import Embeddings
+from pymongo import ReplaceOne
+from pymongo.asynchronous.collection import AsyncCollection
+
+from sleep_assistant import PROJECT_ROOT
+from sleep_assistant.config import get_bool_env, get_env, get_int_env
+from sleep_assistant.ingest.checkpoint import IngestCheckpoint
+from sleep_assistant.ingest.chunking import (
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_CHUNK_SIZE,
+    Chunk,
+    chunk_page,
+    chunk_params,
+)
+from sleep_assistant.ingest.sources import SourceDocument, extract_pages
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_PATH = Path("data") / "ingest_checkpoint.json"
+_PROGRESS_INTERVAL_SECONDS = 5.0
+_DONE = None
+
+
+@dataclass(frozen=True)
+class IngestSettings:
+    """Chunking, batching and concurrency knobs for one ingest run."""
+
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP
+    batch_size: int = 64
+    embed_concurrency: int = 4
+    write_concurrency: int = 2
+    queue_size: int = 512
+    ocr: bool = True
+    checkpoint_path: Path = PROJECT_ROOT / DEFAULT_CHECKPOINT_PATH
+
+
+def load_ingest_settings() -> IngestSettings:
+    """Read the ``INGEST_*`` configuration from the environment."""
+
+    defaults = IngestSettings()
+    raw_path = get_env("INGEST_CHECKPOINT_PATH")
+    checkpoint_path = Path(raw_path) if raw_path else defaults.checkpoint_path
+    return IngestSettings(
+        chunk_size=get_int_env("INGEST_CHUNK_SIZE", defaults.chunk_size) or defaults.chunk_size,
+        chunk_overlap=get_int_env("INGEST_CHUNK_OVERLAP", defaults.chunk_overlap) or 0,
+        batch_size=get_int_env("INGEST_BATCH_SIZE", defaults.batch_size) or defaults.batch_size,
+        embed_concurrency=get_int_env("INGEST_EMBED_CONCURRENCY", defaults.embed_concurrency)
+        or defaults.embed_concurrency,
+        write_concurrency=get_int_env("INGEST_WRITE_CONCURRENCY", defaults.write_concurrency)
+        or defaults.write_concurrency,
+        queue_size=get_int_env("INGEST_QUEUE_SIZE", defaults.queue_size) or defaults.queue_size,
+        ocr=get_bool_env("INGEST_OCR", defaults.ocr),
+        checkpoint_path=checkpoint_path if checkpoint_path.is_absolute() else PROJECT_ROOT / checkpoint_path,
+    )
+
+
+@dataclass
+class IngestReport:
+    """Counters for a finished (or interrupted) run."""
+
+    documents: int = 0
+    skipped_documents: int = 0
+    pages: int = 0
+    chunks: int = 0
+    embedded: int = 0
+    written: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.written / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "documents": self.documents,
+            "skipped_documents": self.skipped_documents,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "embedded": self.embedded,
+            "written": self.written,
+            "elapsed_seconds": round(self.elapsed_seconds, 2),
+            "chunks_per_second": round(self.chunks_per_second, 1),
+        }
+
+
+@dataclass
+class _DocumentProgress:
+    fingerprint: str
+    chunk_ids: set[str] = field(default_factory=set)
+    produced: int = 0
+    written: int = 0
+    extracted: bool = False
+
+
+@dataclass
+class _Batch:
+    chunks: list[Chunk]
+    vectors: list[list[float]] = field(default_factory=list)
+
+
+class IngestPipeline:
+    """Stream documents into the vector collection.
+
+    Each stage runs as its own task and hands work downstream over a bounded
+    ``asyncio.Queue``, so a slow stage (usually embedding) makes the stages before
+    it wait instead of buffering the whole corpus in memory. Embedding calls and
+    ``bulk_write`` calls are capped at ``embed_concurrency`` / ``write_concurrency``
+    in flight; writes are unordered upserts keyed by deterministic chunk ids.
+    Once a document is fully written, its stored chunks that this run did not
+    produce (left over from an older version of the file) are deleted.
+    """
+
+    def __init__(
+        self,
+        embedder: Embeddings,
+        collection: AsyncCollection,
+        *,
+        embedding_model: str,
+        embedding_field: str = "embedding",
+        settings: IngestSettings | None = None,
+        checkpoint: IngestCheckpoint | None = None,
+    ) -> None:
+        self._embedder = embedder
+        self._collection = collection
+        self._embedding_model = embedding_model
+        self._embedding_field = embedding_field
+        self._settings = settings or IngestSettings()
+        self._chunk_params = chunk_params(self._settings.chunk_size, self._settings.chunk_overlap)
+        self._checkpoint = checkpoint
+        self._progress: Dict[str, _DocumentProgress] = {}
+        self._report = IngestReport()
+        self._started = 0.0
+        self._last_progress_log = 0.0
+
+    async def run(self, documents: Sequence[SourceDocument]) -> IngestReport:
+        """Ingest ``documents``, skipping those the checkpoint already records."""
+
+        settings = self._settings
+        chunk_queue: asyncio.Queue[Chunk | None] = asyncio.Queue(maxsize=settings.queue_size)
+        batch_queue: asyncio.Queue[_Batch | None] = asyncio.Queue(maxsize=settings.embed_concurrency * 2)
+        write_queue: asyncio.Queue[_Batch | None] = asyncio.Queue(maxsize=settings.write_concurrency * 2)
+
+        self._started = self._last_progress_log = time.perf_counter()
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(self._extract(documents, chunk_queue))
+                group.create_task(self._batch(chunk_queue, batch_queue))
+                embedders = [
+                    group.create_task(self._embed(batch_queue, write_queue)) for _ in range(settings.embed_concurrency)
+                ]
+                writers = [group.create_task(self._write(write_queue)) for _ in range(settings.write_concurrency)]
+                await asyncio.gather(*embedders)
+                for _ in writers:
+                    await write_queue.put(_DONE)
+        finally:
+            self._report.elapsed_seconds = time.perf_counter() - self._started
+        return self._report
+
+    async def _extract(self, documents: Sequence[SourceDocument], out: asyncio.Queue) -> None:
+        settings = self._settings
+        for document in documents:
+            fingerprint = self._checkpoint_fingerprint(document)
+            if self._checkpoint is not None and self._checkpoint.is_complete(document.name, fingerprint):
+                self._report.skipped_documents += 1
+                continue
+            progress = self._progress[document.name] = _DocumentProgress(fingerprint=fingerprint)
+            pages = extract_pages(document, ocr=settings.ocr)
+            while True:
+                # Pages are pulled one at a time on a worker thread so PDF parsing and
+                # OCR never block the loop and large files are never held whole.
+                page = await asyncio.to_thread(next, pages, None)
+                if page is None:
+                    break
+                self._report.pages += 1
+                for chunk in chunk_page(page, chunk_size=settings.chunk_size, overlap=settings.chunk_overlap):
+                    progress.chunk_ids.add(chunk.id)
+                    progress.produced += 1
+                    self._report.chunks += 1
+                    await out.put(chunk)
+            progress.extracted = True
+            self._report.documents += 1
+            await self._maybe_complete(document.name)
+        await out.put(_DONE)
+
+    async def _batch(self, source: asyncio.Queue, out: asyncio.Queue) -> None:
+        pending: list[Chunk] = []
+        while True:
+            chunk = await source.get()
+            if chunk is _DONE:
+                break
+            pending.append(chunk)
+            if len(pending) >= self._settings.batch_size:
+                await out.put(_Batch(pending))
+                pending = []
+        if pending:
+            await out.put(_Batch(pending))
+        for _ in range(self._settings.embed_concurrency):
+            await out.put(_DONE)
+
+    async def _embed(self, source: asyncio.Queue, out: asyncio.Queue) -> None:
+        while True:
+            batch = await source.get()
+            if batch is _DONE:
+                return
+            batch.vectors = await self._embedder.aembed_documents([chunk.text for chunk in batch.chunks])
+            self._report.embedded += len(batch.chunks)
+            await out.put(batch)
+
+    async def _write(self, source: asyncio.Queue) -> None:
+        while True:
+            batch = await source.get()
+            if batch is _DONE:
+                return
+            operations = [
+                ReplaceOne(
+                    {"_id": chunk.id},
+                    {
+                        **chunk.to_document(embedding_model=self._embedding_model, params=self._chunk_params),
+                        self._embedding_field: vector,
+                    },
+                    upsert=True,
+                )
+                for chunk, vector in zip(batch.chunks, batch.vectors)
+            ]
+            await self._collection.bulk_write(operations, ordered=False)
+            self._report.written += len(operations)
+            for chunk in batch.chunks:
+                self._progress[chunk.source_document].written += 1
+            for name in {chunk.source_document for chunk in batch.chunks}:
+                await self._maybe_complete(name)
+            self._log_progress()
+
+    def _checkpoint_fingerprint(self, document: SourceDocument) -> str:
+        """The file fingerprint plus the model and chunking, so changing either re-ingests."""
+
+        params = self._chunk_params
+        return f"{document.fingerprint()}:{self._embedding_model}:{params['size']}:{params['overlap']}"
+
+    async def _maybe_complete(self, name: str) -> None:
+        progress = self._progress.get(name)
+        if progress is None or not progress.extracted or progress.written < progress.produced:
+            return
+        del self._progress[name]
+        # A shorter new version of the file leaves chunks that would otherwise stay searchable.
+        await self._collection.delete_many({"source_document": name, "_id": {"$nin": sorted(progress.chunk_ids)}})
+        if self._checkpoint is not None:
+            self._checkpoint.mark_complete(name, progress.fingerprint)
+
+    def _log_progress(self) -> None:
+        now = time.perf_counter()
+        if now - self._last_progress_log < _PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_progress_log = now
+        elapsed = now - self._started
+        logger.info(
+            "Ingested %d chunks from %d documents (%.1f chunks/s).",
+            self._report.written,
+            self._report.documents,
+            self._report.written / elapsed if elapsed else 0.0,
+        )
+
+
+__all__ = ["IngestPipeline", "IngestReport", "IngestSettings", "load_ingest_settings"]
@@ -0,0 +1,121 @@
+"""Discover source documents and extract their text page by page."""
+
+from __future__ import annotations
+
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from sleep_assistant import PROJECT_ROOT
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_SUFFIXES = (".pdf", ".txt", ".md")
+# Pages with less extractable text than this are treated as scanned images.
+_OCR_MIN_CHARS = 20
+_OCR_DPI = 300
+
+
+@dataclass(frozen=True)
+class SourceDocument:
+    """A file to ingest, identified by its path relative to the ingest root."""
+
+    path: Path
+    name: str
+
+    def fingerprint(self) -> str:
+        """Size and modification time; a changed file gets a new fingerprint."""
+
+        stat = self.path.stat()
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+@dataclass(frozen=True)
+class SourcePage:
+    """Extracted text of one page (plain-text files are a single page)."""
+
+    source_document: str
+    page_number: int
+    text: str
+
+
+def _default_root(paths: list[Path]) -> Path:
+    """The project root when every path is inside it, else the paths' common directory."""
+
+    if all(path.is_relative_to(PROJECT_ROOT) for path in paths):
+        return PROJECT_ROOT
+    return Path(os.path.commonpath([path if path.is_dir() else path.parent for path in paths]))
+
+
+def discover_sources(paths: Iterable[Path], *, root: Path | None = None) -> list[SourceDocument]:
+    """Expand files and directories into supported documents, sorted by name.
+
+    Names are relative to ``root`` (see :func:`_default_root` when omitted), so a
+    file keeps the same ``source_document`` however it was reached.
+    """
+
+    resolved = [path.resolve() for path in paths]
+    for path in resolved:
+        if not path.exists():
+            raise SystemExit(f"Ingest path does not exist: {path}")
+    base = root.resolve() if root is not None else _default_root(resolved)
+    documents: dict[str, SourceDocument] = {}
+    for entry in resolved:
+        if not entry.is_relative_to(base):
+            raise SystemExit(f"Ingest path {entry} is outside the ingest root {base}; pass --root.")
+        candidates = [entry] if entry.is_file() else [path for path in entry.rglob("*") if path.is_file()]
+        for path in candidates:
+            if path.suffix.lower() not in SUPPORTED_SUFFIXES:
+                continue
+            name = path.relative_to(base).as_posix()
+            existing = documents.get(name)
+            if existing is not None and existing.path.resolve() != path.resolve():
+                raise SystemExit(f"Ingest documents {existing.path} and {path} both map to the name {name!r}.")
+            documents[name] = SourceDocument(path=path, name=name)
+    return [documents[name] for name in sorted(documents)]
+
+
+def _open_pdf(path: Path):
+    try:
+        import pymupdf  # type: ignore[import-not-found]
+    except ImportError as exc:
+        raise SystemExit("PDF ingestion requires PyMuPDF: pip install pymupdf") from exc
+    return pymupdf.open(path)
+
+
+def _ocr_page(page) -> str | None:
+    """Run Tesseract over a rendered page, or return None when OCR is unavailable."""
+
+    try:
+        import pytesseract  # type: ignore[import-not-found]
+        from PIL import Image
+    except ImportError:
+        logger.warning("Skipping OCR: install pytesseract and Pillow to read scanned pages.")
+        return None
+    pixmap = page.get_pixmap(dpi=_OCR_DPI)
+    image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+    return pytesseract.image_to_string(image)
+
+
+def extract_pages(document: SourceDocument, *, ocr: bool = True) -> Iterator[SourcePage]:
+    """Yield the text of ``document`` one page at a time.
+
+    PDF pages without a text layer fall back to Tesseract OCR when ``ocr`` is set.
+    """
+
+    if document.path.suffix.lower() != ".pdf":
+        text = document.path.read_text(encoding="utf-8", errors="replace")
+        yield SourcePage(source_document=document.name, page_number=1, text=text)
+        return
+
+    with _open_pdf(document.path) as pdf:
+        for index, page in enumerate(pdf):
+            text = page.get_text()
+            if ocr and len(text.strip()) < _OCR_MIN_CHARS:
+                text = _ocr_page(page) or text
+            yield SourcePage(source_document=document.name, page_number=index + 1, text=text)
+
+
+__all__ = ["SUPPORTED_SUFFIXES", "SourceDocument", "SourcePage", "discover_sources", "extract_pages"]
@@ -0,0 +1,34 @@
+"""Registry of runtime statistics providers exposed by the API."""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+StatsProvider = Callable[[], Dict[str, Any]]
+
+_PROVIDERS: Dict[str, StatsProvider] = {}
+
+
+def register_stats_provider(name: str, provider: StatsProvider) -> None:
+    """Publish ``provider`` under ``name``; re-registering replaces the old provider."""
+
+    _PROVIDERS[name] = provider
+
+
+def collect_stats() -> Dict[str, Any]:
+    """Return a snapshot from every registered provider."""
+
+    snapshot: Dict[str, Any] = {}
+    for name, provider in list(_PROVIDERS.items()):
+        try:
+            snapshot[name] = provider()
+        except Exception:  # noqa: BLE001
+            logger.exception("Stats provider '%s' failed.", name)
+            snapshot[name] = {"error": "unavailable"}
+    return snapshot
+
+
+__all__ = ["StatsProvider", "collect_stats", "register_stats_provider"]
@@ -2,8 +2,33 @@
 
 from __future__ import annotations
 
+from .answer_cache import build_answer_cache
+from .ivf_index import IVFVectorStore
 from .llm import build_chat_models, build_embedder
-from .mongodb_client import create_mongodb_client
-from .vectorstore import build_mongo_vector_store
+from .local_vectorstore import LocalVectorStore
+from .single_flight import build_single_flight
+from .mongodb_client import (
+    close_async_mongodb_clients,
+    create_async_mongodb_client,
+    create_mongodb_client,
+    prewarm_async_mongodb_clients,
+)
+from .vector_snapshot import SnapshotVectorStore
+from .vectorstore import build_mongo_vector_store, build_vector_store, open_async_vector_stores
 
-__all__ = ["build_chat_models", "build_embedder", "create_mongodb_client", "build_mongo_vector_store"]
+__all__ = [
+    "IVFVectorStore",
+    "LocalVectorStore",
+    "SnapshotVectorStore",
+    "build_answer_cache",
+    "build_chat_models",
+    "build_embedder",
+    "build_single_flight",
+    "close_async_mongodb_clients",
+    "create_async_mongodb_client",
+    "create_mongodb_client",
+    "prewarm_async_mongodb_clients",
+    "build_mongo_vector_store",
+    "build_vector_store",
+    "open_async_vector_stores",
+]
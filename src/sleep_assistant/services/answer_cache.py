@@ -0,0 +1,164 @@
+"""Semantic cache for generated sleep answers."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from sleep_assistant.config import get_bool_env, get_float_env, get_int_env
+from sleep_assistant.metrics import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANSWER_CACHE_THRESHOLD = 0.95
+DEFAULT_ANSWER_CACHE_TTL_SECONDS = 3600
+DEFAULT_ANSWER_CACHE_MAX_ENTRIES = 1024
+
+
+def document_set_signature(retrievals: Iterable[Mapping[str, Any]]) -> str:
+    """Return an order-independent fingerprint of the retrieved snippets."""
+
+    parts = sorted(
+        "|".join(
+            (
+                str(item.get("source_document") or ""),
+                str(item.get("page_number") or ""),
+                hashlib.sha1(str(item.get("text") or "").encode("utf-8")).hexdigest(),
+            )
+        )
+        for item in retrievals
+    )
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _CacheEntry:
+    answer: str
+    signature: str
+    created: float
+
+
+class SemanticAnswerCache:
+    """Reuse answers for paraphrased questions that retrieve the same documents.
+
+    Query embeddings live in a preallocated, row-normalized float32 matrix used as a
+    ring buffer, so a lookup is one matrix-vector product. A hit requires cosine
+    similarity at or above ``threshold``, an identical document-set signature and an
+    entry younger than ``ttl_seconds``.
+    """
+
+    def __init__(
+        self,
+        *,
+        threshold: float = DEFAULT_ANSWER_CACHE_THRESHOLD,
+        ttl_seconds: float | None = DEFAULT_ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = DEFAULT_ANSWER_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._threshold = threshold
+        self._ttl = ttl_seconds or None
+        self._max_entries = max(max_entries, 1)
+        self._clock = clock
+        self._matrix: Optional[np.ndarray] = None
+        self._entries: List[Optional[_CacheEntry]] = [None] * self._max_entries
+        self._size = 0
+        self._next_slot = 0
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "stores": 0, "expired": 0}
+
+    @staticmethod
+    def _unit(vector: Sequence[float]) -> Optional[np.ndarray]:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(array))
+        return array / norm if norm else None
+
+    def lookup(self, vector: Sequence[float], signature: str) -> Optional[str]:
+        """Return a cached answer for a similar question over the same documents."""
+
+        query = self._unit(vector)
+        with self._lock:
+            if query is None or self._matrix is None or self._size == 0 or query.shape[0] != self._matrix.shape[1]:
+                self._counts["misses"] += 1
+                return None
+
+            scores = self._matrix[: self._size] @ query
+            candidates = np.flatnonzero(scores >= self._threshold)
+            now = self._clock()
+            for slot in candidates[np.argsort(-scores[candidates])].tolist():
+                entry = self._entries[slot]
+                if entry is None or entry.signature != signature:
+                    continue
+                if self._ttl is not None and now - entry.created > self._ttl:
+                    self._entries[slot] = None
+                    self._matrix[slot] = 0.0
+                    self._counts["expired"] += 1
+                    continue
+                self._counts["hits"] += 1
+                return entry.answer
+
+            self._counts["misses"] += 1
+            return None
+
+    def store(self, vector: Sequence[float], signature: str, answer: str) -> None:
+        """Remember ``answer``, overwriting the oldest entry once the cache is full."""
+
+        unit = self._unit(vector)
+        if unit is None or not answer:
+            return
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != unit.shape[0]:
+                self._matrix = np.zeros((self._max_entries, unit.shape[0]), dtype=np.float32)
+                self._entries = [None] * self._max_entries
+                self._size = 0
+                self._next_slot = 0
+            slot = self._next_slot
+            self._matrix[slot] = unit
+            self._entries[slot] = _CacheEntry(answer=answer, signature=signature, created=self._clock())
+            self._next_slot = (slot + 1) % self._max_entries
+            self._size = min(self._size + 1, self._max_entries)
+            self._counts["stores"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and configuration."""
+
+        with self._lock:
+            counts = dict(self._counts)
+            size = self._size
+        lookups = counts["hits"] + counts["misses"]
+        return {
+            **counts,
+            "hit_rate": (counts["hits"] / lookups) if lookups else 0.0,
+            "entries": size,
+            "max_entries": self._max_entries,
+            "threshold": self._threshold,
+            "ttl_seconds": self._ttl,
+        }
+
+
+def build_answer_cache() -> Optional[SemanticAnswerCache]:
+    """Create the answer cache when ``ANSWER_CACHE_ENABLED`` is set."""
+
+    if not get_bool_env("ANSWER_CACHE_ENABLED"):
+        return None
+
+    threshold = get_float_env("ANSWER_CACHE_THRESHOLD", DEFAULT_ANSWER_CACHE_THRESHOLD) or 0.0
+    if not 0.0 < threshold <= 1.0:
+        raise SystemExit("ANSWER_CACHE_THRESHOLD must be between 0 and 1.")
+    cache = SemanticAnswerCache(
+        threshold=threshold,
+        ttl_seconds=get_int_env("ANSWER_CACHE_TTL_SECONDS", DEFAULT_ANSWER_CACHE_TTL_SECONDS),
+        max_entries=get_int_env("ANSWER_CACHE_MAX_ENTRIES", DEFAULT_ANSWER_CACHE_MAX_ENTRIES)
+        or DEFAULT_ANSWER_CACHE_MAX_ENTRIES,
+    )
+    register_stats_provider("answer_cache", cache.stats)
+    logger.info("Semantic answer cache enabled (threshold %.2f).", threshold)
+    return cache
+
+
+__all__ = ["SemanticAnswerCache", "build_answer_cache", "document_set_signature"]
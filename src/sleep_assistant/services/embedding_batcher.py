@@ -0,0 +1,162 @@
+"""Coalesce concurrent single-query embedding calls into batched requests."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_MAX_WAIT_MS = 5.0
+DEFAULT_MAX_BATCH = 64
+
+
+@dataclass
+class _SyncSlot:
+    text: str
+    done: threading.Event = field(default_factory=threading.Event)
+    vector: Optional[List[float]] = None
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class _AsyncWindow:
+    pending: List[tuple[str, asyncio.Future]] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+    tasks: set[asyncio.Task] = field(default_factory=set)
+
+
+class BatchingEmbeddings(Embeddings):
+    """Embeddings wrapper that micro-batches ``embed_query`` / ``aembed_query``.
+
+    The first query in a window waits up to ``max_wait_ms`` for others to arrive
+    (or until ``max_batch`` are queued), then a single ``embed_documents`` request
+    serves them all. Identical texts within a window are embedded once. Document
+    embedding calls pass straight through; they are batched already.
+    """
+
+    def __init__(
+        self,
+        inner: Embeddings,
+        *,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        max_batch: int = DEFAULT_MAX_BATCH,
+    ) -> None:
+        self.inner = inner
+        self._max_wait = max(max_wait_ms, 0.0) / 1000.0
+        self._max_batch = max(max_batch, 1)
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._pending: List[_SyncSlot] = []
+        self._windows: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _AsyncWindow]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._counts = {"queries": 0, "requests": 0, "failed_requests": 0, "max_batch_seen": 0}
+
+    def _record_request(self, size: int) -> None:
+        with self._lock:
+            self._counts["requests"] += 1
+            self._counts["max_batch_seen"] = max(self._counts["max_batch_seen"], size)
+
+    def _record_failure(self) -> None:
+        with self._lock:
+            self._counts["failed_requests"] += 1
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.inner.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        slot = _SyncSlot(text)
+        with self._ready:
+            self._counts["queries"] += 1
+            self._pending.append(slot)
+            leader = len(self._pending) == 1
+            if not leader:
+                self._ready.notify_all()
+            else:
+                # The first caller of a window collects followers, then embeds for everyone.
+                self._ready.wait_for(lambda: len(self._pending) >= self._max_batch, timeout=self._max_wait)
+                batch, self._pending = self._pending, []
+        if leader:
+            self._run_sync_batch(batch)
+        slot.done.wait()
+        if slot.error is not None:
+            raise slot.error
+        return slot.vector  # type: ignore[return-value]
+
+    def _run_sync_batch(self, batch: List[_SyncSlot]) -> None:
+        texts = list(dict.fromkeys(slot.text for slot in batch))
+        self._record_request(len(texts))
+        try:
+            by_text = dict(zip(texts, self.inner.embed_documents(texts)))
+        except BaseException as exc:  # noqa: BLE001 - every waiter must be released
+            self._record_failure()
+            for slot in batch:
+                slot.error = exc
+                slot.done.set()
+            return
+        for slot in batch:
+            slot.vector = by_text[slot.text]
+            slot.done.set()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        window = self._windows.get(loop)
+        if window is None:
+            window = self._windows[loop] = _AsyncWindow()
+        future: asyncio.Future = loop.create_future()
+        window.pending.append((text, future))
+        with self._lock:
+            self._counts["queries"] += 1
+        if len(window.pending) >= self._max_batch:
+            self._flush(window)
+        elif window.timer is None:
+            window.timer = loop.call_later(self._max_wait, self._flush, window)
+        return await future
+
+    def _flush(self, window: _AsyncWindow) -> None:
+        if window.timer is not None:
+            window.timer.cancel()
+            window.timer = None
+        batch, window.pending = window.pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run_async_batch(batch))
+            window.tasks.add(task)
+            task.add_done_callback(window.tasks.discard)
+
+    async def _run_async_batch(self, batch: List[tuple[str, asyncio.Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self._record_request(len(texts))
+        try:
+            by_text = dict(zip(texts, await self.inner.aembed_documents(texts)))
+        except BaseException as exc:  # noqa: BLE001
+            self._record_failure()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for text, future in batch:
+            # A caller may have been cancelled while the request was in flight.
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def stats(self) -> Dict[str, Any]:
+        """Return query and upstream request counts; their ratio is the batching gain."""
+
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            **counts,
+            "mean_batch_size": (counts["queries"] / counts["requests"]) if counts["requests"] else 0.0,
+            "max_wait_ms": self._max_wait * 1000.0,
+            "max_batch": self._max_batch,
+        }
+
+
+__all__ = ["BatchingEmbeddings", "DEFAULT_MAX_BATCH", "DEFAULT_MAX_WAIT_MS"]
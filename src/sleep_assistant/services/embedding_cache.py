@@ -0,0 +1,293 @@
+"""Caching wrapper for embedding models."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_CACHE_SIZE = 4096
+DEFAULT_DISK_MAX_ENTRIES = 50_000
+# Pruning trims the disk tier to this share of its cap so it does not run on every write.
+_DISK_PRUNE_TARGET = 0.9
+# Other workers write to the same file, so the row count is re-read this often.
+_DISK_RECOUNT_EVERY = 256
+
+
+def normalize_embedding_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different queries share a cache entry."""
+
+    return " ".join(text.split()).casefold()
+
+
+class SQLiteEmbeddingStore:
+    """Persistent embedding tier shared by every worker on the host.
+
+    Vectors are stored as packed float32 blobs; WAL mode lets several processes read
+    while one writes. Each row carries the time it was last read or written; with
+    ``max_entries`` set, the least recently used rows are deleted once the table
+    grows past it.
+    """
+
+    def __init__(self, path: str | Path, *, max_entries: int = DEFAULT_DISK_MAX_ENTRIES) -> None:
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._max_entries = max(max_entries, 0)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self._path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, accessed_at REAL NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "accessed_at" not in columns:
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed_at ON embeddings (accessed_at)")
+        self._rows = self.count()
+        self._writes = 0
+        self.pruned = 0
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        placeholders = ",".join("?" for _ in keys)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys
+            ).fetchall()
+            if rows and self._max_entries:
+                self._conn.execute(
+                    f"UPDATE embeddings SET accessed_at = ? WHERE key IN ({','.join('?' for _ in rows)})",
+                    [time.time(), *(key for key, _ in rows)],
+                )
+        found: Dict[str, List[float]] = {}
+        for key, blob in rows:
+            vector = array("f")
+            vector.frombytes(blob)
+            found[key] = vector.tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, accessed_at) VALUES (?, ?, ?)",
+                [(key, sqlite3.Binary(array("f", vector).tobytes()), now) for key, vector in items.items()],
+            )
+            if self._max_entries:
+                self._rows += len(items)
+                self._writes += 1
+                if self._rows > self._max_entries or self._writes % _DISK_RECOUNT_EVERY == 0:
+                    self._prune()
+
+    def _prune(self) -> None:
+        """Delete the least recently used rows beyond the cap; caller holds the lock."""
+
+        self._rows = int(self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0])
+        if self._rows <= self._max_entries:
+            return
+        excess = self._rows - int(self._max_entries * _DISK_PRUNE_TARGET)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?)",
+            (excess,),
+        )
+        self._rows -= excess
+        self.pruned += excess
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0])
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with an in-process LRU and an optional on-disk tier.
+
+    Keys combine the model name with the normalized input text, so switching
+    ``EMBEDDING_MODEL`` never serves vectors from a different model.
+    """
+
+    def __init__(
+        self,
+        inner: Embeddings,
+        *,
+        model_name: str,
+        max_entries: int = DEFAULT_EMBEDDING_CACHE_SIZE,
+        disk_store: Optional[SQLiteEmbeddingStore] = None,
+    ) -> None:
+        self.inner = inner
+        self.model_name = model_name
+        self._max_entries = max(max_entries, 1)
+        self._memory: OrderedDict[str, List[float]] = OrderedDict()
+        self._disk = disk_store
+        self._lock = threading.Lock()
+        self._counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "disk_errors": 0}
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(f"{self.model_name}\x00{normalize_embedding_text(text)}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+    def _memory_lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self._counts["memory_hits"] += len(found)
+        return found
+
+    def _disk_lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Read ``keys`` from the disk tier; a locked or broken database counts as a miss."""
+
+        if not keys or self._disk is None:
+            return {}
+        try:
+            disk_hits = self._disk.get_many(keys)
+        except sqlite3.Error as exc:
+            logger.warning("Embedding disk cache read failed: %s", exc)
+            with self._lock:
+                self._counts["disk_errors"] += 1
+            return {}
+        with self._lock:
+            for key, vector in disk_hits.items():
+                self._remember(key, vector)
+            self._counts["disk_hits"] += len(disk_hits)
+        return disk_hits
+
+    def _disk_store(self, computed: Dict[str, List[float]]) -> None:
+        if self._disk is None:
+            return
+        try:
+            self._disk.put_many(computed)
+        except sqlite3.Error as exc:
+            logger.warning("Embedding disk cache write skipped: %s", exc)
+            with self._lock:
+                self._counts["disk_errors"] += 1
+
+    def _remember_all(self, computed: Dict[str, List[float]]) -> None:
+        with self._lock:
+            for key, vector in computed.items():
+                self._remember(key, vector)
+
+    def _missing(self, keys: List[str], texts: List[str], found: Dict[str, List[float]]) -> Dict[str, str]:
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        with self._lock:
+            self._counts["misses"] += len(missing)
+        return missing
+
+    def _plan(self, texts: List[str]) -> tuple[List[str], Dict[str, List[float]], Dict[str, str]]:
+        keys = [self._key(text) for text in texts]
+        found = self._memory_lookup(keys)
+        found.update(self._disk_lookup([key for key in dict.fromkeys(keys) if key not in found]))
+        return keys, found, self._missing(keys, texts, found)
+
+    async def _aplan(self, texts: List[str]) -> tuple[List[str], Dict[str, List[float]], Dict[str, str]]:
+        """Async :meth:`_plan`; the SQLite tier runs in a worker thread."""
+
+        keys = [self._key(text) for text in texts]
+        found = self._memory_lookup(keys)
+        remaining = [key for key in dict.fromkeys(keys) if key not in found]
+        if remaining and self._disk is not None:
+            found.update(await asyncio.to_thread(self._disk_lookup, remaining))
+        return keys, found, self._missing(keys, texts, found)
+
+    def _store(self, computed: Dict[str, List[float]]) -> None:
+        self._remember_all(computed)
+        self._disk_store(computed)
+
+    async def _astore(self, computed: Dict[str, List[float]]) -> None:
+        self._remember_all(computed)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk_store, computed)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._plan(texts)
+        if missing:
+            vectors = self.inner.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._plan([text])
+        if missing:
+            vector = self.inner.embed_query(text)
+            self._store({keys[0]: vector})
+            return vector
+        return found[keys[0]]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = await self._aplan(texts)
+        if missing:
+            vectors = await self.inner.aembed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            await self._astore(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, missing = await self._aplan([text])
+        if missing:
+            vector = await self.inner.aembed_query(text)
+            await self._astore({keys[0]: vector})
+            return vector
+        return found[keys[0]]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and tier sizes."""
+
+        with self._lock:
+            counts = dict(self._counts)
+            memory_entries = len(self._memory)
+        lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+        return {
+            "model": self.model_name,
+            **counts,
+            "hit_rate": ((lookups - counts["misses"]) / lookups) if lookups else 0.0,
+            "memory_entries": memory_entries,
+            "max_memory_entries": self._max_entries,
+            "disk_entries": self._disk_count(),
+            "max_disk_entries": self._disk.max_entries if self._disk is not None else None,
+            "disk_pruned": self._disk.pruned if self._disk is not None else None,
+        }
+
+    def _disk_count(self) -> Optional[int]:
+        if self._disk is None:
+            return None
+        try:
+            return self._disk.count()
+        except sqlite3.Error:
+            return None
+
+
+__all__ = ["CachedEmbeddings", "SQLiteEmbeddingStore", "normalize_embedding_text"]
@@ -0,0 +1,261 @@
+"""Hedged chat completions: race a backup request when the first one is slow."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+import httpx
+import openai
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict
+
+from sleep_assistant.services.http_transport import RetryBudget
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_HEDGE_PERCENTILE = 95.0
+DEFAULT_HEDGE_BUDGET_PERCENT = 5.0
+DEFAULT_HEDGE_INITIAL_DELAY_MS = 2000.0
+DEFAULT_HEDGE_MIN_DELAY_MS = 100.0
+_MIN_SAMPLES = 20
+_SAMPLE_WINDOW = 512
+# Failures worth repeating on the backup; anything else (bad request, auth, context
+# length) would fail the same way there.
+_TRANSIENT_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    httpx.TransportError,
+    TimeoutError,
+)
+
+
+class HedgePolicy:
+    """Decide when to hedge and whether the budget allows it.
+
+    The delay is the configured percentile of recent latencies, measured to the
+    first streamed token for streaming calls and to the full response otherwise.
+    Until enough samples exist, ``initial_delay_ms`` is used. Hedges are drawn
+    from a token bucket so they never exceed ``budget_percent`` of requests.
+    """
+
+    def __init__(
+        self,
+        *,
+        percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        budget_percent: float = DEFAULT_HEDGE_BUDGET_PERCENT,
+        initial_delay_ms: float = DEFAULT_HEDGE_INITIAL_DELAY_MS,
+        min_delay_ms: float = DEFAULT_HEDGE_MIN_DELAY_MS,
+    ) -> None:
+        self._percentile = min(max(percentile, 0.0), 100.0)
+        self._initial_delay = initial_delay_ms / 1000.0
+        self._min_delay = min_delay_ms / 1000.0
+        self._budget = RetryBudget(ratio=budget_percent / 100.0, minimum=0)
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque[float]] = {
+            "first_token": deque(maxlen=_SAMPLE_WINDOW),
+            "response": deque(maxlen=_SAMPLE_WINDOW),
+        }
+        self._counts = {"requests": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0}
+
+    def delay(self, kind: str) -> float:
+        """Seconds to wait on the primary before hedging a ``kind`` request."""
+
+        with self._lock:
+            samples = sorted(self._samples[kind])
+        if len(samples) < _MIN_SAMPLES:
+            return self._initial_delay
+        index = min(len(samples) - 1, int(round(self._percentile / 100.0 * (len(samples) - 1))))
+        return max(self._min_delay, samples[index])
+
+    def record(self, kind: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[kind].append(seconds)
+
+    def begin(self) -> None:
+        self._budget.deposit()
+        with self._lock:
+            self._counts["requests"] += 1
+
+    def allow_hedge(self) -> bool:
+        allowed = self._budget.withdraw()
+        with self._lock:
+            self._counts["hedged" if allowed else "budget_denied"] += 1
+        return allowed
+
+    def hedge_won(self) -> None:
+        with self._lock:
+            self._counts["hedge_wins"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hedge counts and the current delays in milliseconds."""
+
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            **counts,
+            "hedge_rate": (counts["hedged"] / counts["requests"]) if counts["requests"] else 0.0,
+            "first_token_delay_ms": round(self.delay("first_token") * 1000.0, 1),
+            "response_delay_ms": round(self.delay("response") * 1000.0, 1),
+        }
+
+
+async def _aclose(stream: AsyncIterator[Any]) -> None:
+    """Close ``stream`` if it supports it; async generators do, plain iterators may not."""
+
+    close = getattr(stream, "aclose", None)
+    if close is not None:
+        await close()
+
+
+async def _open_stream(
+    model: BaseChatModel,
+    messages: List[BaseMessage],
+    stop: Optional[List[str]],
+    kwargs: Dict[str, Any],
+) -> Tuple[AsyncIterator[ChatGenerationChunk], Optional[ChatGenerationChunk]]:
+    """Start streaming from ``model`` and wait for its first chunk."""
+
+    stream = model._astream(messages, stop=stop, **kwargs)
+    try:
+        return stream, await anext(stream)
+    except StopAsyncIteration:
+        return stream, None
+    except BaseException:
+        await _aclose(stream)
+        raise
+
+
+class HedgedChatModel(BaseChatModel):
+    """Chat model that sends a backup request when the primary is slower than usual.
+
+    If the primary has not produced its first token (streaming) or its response
+    (non-streaming) within the policy delay, the same request goes to ``secondary``.
+    The first to answer wins and the other is cancelled. A primary that fails before
+    the delay with a transient error is retried once on ``secondary``, drawing on the
+    same budget; other errors are raised at once. Only the
+    async paths hedge; sync calls go straight to the primary.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    primary: BaseChatModel
+    secondary: BaseChatModel
+    policy: HedgePolicy
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return dict(self.primary._identifying_params)
+
+    async def _race(
+        self,
+        kind: str,
+        launch: Callable[[BaseChatModel], Awaitable[T]],
+        release: Optional[Callable[[T], Awaitable[None]]] = None,
+    ) -> T:
+        self.policy.begin()
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(launch(self.primary))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.policy.delay(kind))
+            hedged = not done and self.policy.allow_hedge()
+            if hedged:
+                logger.info("Hedging slow %s request after %.0f ms.", kind, (time.perf_counter() - started) * 1000)
+                pending.add(asyncio.ensure_future(launch(self.secondary)))
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [task for task in done if task.exception() is None]
+                if winners:
+                    # Prefer the primary when both finished in the same tick.
+                    winner = primary if primary in winners else winners[0]
+                    for task in winners:
+                        if task is not winner and release is not None:
+                            await release(task.result())
+                    self.policy.record(kind, time.perf_counter() - started)
+                    if winner is not primary:
+                        self.policy.hedge_won()
+                    return winner.result()
+                error = error or next(iter(done)).exception()
+                if (
+                    not pending
+                    and not hedged
+                    and isinstance(error, _TRANSIENT_ERRORS)
+                    and self.policy.allow_hedge()
+                ):
+                    hedged = True
+                    logger.info("Retrying failed %s request on the backup model.", kind)
+                    pending.add(asyncio.ensure_future(launch(self.secondary)))
+            assert error is not None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self.primary._generate(messages, stop=stop, **kwargs)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        yield from self.primary._stream(messages, stop=stop, **kwargs)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await self._race("response", lambda model: model._agenerate(messages, stop=stop, **kwargs))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        # Token callbacks are fired by BaseChatModel for the chunks yielded here, so the
+        # losing request never reaches the client's stream.
+        stream, first = await self._race(
+            "first_token",
+            lambda model: _open_stream(model, messages, stop, kwargs),
+            release=lambda opened: _aclose(opened[0]),
+        )
+        try:
+            if first is not None:
+                yield first
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await _aclose(stream)
+
+
+__all__ = ["HedgePolicy", "HedgedChatModel"]
@@ -0,0 +1,330 @@
+"""Process-wide HTTP clients for OpenAI calls: pool limits, timeouts and budgeted retries."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from sleep_assistant.config import get_bool_env, get_float_env, get_int_env
+from sleep_assistant.metrics import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError)
+_MAX_RETRY_AFTER_SECONDS = 30.0
+
+
+@dataclass(frozen=True)
+class HttpTransportSettings:
+    """Connection pool, timeout and retry configuration shared by all OpenAI clients."""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    connect_timeout: float = 5.0
+    read_timeout: float = 60.0
+    write_timeout: float = 10.0
+    pool_timeout: float = 5.0
+    max_retries: int = 2
+    backoff_base: float = 0.25
+    backoff_max: float = 4.0
+    retry_budget_ratio: float = 0.1
+    retry_budget_min: int = 10
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout,
+        )
+
+
+def load_http_transport_settings() -> HttpTransportSettings:
+    """Read the ``OPENAI_HTTP_*`` configuration from the environment."""
+
+    defaults = HttpTransportSettings()
+
+    def integer(name: str, default: int) -> int:
+        value = get_int_env(name, default)
+        return default if value is None else value
+
+    def number(name: str, default: float) -> float:
+        value = get_float_env(name, default)
+        return default if value is None else value
+
+    return HttpTransportSettings(
+        max_connections=integer("OPENAI_HTTP_MAX_CONNECTIONS", defaults.max_connections),
+        max_keepalive_connections=integer("OPENAI_HTTP_MAX_KEEPALIVE", defaults.max_keepalive_connections),
+        keepalive_expiry=number("OPENAI_HTTP_KEEPALIVE_EXPIRY", defaults.keepalive_expiry),
+        http2=get_bool_env("OPENAI_HTTP2", defaults.http2),
+        connect_timeout=number("OPENAI_CONNECT_TIMEOUT", defaults.connect_timeout),
+        read_timeout=number("OPENAI_READ_TIMEOUT", defaults.read_timeout),
+        write_timeout=number("OPENAI_WRITE_TIMEOUT", defaults.write_timeout),
+        pool_timeout=number("OPENAI_POOL_TIMEOUT", defaults.pool_timeout),
+        max_retries=integer("OPENAI_HTTP_MAX_RETRIES", defaults.max_retries),
+        backoff_base=number("OPENAI_HTTP_BACKOFF_BASE", defaults.backoff_base),
+        backoff_max=number("OPENAI_HTTP_BACKOFF_MAX", defaults.backoff_max),
+        retry_budget_ratio=number("OPENAI_HTTP_RETRY_BUDGET_RATIO", defaults.retry_budget_ratio),
+        retry_budget_min=integer("OPENAI_HTTP_RETRY_BUDGET_MIN", defaults.retry_budget_min),
+    )
+
+
+class RetryBudget:
+    """Token bucket that caps retries at a fraction of recent traffic.
+
+    Each original request deposits ``ratio`` tokens and each retry withdraws one,
+    so a struggling upstream sees at most ``ratio`` extra load instead of a retry
+    storm. ``minimum`` tokens are always available so quiet periods can still retry.
+    """
+
+    def __init__(self, *, ratio: float, minimum: int) -> None:
+        self._ratio = max(ratio, 0.0)
+        self._minimum = max(minimum, 0)
+        self._capacity = float(max(self._minimum, 1) * 10)
+        self._balance = float(self._minimum)
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._balance = min(self._capacity, self._balance + self._ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._balance < 1.0:
+                return False
+            self._balance -= 1.0
+            return True
+
+    @property
+    def balance(self) -> float:
+        with self._lock:
+            return self._balance
+
+
+class TransportStats:
+    """Request, retry and in-flight counters for one pair of pooled transports."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts = {
+            "requests": 0,
+            "retries": 0,
+            "retries_denied": 0,
+            "errors": 0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+        }
+
+    def bump(self, key: str, delta: int = 1) -> None:
+        with self._lock:
+            self._counts[key] += delta
+            if key == "in_flight":
+                self._counts["peak_in_flight"] = max(self._counts["peak_in_flight"], self._counts["in_flight"])
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+class _RetryPolicy:
+    def __init__(self, settings: HttpTransportSettings, budget: RetryBudget, stats: TransportStats) -> None:
+        self.settings = settings
+        self.budget = budget
+        self.stats = stats
+
+    def delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        """Full-jitter exponential backoff, or the server's ``Retry-After`` when given."""
+
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(max(float(retry_after), 0.0), _MAX_RETRY_AFTER_SECONDS)
+            except ValueError:
+                pass
+        ceiling = min(self.settings.backoff_max, self.settings.backoff_base * (2**attempt))
+        return random.uniform(0.0, ceiling)
+
+    def should_retry(self, attempt: int, response: Optional[httpx.Response]) -> bool:
+        if attempt >= self.settings.max_retries:
+            return False
+        if response is not None and response.status_code not in RETRYABLE_STATUS_CODES:
+            return False
+        if not self.budget.withdraw():
+            self.stats.bump("retries_denied")
+            return False
+        self.stats.bump("retries")
+        return True
+
+
+class RetryTransport(httpx.BaseTransport):
+    """Sync transport that retries connection failures and retryable statuses within the budget."""
+
+    def __init__(self, inner: httpx.HTTPTransport, policy: _RetryPolicy) -> None:
+        self.inner = inner
+        self._policy = policy
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        policy = self._policy
+        policy.budget.deposit()
+        policy.stats.bump("requests")
+        policy.stats.bump("in_flight")
+        try:
+            attempt = 0
+            while True:
+                try:
+                    response = self.inner.handle_request(request)
+                except RETRYABLE_ERRORS:
+                    if not policy.should_retry(attempt, None):
+                        policy.stats.bump("errors")
+                        raise
+                    time.sleep(policy.delay(attempt, None))
+                else:
+                    if not policy.should_retry(attempt, response):
+                        return response
+                    response.close()
+                    time.sleep(policy.delay(attempt, response))
+                attempt += 1
+        finally:
+            policy.stats.bump("in_flight", -1)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of :class:`RetryTransport`."""
+
+    def __init__(self, inner: httpx.AsyncHTTPTransport, policy: _RetryPolicy) -> None:
+        self.inner = inner
+        self._policy = policy
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        policy = self._policy
+        policy.budget.deposit()
+        policy.stats.bump("requests")
+        policy.stats.bump("in_flight")
+        try:
+            attempt = 0
+            while True:
+                try:
+                    response = await self.inner.handle_async_request(request)
+                except RETRYABLE_ERRORS:
+                    if not policy.should_retry(attempt, None):
+                        policy.stats.bump("errors")
+                        raise
+                    await asyncio.sleep(policy.delay(attempt, None))
+                else:
+                    if not policy.should_retry(attempt, response):
+                        return response
+                    await response.aclose()
+                    await asyncio.sleep(policy.delay(attempt, response))
+                attempt += 1
+        finally:
+            policy.stats.bump("in_flight", -1)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+def _pool_usage(transport: Any) -> Dict[str, Any]:
+    """Summarise an httpcore connection pool; the attributes are best-effort across versions."""
+
+    pool = getattr(transport, "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    idle = sum(1 for connection in connections if getattr(connection, "is_idle", lambda: False)())
+    return {
+        "connections": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle,
+        "queued_requests": len(getattr(pool, "_requests", []) or []),
+    }
+
+
+class HttpClientBundle:
+    """A sync and an async client sharing settings, retry budget and statistics."""
+
+    def __init__(self, settings: HttpTransportSettings, proxy: Optional[str]) -> None:
+        self.settings = settings
+        self.stats = TransportStats()
+        self.budget = RetryBudget(ratio=settings.retry_budget_ratio, minimum=settings.retry_budget_min)
+        policy = _RetryPolicy(settings, self.budget, self.stats)
+        transport_kwargs: Dict[str, Any] = {"limits": settings.limits(), "http2": settings.http2}
+        if proxy:
+            transport_kwargs["proxy"] = proxy
+        if settings.http2:
+            try:
+                import h2  # noqa: F401  # type: ignore[import-not-found]
+            except ImportError as exc:
+                raise SystemExit('OPENAI_HTTP2=true requires the h2 package: pip install "httpx[http2]"') from exc
+        self._sync_transport = httpx.HTTPTransport(**transport_kwargs)
+        self._async_transport = httpx.AsyncHTTPTransport(**transport_kwargs)
+        client_kwargs: Dict[str, Any] = {"follow_redirects": True, "timeout": settings.timeout()}
+        self.client = httpx.Client(transport=RetryTransport(self._sync_transport, policy), **client_kwargs)
+        self.async_client = httpx.AsyncClient(
+            transport=AsyncRetryTransport(self._async_transport, policy),
+            **client_kwargs,
+        )
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Return request/retry counters plus live pool usage for both clients."""
+
+        return {
+            **self.stats.snapshot(),
+            "retry_budget": round(self.budget.balance, 2),
+            "max_connections": self.settings.max_connections,
+            "http2": self.settings.http2,
+            "sync_pool": _pool_usage(self._sync_transport),
+            "async_pool": _pool_usage(self._async_transport),
+        }
+
+
+_BUNDLES: Dict[Tuple[Optional[str]], HttpClientBundle] = {}
+_BUNDLES_LOCK = threading.Lock()
+
+
+def get_http_clients(proxy: Optional[str] = None) -> HttpClientBundle:
+    """Return the process-wide clients for ``proxy``, creating them on first use."""
+
+    key = (proxy,)
+    with _BUNDLES_LOCK:
+        bundle = _BUNDLES.get(key)
+        if bundle is None:
+            settings = load_http_transport_settings()
+            bundle = _BUNDLES[key] = HttpClientBundle(settings, proxy)
+            register_stats_provider("openai_http", bundle.pool_stats)
+            logger.info(
+                "OpenAI HTTP pool: max %d connections (%d keep-alive), HTTP/2 %s, %d retries.",
+                settings.max_connections,
+                settings.max_keepalive_connections,
+                "on" if settings.http2 else "off",
+                settings.max_retries,
+            )
+        return bundle
+
+
+__all__ = [
+    "AsyncRetryTransport",
+    "HttpClientBundle",
+    "HttpTransportSettings",
+    "RetryBudget",
+    "RetryTransport",
+    "get_http_clients",
+    "load_http_transport_settings",
+]
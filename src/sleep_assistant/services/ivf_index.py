@@ -0,0 +1,327 @@
+"""IVF-flat approximate nearest-neighbour index for the local retrieval path."""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Mapping, Sequence
+
+import numpy as np
+
+from sleep_assistant import PROJECT_ROOT
+from sleep_assistant.config import get_env, get_int_env
+from sleep_assistant.services.local_vectorstore import normalize_rows, top_k_indices, unit_query
+from sleep_assistant.services.vectorstore import VectorMatch, VectorQueryResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = PROJECT_ROOT / "data" / "ivf_index"
+DEFAULT_NPROBE = 8
+DEFAULT_KMEANS_ITERATIONS = 20
+# k-means trains on at most this many points per list; more adds build time, not recall.
+_TRAINING_POINTS_PER_LIST = 256
+_ASSIGN_BLOCK_ROWS = 8192
+_FORMAT_VERSION = 1
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Return the nearest centroid for every row, scored in blocks to bound memory."""
+
+    assignments = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], _ASSIGN_BLOCK_ROWS):
+        block = np.asarray(vectors[start : start + _ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        assignments[start : start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(
+    vectors: np.ndarray,
+    nlist: int,
+    *,
+    iterations: int = DEFAULT_KMEANS_ITERATIONS,
+    seed: int = 0,
+) -> np.ndarray:
+    """Run spherical k-means on a sample of row-normalized ``vectors``."""
+
+    rng = np.random.default_rng(seed)
+    sample_size = min(vectors.shape[0], nlist * _TRAINING_POINTS_PER_LIST)
+    sample = vectors[np.sort(rng.choice(vectors.shape[0], sample_size, replace=False))]
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=nlist)
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            # Re-seed dead lists from random points so every list stays useful.
+            sums[empty] = sample[rng.choice(sample_size, empty.size, replace=False)]
+        updated = normalize_rows(sums)
+        if np.allclose(updated, centroids, atol=1e-6):
+            break
+        centroids = updated
+    return centroids.astype(np.float32)
+
+
+class IVFVectorStore:
+    """Inverted-file index: vectors are bucketed by nearest k-means centroid.
+
+    A query scores the centroids, then scans only the ``nprobe`` closest lists, so
+    cost grows with ``nprobe * n / nlist`` instead of ``n``. Raising ``nprobe`` trades
+    latency for recall. :meth:`add` assigns new vectors to the existing centroids;
+    rebuild once the corpus has drifted far from the data the centroids were trained on.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        list_vectors: Sequence[np.ndarray],
+        list_ids: Sequence[np.ndarray],
+        metadata: Sequence[Mapping[str, Any]],
+        *,
+        nprobe: int = DEFAULT_NPROBE,
+    ) -> None:
+        if len(list_vectors) != centroids.shape[0] or len(list_ids) != centroids.shape[0]:
+            raise ValueError("Every centroid needs exactly one vector list and one id list.")
+        self._centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self._list_vectors = list(list_vectors)
+        self._list_ids = list(list_ids)
+        self._metadata = [dict(item) for item in metadata]
+        self.nprobe = max(1, nprobe)
+
+    def __len__(self) -> int:
+        return len(self._metadata)
+
+    @property
+    def dimensions(self) -> int:
+        return self._centroids.shape[1]
+
+    @property
+    def nlist(self) -> int:
+        return self._centroids.shape[0]
+
+    @classmethod
+    def build(
+        cls,
+        vectors: Any,
+        metadata: Sequence[Mapping[str, Any]],
+        *,
+        nlist: int | None = None,
+        nprobe: int = DEFAULT_NPROBE,
+        iterations: int = DEFAULT_KMEANS_ITERATIONS,
+        seed: int = 0,
+    ) -> "IVFVectorStore":
+        """Train centroids on ``vectors`` and bucket every row; ``nlist`` defaults to ``4 * sqrt(n)``."""
+
+        matrix = normalize_rows(np.ascontiguousarray(vectors, dtype=np.float32))
+        if matrix.ndim != 2 or matrix.shape[0] != len(metadata) or matrix.shape[0] == 0:
+            raise ValueError("vectors must be a non-empty 2-D array with one row per metadata entry.")
+        rows = matrix.shape[0]
+        nlist = max(1, min(nlist or int(4 * math.sqrt(rows)), rows))
+
+        started = time.perf_counter()
+        centroids = train_centroids(matrix, nlist, iterations=iterations, seed=seed)
+        assignments = _assign(matrix, centroids)
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))])
+        grouped = matrix[order]
+        list_vectors = [grouped[bounds[i] : bounds[i + 1]] for i in range(nlist)]
+        list_ids = [order[bounds[i] : bounds[i + 1]] for i in range(nlist)]
+        logger.info(
+            "Built IVF index over %d vectors with %d lists in %.1fs.",
+            rows,
+            nlist,
+            time.perf_counter() - started,
+        )
+        return cls(centroids, list_vectors, list_ids, metadata, nprobe=nprobe)
+
+    def add(self, vectors: Any, metadata: Sequence[Mapping[str, Any]]) -> None:
+        """Insert new rows into their nearest existing lists."""
+
+        matrix = normalize_rows(np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dimensions))
+        if matrix.shape[0] != len(metadata):
+            raise ValueError("vectors and metadata must describe the same number of documents.")
+        first_id = len(self._metadata)
+        self._metadata.extend(dict(item) for item in metadata)
+        assignments = _assign(matrix, self._centroids)
+        for list_number in np.unique(assignments).tolist():
+            rows = np.flatnonzero(assignments == list_number)
+            self._list_vectors[list_number] = np.concatenate([self._list_vectors[list_number], matrix[rows]])
+            self._list_ids[list_number] = np.concatenate([self._list_ids[list_number], rows + first_id])
+
+    def _search(
+        self,
+        query: np.ndarray,
+        centroid_scores: np.ndarray,
+        probes: int,
+        top_k: int,
+        include_metadata: bool,
+    ) -> list[VectorMatch]:
+        """Scan the ``probes`` lists closest to ``query`` and return its best matches."""
+
+        probed = top_k_indices(centroid_scores, probes)
+        score_parts = []
+        id_parts = []
+        for list_number in probed.tolist():
+            ids = self._list_ids[list_number]
+            if ids.size:
+                score_parts.append(np.asarray(self._list_vectors[list_number]) @ query)
+                id_parts.append(ids)
+        if not score_parts:
+            return []
+        scores = np.concatenate(score_parts)
+        ids = np.concatenate(id_parts)
+        return [
+            VectorMatch(
+                metadata=dict(self._metadata[int(ids[position])]) if include_metadata else {},
+                score=(1.0 + float(scores[position])) / 2.0,
+            )
+            for position in top_k_indices(scores, top_k).tolist()
+        ]
+
+    def query(
+        self,
+        vector: Sequence[float],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+        nprobe: int | None = None,
+    ) -> VectorQueryResult:
+        """Return approximate ``top_k`` matches by scanning the closest ``nprobe`` lists."""
+
+        return self.query_many([vector], top_k=top_k, include_metadata=include_metadata, nprobe=nprobe)[0]
+
+    def query_many(
+        self,
+        vectors: Sequence[Sequence[float]],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+        nprobe: int | None = None,
+    ) -> list[VectorQueryResult]:
+        """Score all centroids with one matrix multiply, then scan each query's lists."""
+
+        started = time.perf_counter()
+        queries = [unit_query(vector, self.dimensions) if self._metadata else None for vector in vectors]
+        pairs = [(position, query) for position, query in enumerate(queries) if query is not None]
+        valid = [position for position, _ in pairs]
+        matches: list[list[VectorMatch]] = [[] for _ in queries]
+        if pairs:
+            batch = np.stack([query for _, query in pairs])
+            centroid_scores = batch @ self._centroids.T
+            probes = min(nprobe or self.nprobe, self.nlist)
+            for row, position in enumerate(valid):
+                matches[position] = self._search(batch[row], centroid_scores[row], probes, top_k, include_metadata)
+        share_ms = (time.perf_counter() - started) * 1000 / max(len(queries), 1)
+        return [VectorQueryResult(matches=found, elapsed_ms=share_ms) for found in matches]
+
+    async def aquery(
+        self,
+        vector: Sequence[float],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+    ) -> VectorQueryResult:
+        """Search inline; probing a handful of lists is cheaper than an executor hop."""
+
+        return self.query(vector, top_k=top_k, include_metadata=include_metadata)
+
+    async def aquery_many(
+        self,
+        vectors: Sequence[Sequence[float]],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+    ) -> list[VectorQueryResult]:
+        """Async alias of :meth:`query_many`; the batch runs inline."""
+
+        return self.query_many(vectors, top_k=top_k, include_metadata=include_metadata)
+
+    def save(self, path: str | Path) -> Path:
+        """Persist the index as a directory of ``.npy`` arrays plus JSON metadata."""
+
+        target = Path(path)
+        staging = target.with_name(f"{target.name}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+
+        sizes = np.array([ids.size for ids in self._list_ids], dtype=np.int64)
+        np.save(staging / "centroids.npy", self._centroids)
+        np.save(staging / "list_offsets.npy", np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64))
+        np.save(staging / "vectors.npy", np.concatenate([np.asarray(v) for v in self._list_vectors]))
+        np.save(staging / "ids.npy", np.concatenate(self._list_ids).astype(np.int64))
+        with open(staging / "metadata.jsonl", "w", encoding="utf-8") as handle:
+            for item in self._metadata:
+                handle.write(json.dumps(item, separators=(",", ":"), default=str))
+                handle.write("\n")
+        manifest = {
+            "version": _FORMAT_VERSION,
+            "rows": len(self._metadata),
+            "dimensions": self.dimensions,
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+        }
+        (staging / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+        previous = target.with_name(f"{target.name}.old")
+        if target.exists():
+            os.replace(target, previous)
+        os.replace(staging, target)
+        shutil.rmtree(previous, ignore_errors=True)
+        logger.info("Saved IVF index (%d vectors, %d lists) to %s.", len(self._metadata), self.nlist, target)
+        return target
+
+    @classmethod
+    def load(cls, path: str | Path, *, nprobe: int | None = None, mmap: bool = True) -> "IVFVectorStore":
+        """Open an index written by :meth:`save`; vectors are memory-mapped by default."""
+
+        source = Path(path)
+        manifest = json.loads((source / "manifest.json").read_text(encoding="utf-8"))
+        if manifest.get("version") != _FORMAT_VERSION:
+            raise ValueError(f"{source} uses unsupported IVF index version {manifest.get('version')}.")
+        mmap_mode = "r" if mmap else None
+        centroids = np.load(source / "centroids.npy")
+        offsets = np.load(source / "list_offsets.npy")
+        vectors = np.load(source / "vectors.npy", mmap_mode=mmap_mode)
+        ids = np.load(source / "ids.npy")
+        with open(source / "metadata.jsonl", encoding="utf-8") as handle:
+            metadata = [json.loads(line) for line in handle if line.strip()]
+
+        bounds = offsets.tolist()
+        list_vectors = [vectors[bounds[i] : bounds[i + 1]] for i in range(len(bounds) - 1)]
+        list_ids = [ids[bounds[i] : bounds[i + 1]] for i in range(len(bounds) - 1)]
+        return cls(centroids, list_vectors, list_ids, metadata, nprobe=nprobe or manifest.get("nprobe", DEFAULT_NPROBE))
+
+
+def resolve_index_path() -> Path:
+    """Return ``VECTOR_INDEX_PATH`` or the default location under ``data/``."""
+
+    raw_path = get_env("VECTOR_INDEX_PATH")
+    path = Path(raw_path) if raw_path else DEFAULT_INDEX_PATH
+    return path if path.is_absolute() else PROJECT_ROOT / path
+
+
+def build_ivf_vector_store() -> IVFVectorStore:
+    """Open the IVF index configured through ``VECTOR_INDEX_*``."""
+
+    path = resolve_index_path()
+    if not (path / "manifest.json").exists():
+        raise SystemExit(f"IVF index {path} does not exist. Build it with scripts/build_ivf_index.py.")
+    store = IVFVectorStore.load(path, nprobe=get_int_env("VECTOR_INDEX_NPROBE"))
+    logger.info(
+        "Loaded IVF index %s (%d vectors, %d lists, nprobe %d).",
+        path,
+        len(store),
+        store.nlist,
+        store.nprobe,
+    )
+    return store
+
+
+__all__ = ["IVFVectorStore", "build_ivf_vector_store", "resolve_index_path", "train_centroids"]
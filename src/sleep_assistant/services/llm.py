@@ -2,12 +2,65 @@
 
 from __future__ import annotations
 
-from typing import Any, Optional
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, NamedTuple, Optional
 
 import httpx
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
-from sleep_assistant.config import get_env, require_env
+from sleep_assistant.config import get_bool_env, get_env, get_float_env, get_int_env, require_env
+from sleep_assistant.metrics import register_stats_provider
+from sleep_assistant.services.embedding_batcher import DEFAULT_MAX_BATCH, DEFAULT_MAX_WAIT_MS, BatchingEmbeddings
+from sleep_assistant.services.embedding_cache import (
+    DEFAULT_DISK_MAX_ENTRIES,
+    DEFAULT_EMBEDDING_CACHE_SIZE,
+    CachedEmbeddings,
+    SQLiteEmbeddingStore,
+)
+from sleep_assistant.services.hedging import (
+    DEFAULT_HEDGE_BUDGET_PERCENT,
+    DEFAULT_HEDGE_INITIAL_DELAY_MS,
+    DEFAULT_HEDGE_MIN_DELAY_MS,
+    DEFAULT_HEDGE_PERCENTILE,
+    HedgedChatModel,
+    HedgePolicy,
+)
+from sleep_assistant.services.http_transport import get_http_clients
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHAT_MODEL = "gpt-4o-mini"
+ROUTER_LABELS = ("sleep", "general")
+
+
+@dataclass(frozen=True)
+class ChatModelSettings:
+    """Model, output cap, temperature and timeout for one graph node."""
+
+    model: str
+    max_tokens: Optional[int]
+    temperature: float
+    timeout: Optional[float]
+
+
+class ChatModels(NamedTuple):
+    """Per-node chat models plus the shared query embedder."""
+
+    router: BaseChatModel
+    general: BaseChatModel
+    sleep: BaseChatModel
+    embedder: Embeddings
+
+
+# Node defaults: the router answers with one word and greetings need a couple of sentences.
+_NODE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "router": {"max_tokens": 1, "temperature": 0.0, "timeout": None},
+    "general": {"max_tokens": 150, "temperature": 0.3, "timeout": None},
+    "sleep": {"max_tokens": None, "temperature": 0.3, "timeout": None},
+}
 
 
 def _normalize_base_url(base_url: Optional[str]) -> Optional[str]:
@@ -25,18 +78,21 @@ def _resolve_proxy_url() -> Optional[str]:
 
 
 def _build_openai_client_kwargs(api_key: str, base_url: Optional[str]) -> dict[str, Any]:
-    """Create kwargs shared by ChatOpenAI and OpenAIEmbeddings."""
+    """Create kwargs shared by ChatOpenAI and OpenAIEmbeddings.
+
+    Every model shares the process-wide pooled clients. Retries happen in their
+    transport under a global budget, so the SDK's own retries are disabled.
+    """
 
     kwargs: dict[str, Any] = {"api_key": api_key}
     if base_url:
         kwargs["base_url"] = base_url
 
-    proxy_url = _resolve_proxy_url()
-    http_client_kwargs: dict[str, Any] = {"follow_redirects": True}
-    if proxy_url:
-        http_client_kwargs["proxy"] = proxy_url
-    kwargs["http_client"] = httpx.Client(**http_client_kwargs)
-    kwargs["http_async_client"] = httpx.AsyncClient(**http_client_kwargs)
+    clients = get_http_clients(_resolve_proxy_url())
+    kwargs["http_client"] = clients.client
+    kwargs["http_async_client"] = clients.async_client
+    kwargs["timeout"] = clients.settings.timeout()
+    kwargs["max_retries"] = 0
 
     return kwargs
 
@@ -46,22 +102,162 @@ def _build_embedder(model_name: str, client_kwargs: dict[str, Any]) -> OpenAIEmb
     return OpenAIEmbeddings(**kwargs)  # type: ignore[arg-type]
 
 
-def build_chat_models() -> tuple[ChatOpenAI, ChatOpenAI, OpenAIEmbeddings]:
-    """Instantiate chat and embedding models with shared credentials."""
+def _wrap_with_batcher(embedder: Embeddings) -> Embeddings:
+    """Coalesce concurrent query embeddings into batched requests unless disabled."""
+
+    if not get_bool_env("EMBEDDING_BATCH_ENABLED", True):
+        return embedder
+
+    batcher = BatchingEmbeddings(
+        embedder,
+        max_wait_ms=get_float_env("EMBEDDING_BATCH_MAX_WAIT_MS", DEFAULT_MAX_WAIT_MS) or 0.0,
+        max_batch=get_int_env("EMBEDDING_BATCH_MAX_SIZE", DEFAULT_MAX_BATCH) or DEFAULT_MAX_BATCH,
+    )
+    register_stats_provider("embedding_batcher", batcher.stats)
+    return batcher
+
+
+def _wrap_with_cache(embedder: Embeddings, model_name: str) -> Embeddings:
+    """Wrap the query embedder with the LRU/disk cache unless disabled."""
+
+    if not get_bool_env("EMBEDDING_CACHE_ENABLED", True):
+        return embedder
+
+    disk_path = get_env("EMBEDDING_CACHE_PATH")
+    disk_store = None
+    if disk_path:
+        disk_max = get_int_env("EMBEDDING_CACHE_DISK_MAX_ENTRIES", DEFAULT_DISK_MAX_ENTRIES) or 0
+        disk_store = SQLiteEmbeddingStore(disk_path, max_entries=disk_max)
+    cached = CachedEmbeddings(
+        embedder,
+        model_name=model_name,
+        max_entries=get_int_env("EMBEDDING_CACHE_SIZE", DEFAULT_EMBEDDING_CACHE_SIZE) or DEFAULT_EMBEDDING_CACHE_SIZE,
+        disk_store=disk_store,
+    )
+    register_stats_provider("embedding_cache", cached.stats)
+    logger.info("Query embedding cache enabled (disk tier: %s).", disk_path or "off")
+    return cached
+
+
+def load_chat_model_settings(node: str) -> ChatModelSettings:
+    """Read ``<NODE>_MODEL``, ``_MAX_TOKENS``, ``_TEMPERATURE`` and ``_TIMEOUT``, falling back to ``CHAT_MODEL``."""
+
+    prefix = node.upper()
+    defaults = _NODE_DEFAULTS[node]
+    chat_model_name = get_env("CHAT_MODEL", DEFAULT_CHAT_MODEL) or DEFAULT_CHAT_MODEL
+    max_tokens = get_int_env(f"{prefix}_MAX_TOKENS", defaults["max_tokens"])
+    temperature = get_float_env(f"{prefix}_TEMPERATURE", defaults["temperature"])
+    timeout = get_float_env(f"{prefix}_TIMEOUT", defaults["timeout"])
+    return ChatModelSettings(
+        model=get_env(f"{prefix}_MODEL") or chat_model_name,
+        max_tokens=max_tokens if max_tokens and max_tokens > 0 else None,
+        temperature=defaults["temperature"] if temperature is None else temperature,
+        timeout=timeout if timeout and timeout > 0 else None,
+    )
+
+
+def _router_logit_bias(model_name: str) -> Optional[Dict[int, int]]:
+    """Bias the router towards its two labels so a single output token suffices.
+
+    Returns None when tiktoken cannot encode both labels as single tokens for
+    ``model_name`` (unknown model, or the encoding cannot be loaded offline).
+    """
+
+    if not get_bool_env("ROUTER_LOGIT_BIAS", True):
+        return None
+    try:
+        import tiktoken
+
+        encoding = tiktoken.encoding_for_model(model_name)
+        tokens = [encoding.encode(label) for label in ROUTER_LABELS]
+    except Exception as exc:  # noqa: BLE001 - optional optimisation
+        logger.warning("Router logit bias unavailable for model '%s': %s", model_name, exc)
+        return None
+    if any(len(token_ids) != 1 for token_ids in tokens):
+        return None
+    return {token_ids[0]: 100 for token_ids in tokens}
+
+
+def _chat_kwargs_for_node(node: str, settings: ChatModelSettings, client_kwargs: dict[str, Any]) -> dict[str, Any]:
+    """Return ChatOpenAI kwargs for ``node`` (shared by its primary and hedge models)."""
+
+    chat_kwargs: dict[str, Any] = {**client_kwargs, "temperature": settings.temperature}
+    if settings.timeout is not None:
+        # Bound the whole request; connection setup keeps the transport's connect timeout.
+        connect_timeout = client_kwargs["timeout"].connect
+        chat_kwargs["timeout"] = httpx.Timeout(settings.timeout, connect=connect_timeout)
+    max_tokens = settings.max_tokens
+    if node == "router":
+        logit_bias = _router_logit_bias(settings.model)
+        if logit_bias is not None:
+            chat_kwargs["logit_bias"] = logit_bias
+        elif max_tokens is not None and get_int_env("ROUTER_MAX_TOKENS") is None:
+            # Without the bias the first token may be a quote or capitalised label.
+            max_tokens = max(max_tokens, 3)
+    if max_tokens is not None:
+        chat_kwargs["max_tokens"] = max_tokens
+    return chat_kwargs
+
+
+def _wrap_with_hedging(
+    name: str,
+    primary: ChatOpenAI,
+    chat_kwargs: dict[str, Any],
+    api_key: str,
+) -> BaseChatModel:
+    """Hedge slow async completions with a backup request when ``CHAT_HEDGE_ENABLED`` is set."""
+
+    if not get_bool_env("CHAT_HEDGE_ENABLED", False):
+        return primary
+
+    hedge_model = get_env("CHAT_HEDGE_MODEL") or primary.model_name
+    hedge_base_url = _normalize_base_url(get_env("CHAT_HEDGE_BASE_URL"))
+    if hedge_base_url:
+        hedge_client_kwargs = _build_openai_client_kwargs(get_env("CHAT_HEDGE_API_KEY") or api_key, hedge_base_url)
+        chat_kwargs = {**chat_kwargs, **hedge_client_kwargs}
+    secondary = ChatOpenAI(model=hedge_model, **chat_kwargs)
+
+    policy = HedgePolicy(
+        percentile=get_float_env("CHAT_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE) or DEFAULT_HEDGE_PERCENTILE,
+        budget_percent=get_float_env("CHAT_HEDGE_BUDGET_PERCENT", DEFAULT_HEDGE_BUDGET_PERCENT) or 0.0,
+        initial_delay_ms=get_float_env("CHAT_HEDGE_INITIAL_DELAY_MS", DEFAULT_HEDGE_INITIAL_DELAY_MS)
+        or DEFAULT_HEDGE_INITIAL_DELAY_MS,
+        min_delay_ms=get_float_env("CHAT_HEDGE_MIN_DELAY_MS", DEFAULT_HEDGE_MIN_DELAY_MS) or 0.0,
+    )
+    register_stats_provider(f"{name}_hedging", policy.stats)
+    logger.info("Hedging %s completions with '%s' (%s).", name, hedge_model, hedge_base_url or "same endpoint")
+    return HedgedChatModel(primary=primary, secondary=secondary, policy=policy)
+
+
+def build_chat_models() -> ChatModels:
+    """Instantiate the router, general and sleep models plus the embedder with shared credentials."""
 
     api_key = require_env("OPENAI_API_KEY")
     base_url = _normalize_base_url(get_env("OPENAI_BASE_URL"))
-    chat_model_name = get_env("CHAT_MODEL", "gpt-4o-mini") or "gpt-4o-mini"
     embedding_model_name = get_env("EMBEDDING_MODEL", "text-embedding-3-small") or "text-embedding-3-small"
 
     base_client_kwargs = _build_openai_client_kwargs(api_key, base_url)
-    chat_kwargs = {**base_client_kwargs, "temperature": 0.3}
-
-    general_llm = ChatOpenAI(model=chat_model_name, **chat_kwargs)
-    sleep_llm = ChatOpenAI(model=chat_model_name, **chat_kwargs)
+    chat_models: Dict[str, BaseChatModel] = {}
+    for node in ("router", "general", "sleep"):
+        settings = load_chat_model_settings(node)
+        chat_kwargs = _chat_kwargs_for_node(node, settings, base_client_kwargs)
+        primary = ChatOpenAI(model=settings.model, **chat_kwargs)
+        chat_models[node] = _wrap_with_hedging(node, primary, chat_kwargs, api_key)
+        logger.info(
+            "%s model: %s (max_tokens=%s, temperature=%s, timeout=%s).",
+            node.capitalize(),
+            settings.model,
+            chat_kwargs.get("max_tokens"),
+            settings.temperature,
+            settings.timeout,
+        )
 
-    embedder = _build_embedder(embedding_model_name, base_client_kwargs)
-    return general_llm, sleep_llm, embedder
+    # Cache outside the batcher so hits return immediately instead of waiting for a window.
+    embedder = _wrap_with_cache(
+        _wrap_with_batcher(_build_embedder(embedding_model_name, base_client_kwargs)),
+        embedding_model_name,
+    )
+    return ChatModels(embedder=embedder, **chat_models)
 
 
 def build_embedder() -> OpenAIEmbeddings:
@@ -74,4 +270,4 @@ def build_embedder() -> OpenAIEmbeddings:
     return _build_embedder(embedding_model_name, client_kwargs)
 
 
-__all__ = ["build_chat_models", "build_embedder"]
+__all__ = ["ChatModelSettings", "ChatModels", "build_chat_models", "build_embedder", "load_chat_model_settings"]
@@ -0,0 +1,223 @@
+"""In-process exact vector search over a snapshot of the knowledge base."""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Iterable, Mapping, Sequence
+
+import numpy as np
+from pymongo.collection import Collection
+from pymongo.mongo_client import MongoClient
+
+from sleep_assistant.services.vectorstore import VectorMatch, VectorQueryResult, VectorStoreSettings
+
+logger = logging.getLogger(__name__)
+
+_LOAD_BATCH_SIZE = 1000
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length, leaving all-zero rows untouched."""
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0.0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the indices of the ``k`` highest ``scores``, best first."""
+
+    k = min(max(1, k), scores.shape[0])
+    candidates = np.argpartition(-scores, k - 1)[:k] if k < scores.shape[0] else np.arange(scores.shape[0])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def unit_query(vector: Sequence[float] | None, dimensions: int) -> np.ndarray | None:
+    """Return ``vector`` as a unit float32 array, or None when it is empty or all zeros."""
+
+    if vector is None or len(vector) == 0:
+        return None
+    query = np.asarray(vector, dtype=np.float32)
+    if query.shape[0] != dimensions:
+        raise ValueError(f"Query vector has {query.shape[0]} dimensions; the index has {dimensions}.")
+    norm = float(np.linalg.norm(query))
+    return query / norm if norm else None
+
+
+class LocalVectorStore:
+    """Brute-force cosine search over a contiguous float32 matrix held in memory.
+
+    Implements the same ``query``/``aquery`` contract as ``MongoVectorStore``. Scores
+    are reported on Atlas's cosine scale, ``(1 + cosine) / 2``, so thresholds and
+    displayed scores stay comparable between backends.
+    """
+
+    def __init__(self, vectors: Any, metadata: Sequence[Mapping[str, Any]]) -> None:
+        matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2:
+            raise ValueError("vectors must be a 2-D array of shape (documents, dimensions).")
+        if matrix.shape[0] != len(metadata):
+            raise ValueError("vectors and metadata must describe the same number of documents.")
+        self._matrix = normalize_rows(matrix)
+        self._metadata = [dict(item) for item in metadata]
+
+    def __len__(self) -> int:
+        return self._matrix.shape[0]
+
+    @property
+    def dimensions(self) -> int:
+        return self._matrix.shape[1]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Row-normalized float32 vectors, one row per document."""
+
+        return self._matrix
+
+    @property
+    def metadata(self) -> list[dict[str, Any]]:
+        """Per-document metadata aligned with :attr:`matrix` rows."""
+
+        return self._metadata
+
+    def query(
+        self,
+        vector: Sequence[float],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+    ) -> VectorQueryResult:
+        """Return the ``top_k`` most similar documents to ``vector``."""
+
+        return self.query_many([vector], top_k=top_k, include_metadata=include_metadata)[0]
+
+    def _matches(self, scores: np.ndarray, top_k: int, include_metadata: bool) -> list[VectorMatch]:
+        return [
+            VectorMatch(
+                metadata=dict(self._metadata[index]) if include_metadata else {},
+                score=(1.0 + float(scores[index])) / 2.0,
+            )
+            for index in top_k_indices(scores, top_k).tolist()
+        ]
+
+    def query_many(
+        self,
+        vectors: Sequence[Sequence[float]],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+    ) -> list[VectorQueryResult]:
+        """Score every query with one matrix multiply; results follow input order."""
+
+        started = time.perf_counter()
+        queries = [unit_query(vector, self.dimensions) if len(self) else None for vector in vectors]
+        pairs = [(position, query) for position, query in enumerate(queries) if query is not None]
+        valid = [position for position, _ in pairs]
+        matches: list[list[VectorMatch]] = [[] for _ in queries]
+        if pairs:
+            scores = np.stack([query for _, query in pairs]) @ self._matrix.T
+            for row, position in enumerate(valid):
+                matches[position] = self._matches(scores[row], top_k, include_metadata)
+        share_ms = (time.perf_counter() - started) * 1000 / max(len(queries), 1)
+        return [VectorQueryResult(matches=found, elapsed_ms=share_ms) for found in matches]
+
+    async def aquery(
+        self,
+        vector: Sequence[float],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+    ) -> VectorQueryResult:
+        """Search inline; a matrix-vector product is cheaper than an executor hop."""
+
+        return self.query(vector, top_k=top_k, include_metadata=include_metadata)
+
+    async def aquery_many(
+        self,
+        vectors: Sequence[Sequence[float]],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+    ) -> list[VectorQueryResult]:
+        """Async alias of :meth:`query_many`; the batch runs inline."""
+
+        return self.query_many(vectors, top_k=top_k, include_metadata=include_metadata)
+
+    @classmethod
+    def from_documents(
+        cls,
+        documents: Iterable[Mapping[str, Any]],
+        *,
+        embedding_field: str = "embedding",
+    ) -> "LocalVectorStore":
+        """Build an index from documents that carry their embedding in ``embedding_field``."""
+
+        vectors: list[Sequence[float]] = []
+        metadata: list[dict[str, Any]] = []
+        dimensions: int | None = None
+        skipped = 0
+        for document in documents:
+            embedding = document.get(embedding_field)
+            if not isinstance(embedding, (list, tuple)) or not embedding:
+                skipped += 1
+                continue
+            if dimensions is None:
+                dimensions = len(embedding)
+            elif len(embedding) != dimensions:
+                skipped += 1
+                continue
+            vectors.append(embedding)
+            metadata.append({key: value for key, value in document.items() if key not in (embedding_field, "_id")})
+
+        if skipped:
+            logger.warning("Skipped %d documents without a usable '%s' vector.", skipped, embedding_field)
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), dimensions or 0)
+        return cls(matrix, metadata)
+
+    @classmethod
+    def from_collection(
+        cls,
+        collection: Collection,
+        *,
+        embedding_field: str = "embedding",
+        fields: Sequence[str] = (),
+        exclude_fields: Sequence[str] = (),
+        query_filter: Mapping[str, Any] | None = None,
+    ) -> "LocalVectorStore":
+        """Snapshot every embedded document in ``collection`` matching ``query_filter`` into memory."""
+
+        if fields:
+            projection: dict[str, int] = {"_id": 0, embedding_field: 1, **{name: 1 for name in fields}}
+        else:
+            projection = {"_id": 0, **{name: 0 for name in exclude_fields if name != embedding_field}}
+        query: dict[str, Any] = {embedding_field: {"$exists": True}}
+        if query_filter:
+            query = {"$and": [query, dict(query_filter)]}
+        cursor = collection.find(query, projection, batch_size=_LOAD_BATCH_SIZE)
+        return cls.from_documents(cursor, embedding_field=embedding_field)
+
+
+def build_local_vector_store(client: MongoClient, settings: VectorStoreSettings) -> LocalVectorStore:
+    """Snapshot the configured Mongo collection into a :class:`LocalVectorStore`."""
+
+    started = time.perf_counter()
+    store = LocalVectorStore.from_collection(
+        settings.collection(client),
+        embedding_field=settings.embedding_field,
+        fields=settings.fields,
+        exclude_fields=settings.exclude_fields,
+        query_filter=settings.default_filter,
+    )
+    logger.info(
+        "Loaded %d vectors (%d dimensions) from '%s.%s' into the local index in %.1fs.",
+        len(store),
+        store.dimensions,
+        settings.database_name,
+        settings.collection_name,
+        time.perf_counter() - started,
+    )
+    return store
+
+
+__all__ = ["LocalVectorStore", "build_local_vector_store", "normalize_rows", "top_k_indices", "unit_query"]
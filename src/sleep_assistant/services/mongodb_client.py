@@ -2,17 +2,108 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
 from urllib.parse import quote_plus
 
-from pymongo import MongoClient
-from pymongo.errors import ConfigurationError, ConnectionFailure
+from pymongo import AsyncMongoClient, MongoClient
+from pymongo.errors import ConfigurationError, ConnectionFailure, PyMongoError
+from pymongo.monitoring import ConnectionPoolListener
 
-from sleep_assistant.config import get_env, require_env
+from sleep_assistant.config import get_env, get_int_env, require_env
+from sleep_assistant.metrics import register_stats_provider
 
 logger = logging.getLogger(__name__)
 
+_SUPPORTED_COMPRESSORS = ("zstd", "snappy", "zlib")
+# Compressors that need a third-party module, with the pip extra that provides it.
+_COMPRESSOR_MODULES = {"zstd": ("zstandard", "zstd"), "snappy": ("snappy", "snappy")}
+_WAIT_SAMPLE_SIZE = 2048
+_ASYNC_CLIENTS: List[AsyncMongoClient] = []
+
+
+class PoolWaitMonitor(ConnectionPoolListener):
+    """Record how long operations wait to check a connection out of the pool.
+
+    Sustained non-zero waits mean ``maxPoolSize`` is too small for the offered
+    concurrency; checkout failures mean ``waitQueueTimeoutMS`` is being hit.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._waits_ms: deque[float] = deque(maxlen=_WAIT_SAMPLE_SIZE)
+        self._counts = {
+            "checkouts": 0,
+            "checkout_failures": 0,
+            "checked_out": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "pool_clears": 0,
+        }
+
+    def _bump(self, key: str, delta: int = 1) -> None:
+        with self._lock:
+            self._counts[key] += delta
+
+    def connection_checked_out(self, event: Any) -> None:
+        with self._lock:
+            self._counts["checkouts"] += 1
+            self._counts["checked_out"] += 1
+            if event.duration is not None:
+                self._waits_ms.append(event.duration * 1000)
+
+    def connection_check_out_failed(self, event: Any) -> None:
+        self._bump("checkout_failures")
+
+    def connection_checked_in(self, event: Any) -> None:
+        self._bump("checked_out", -1)
+
+    def connection_created(self, event: Any) -> None:
+        self._bump("connections_created")
+
+    def connection_closed(self, event: Any) -> None:
+        self._bump("connections_closed")
+
+    def pool_cleared(self, event: Any) -> None:
+        self._bump("pool_clears")
+
+    def connection_check_out_started(self, event: Any) -> None:
+        pass
+
+    def connection_ready(self, event: Any) -> None:
+        pass
+
+    def pool_created(self, event: Any) -> None:
+        pass
+
+    def pool_ready(self, event: Any) -> None:
+        pass
+
+    def pool_closed(self, event: Any) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Return checkout counters and wait-time percentiles over recent checkouts."""
+
+        with self._lock:
+            counts = dict(self._counts)
+            waits = sorted(self._waits_ms)
+
+        def percentile(fraction: float) -> float | None:
+            return waits[min(len(waits) - 1, int(fraction * len(waits)))] if waits else None
+
+        return {
+            **counts,
+            "open_connections": counts["connections_created"] - counts["connections_closed"],
+            "wait_ms_p50": percentile(0.5),
+            "wait_ms_p95": percentile(0.95),
+            "wait_ms_max": waits[-1] if waits else None,
+        }
+
 
 def _resolve_mongo_uri() -> str:
     """Return the MongoDB connection string, building it from parts if needed."""
@@ -40,23 +131,125 @@ def _resolve_mongo_uri() -> str:
     return uri
 
 
-def create_mongodb_client() -> MongoClient:
-    """Instantiate a MongoDB client and verify connectivity."""
+def _client_options() -> dict[str, Any]:
+    """Return driver options shared by the sync and async clients."""
 
-    uri = _resolve_mongo_uri()
     client_kwargs: dict[str, Any] = {"serverSelectionTimeoutMS": 5000}
     app_name = get_env("MONGODB_APP_NAME")
     if app_name:
         client_kwargs["appname"] = app_name
 
+    pool_options = {
+        "maxPoolSize": get_int_env("MONGODB_MAX_POOL_SIZE"),
+        "minPoolSize": get_int_env("MONGODB_MIN_POOL_SIZE"),
+        "maxIdleTimeMS": get_int_env("MONGODB_MAX_IDLE_TIME_MS"),
+        "waitQueueTimeoutMS": get_int_env("MONGODB_WAIT_QUEUE_TIMEOUT_MS"),
+    }
+    client_kwargs.update({key: value for key, value in pool_options.items() if value is not None})
+
+    raw_compressors = get_env("MONGODB_COMPRESSORS")
+    if raw_compressors:
+        compressors = [item.strip().lower() for item in raw_compressors.split(",") if item.strip()]
+        unsupported = [item for item in compressors if item not in _SUPPORTED_COMPRESSORS]
+        if unsupported:
+            raise SystemExit(
+                f"Unsupported MONGODB_COMPRESSORS value(s): {', '.join(unsupported)}. Use zstd, snappy or zlib."
+            )
+        for compressor in compressors:
+            _require_compressor_module(compressor)
+        client_kwargs["compressors"] = ",".join(compressors)
+    return client_kwargs
+
+
+def _require_compressor_module(compressor: str) -> None:
+    """Fail at startup, not on first use, when a compressor's library is missing."""
+
+    if compressor not in _COMPRESSOR_MODULES:
+        return
+    module, extra = _COMPRESSOR_MODULES[compressor]
     try:
-        client = MongoClient(uri, **client_kwargs)
+        __import__(module)
+    except ImportError as exc:
+        raise SystemExit(
+            f'MONGODB_COMPRESSORS={compressor} requires the {module} package: pip install "pymongo[{extra}]"'
+        ) from exc
+
+
+def _prewarm_count(client_kwargs: dict[str, Any]) -> int:
+    """Return how many connections to open eagerly: ``MONGODB_PREWARM_CONNECTIONS`` or ``minPoolSize``."""
+
+    configured = get_int_env("MONGODB_PREWARM_CONNECTIONS")
+    return max(0, configured if configured is not None else client_kwargs.get("minPoolSize", 0))
+
+
+def create_mongodb_client(stats_name: str = "mongodb_pool") -> MongoClient:
+    """Instantiate a MongoDB client and verify connectivity; pool stats appear under ``stats_name``."""
+
+    uri = _resolve_mongo_uri()
+    client_kwargs = _client_options()
+    monitor = PoolWaitMonitor()
+
+    try:
+        client = MongoClient(uri, event_listeners=[monitor], **client_kwargs)
         client.admin.command("ping")
     except (ConfigurationError, ConnectionFailure) as exc:
         raise SystemExit(f"Unable to connect to MongoDB cluster: {exc}") from exc
 
+    warm = _prewarm_count(client_kwargs)
+    if warm > 1:
+        # Concurrent pings force the pool to open that many sockets before traffic arrives.
+        with ThreadPoolExecutor(max_workers=warm, thread_name_prefix="mongo-prewarm") as executor:
+            list(executor.map(lambda _: client.admin.command("ping"), range(warm)))
+
+    register_stats_provider(stats_name, monitor.stats)
     logger.info("Connected to MongoDB cluster at '%s'.", uri.split("@")[-1])
     return client
 
 
-__all__ = ["create_mongodb_client"]
+def create_async_mongodb_client(stats_name: str = "mongodb_async_pool") -> AsyncMongoClient:
+    """Instantiate an async MongoDB client; it connects lazily on the running event loop.
+
+    Call :func:`prewarm_async_mongodb_clients` from the server's startup hook to verify
+    connectivity and open ``minPoolSize`` connections up front.
+    """
+
+    client_kwargs = _client_options()
+    monitor = PoolWaitMonitor()
+    try:
+        client: AsyncMongoClient = AsyncMongoClient(_resolve_mongo_uri(), event_listeners=[monitor], **client_kwargs)
+    except ConfigurationError as exc:
+        raise SystemExit(f"Invalid MongoDB configuration: {exc}") from exc
+    _ASYNC_CLIENTS.append(client)
+    register_stats_provider(stats_name, monitor.stats)
+    return client
+
+
+async def prewarm_async_mongodb_clients() -> None:
+    """Ping every async client and open its pre-warm connections concurrently."""
+
+    if not _ASYNC_CLIENTS:
+        return
+    warm = max(1, _prewarm_count(_client_options()))
+    for client in _ASYNC_CLIENTS:
+        try:
+            await asyncio.gather(*(client.admin.command("ping") for _ in range(warm)))
+        except PyMongoError:
+            logger.warning("Async MongoDB pre-warm failed; connections will open on demand.", exc_info=True)
+            continue
+        logger.info("Pre-warmed %d async MongoDB connection(s).", warm)
+
+
+async def close_async_mongodb_clients() -> None:
+    """Close every async client created by :func:`create_async_mongodb_client`."""
+
+    while _ASYNC_CLIENTS:
+        await _ASYNC_CLIENTS.pop().close()
+
+
+__all__ = [
+    "PoolWaitMonitor",
+    "close_async_mongodb_clients",
+    "create_async_mongodb_client",
+    "create_mongodb_client",
+    "prewarm_async_mongodb_clients",
+]
@@ -0,0 +1,151 @@
+"""Share one upstream call between concurrent identical LLM requests."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import threading
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from sleep_assistant.config import get_bool_env
+from sleep_assistant.metrics import register_stats_provider
+
+T = TypeVar("T")
+
+
+@dataclass
+class _SyncCall:
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+def _copy_result(result: Any) -> Any:
+    """Give each waiter its own message object; LangGraph assigns ids in place."""
+
+    copier = getattr(result, "model_copy", None)
+    return copier(deep=True) if callable(copier) else result
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the work; callers arriving while it is in
+    flight wait for and share its result (or exception). Nothing is cached once
+    the call completes, so answers never go stale.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._sync_calls: Dict[str, _SyncCall] = {}
+        self._async_calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._counts = {"calls": 0, "executions": 0, "shared": 0}
+
+    def _count(self, shared: bool) -> None:
+        with self._lock:
+            self._counts["calls"] += 1
+            self._counts["shared" if shared else "executions"] += 1
+
+    def do(self, key: str, work: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._sync_calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._sync_calls[key] = _SyncCall()
+        self._count(shared=not leader)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return _copy_result(call.result)
+
+        try:
+            call.result = work()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._sync_calls.pop(key, None)
+            call.done.set()
+
+    async def ado(self, key: str, work: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        calls = self._async_calls.get(loop)
+        if calls is None:
+            calls = self._async_calls[loop] = {}
+        task = calls.get(key)
+        leader = task is None
+        if leader:
+            # A separate task so one caller disconnecting does not cancel the call for the rest.
+            task = calls[key] = asyncio.ensure_future(work())
+            task.add_done_callback(lambda _: calls.pop(key, None))
+        self._count(shared=not leader)
+        result = await asyncio.shield(task)
+        return result if leader else _copy_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many calls were answered by another caller's in-flight request."""
+
+        with self._lock:
+            counts = dict(self._counts)
+            in_flight = len(self._sync_calls) + sum(len(calls) for calls in self._async_calls.values())
+        return {
+            **counts,
+            "in_flight": in_flight,
+            "dedupe_rate": (counts["shared"] / counts["calls"]) if counts["calls"] else 0.0,
+        }
+
+
+class SingleFlightChain(Runnable):
+    """``prompt | llm`` whose model call is de-duplicated across concurrent callers.
+
+    The key is a hash of the fully rendered prompt messages plus the model's
+    identifying parameters, so only byte-identical requests to the same model
+    configuration share a call. Streaming callers that join an in-flight call
+    receive the finished message rather than token chunks.
+    """
+
+    def __init__(self, prompt: Runnable, llm: Runnable, flight: SingleFlight) -> None:
+        self.prompt = prompt
+        self.llm = llm
+        self.flight = flight
+        params = getattr(llm, "_identifying_params", None) or {"llm": type(llm).__name__}
+        self._params = json.dumps(params, sort_keys=True, default=str)
+
+    def _key(self, prompt_value: Any) -> str:
+        messages = [[message.type, message.content] for message in prompt_value.to_messages()]
+        payload = json.dumps([self._params, messages], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:  # noqa: A002
+        prompt_value = self.prompt.invoke(input, config)
+        return self.flight.do(self._key(prompt_value), lambda: self.llm.invoke(prompt_value, config, **kwargs))
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:  # noqa: A002
+        prompt_value = await self.prompt.ainvoke(input, config)
+        return await self.flight.ado(
+            self._key(prompt_value),
+            lambda: self.llm.ainvoke(prompt_value, config, **kwargs),
+        )
+
+
+def build_single_flight(name: str) -> Optional[SingleFlight]:
+    """Return a :class:`SingleFlight` published as ``<name>_single_flight``, or None when disabled."""
+
+    if not get_bool_env("LLM_SINGLE_FLIGHT_ENABLED", True):
+        return None
+    flight = SingleFlight()
+    register_stats_provider(f"{name}_single_flight", flight.stats)
+    return flight
+
+
+__all__ = ["SingleFlight", "SingleFlightChain", "build_single_flight"]
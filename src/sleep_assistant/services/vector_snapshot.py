@@ -0,0 +1,340 @@
+"""Memory-mapped, quantized snapshot format for knowledge-base embeddings.
+
+A snapshot is a single file laid out as::
+
+    header | quantized matrix | quantization params | float32 matrix (optional)
+           | metadata offsets (uint64, count + 1) | metadata blob (UTF-8 JSON per row)
+
+Every section is 64-byte aligned so it can be ``np.memmap``-ed directly. Workers on
+the same host map the same file and share one page-cached copy; only the rows a
+query touches are ever paged in for the float32 section and the metadata blob.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Mapping, Sequence
+
+import numpy as np
+
+from sleep_assistant import PROJECT_ROOT
+from sleep_assistant.config import get_bool_env, get_env, get_int_env
+from sleep_assistant.services.local_vectorstore import normalize_rows, unit_query
+from sleep_assistant.services.vectorstore import VectorMatch, VectorQueryResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_PATH = PROJECT_ROOT / "data" / "vectors.snapshot"
+DEFAULT_RESCORE_FACTOR = 4
+
+_MAGIC = b"SAVS"
+_VERSION = 1
+# magic, version, dtype code, rows, dimensions, reserved, then section offsets.
+_HEADER = struct.Struct("<4sHHQII5Q")
+_ALIGNMENT = 64
+_DTYPES = {1: np.dtype(np.float16), 2: np.dtype(np.int8)}
+_DTYPE_CODES = {"float16": 1, "int8": 2}
+# Upper bound on the float32 copy of one block of codes, per concurrent query (~680 rows at 1536 dims).
+_SCORE_BLOCK_BYTES = 4 * 1024 * 1024
+
+
+def _pad(handle: Any) -> int:
+    position = handle.tell()
+    remainder = position % _ALIGNMENT
+    if remainder:
+        handle.write(b"\x00" * (_ALIGNMENT - remainder))
+    return handle.tell()
+
+
+def _quantize(matrix: np.ndarray, dtype: str) -> tuple[np.ndarray, np.ndarray]:
+    """Return the stored codes and the per-dimension ``(scale, offset)`` rows."""
+
+    if dtype == "float16":
+        return matrix.astype(np.float16), np.empty((0, matrix.shape[1]), dtype=np.float32)
+
+    low = matrix.min(axis=0) if matrix.size else np.zeros(matrix.shape[1], dtype=np.float32)
+    high = matrix.max(axis=0) if matrix.size else np.zeros(matrix.shape[1], dtype=np.float32)
+    scale = (high - low) / 255.0
+    scale[scale == 0.0] = 1.0
+    codes = np.clip(np.rint((matrix - low) / scale) - 128.0, -128, 127).astype(np.int8)
+    return codes, np.stack([scale, low]).astype(np.float32)
+
+
+def write_vector_snapshot(
+    path: str | Path,
+    vectors: Any,
+    metadata: Sequence[Mapping[str, Any]],
+    *,
+    dtype: str = "int8",
+    include_float32: bool = True,
+) -> Path:
+    """Write ``vectors`` and ``metadata`` to ``path``, replacing any existing snapshot atomically."""
+
+    if dtype not in _DTYPE_CODES:
+        raise ValueError(f"Unsupported snapshot dtype '{dtype}'. Use float16 or int8.")
+    matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[0] != len(metadata):
+        raise ValueError("vectors must be 2-D with one row per metadata entry.")
+    matrix = normalize_rows(matrix)
+    codes, params = _quantize(matrix, dtype)
+
+    blobs = [json.dumps(dict(item), separators=(",", ":"), default=str).encode("utf-8") for item in metadata]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.uint64)
+    if blobs:
+        offsets[1:] = np.cumsum([len(blob) for blob in blobs], dtype=np.uint64)
+
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f"{target.name}.tmp")
+    with open(tmp_path, "wb") as handle:
+        handle.write(b"\x00" * _HEADER.size)
+        matrix_offset = _pad(handle)
+        handle.write(codes.tobytes())
+        params_offset = _pad(handle)
+        handle.write(params.tobytes())
+        float32_offset = 0
+        if include_float32:
+            float32_offset = _pad(handle)
+            handle.write(matrix.tobytes())
+        offsets_offset = _pad(handle)
+        handle.write(offsets.tobytes())
+        blob_offset = _pad(handle)
+        for blob in blobs:
+            handle.write(blob)
+        handle.seek(0)
+        handle.write(
+            _HEADER.pack(
+                _MAGIC,
+                _VERSION,
+                _DTYPE_CODES[dtype],
+                matrix.shape[0],
+                matrix.shape[1],
+                0,
+                matrix_offset,
+                params_offset,
+                float32_offset,
+                offsets_offset,
+                blob_offset,
+            )
+        )
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, target)
+    logger.info(
+        "Wrote %s vector snapshot with %d rows x %d dimensions to %s.",
+        dtype,
+        matrix.shape[0],
+        matrix.shape[1],
+        target,
+    )
+    return target
+
+
+def _map(path: Path, dtype: Any, offset: int, shape: tuple[int, ...]) -> np.ndarray:
+    if not all(shape):
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+
+class SnapshotVectorStore:
+    """Vector store that searches a memory-mapped snapshot without loading it.
+
+    Candidates are scored on the quantized matrix in fixed-size blocks so a query never
+    materializes a full float32 copy. When the snapshot carries float32 rows and
+    ``rescore`` is on, the best ``top_k * rescore_factor`` candidates are re-ranked
+    exactly. Scores use Atlas's ``(1 + cosine) / 2`` scale like the other backends.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        rescore: bool = True,
+        rescore_factor: int = DEFAULT_RESCORE_FACTOR,
+    ) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as handle:
+            header = handle.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            raise ValueError(f"{self.path} is not a vector snapshot.")
+        (
+            magic,
+            version,
+            dtype_code,
+            rows,
+            dimensions,
+            _reserved,
+            matrix_offset,
+            params_offset,
+            float32_offset,
+            offsets_offset,
+            blob_offset,
+        ) = _HEADER.unpack(header)
+        if magic != _MAGIC or version != _VERSION or dtype_code not in _DTYPES:
+            raise ValueError(f"{self.path} is not a supported vector snapshot (version {version}).")
+
+        self.dtype = _DTYPES[dtype_code]
+        self._rows = rows
+        self._dimensions = dimensions
+        self._codes = _map(self.path, self.dtype, matrix_offset, (rows, dimensions))
+        self._scale: np.ndarray | None = None
+        self._low: np.ndarray | None = None
+        if self.dtype == np.int8:
+            params = np.array(_map(self.path, np.float32, params_offset, (2, dimensions)))
+            self._scale, self._low = params[0], params[1]
+        self._float32 = _map(self.path, np.float32, float32_offset, (rows, dimensions)) if float32_offset else None
+        self._offsets = _map(self.path, np.uint64, offsets_offset, (rows + 1,))
+        blob_length = int(self._offsets[-1]) if rows else 0
+        self._blob = _map(self.path, np.uint8, blob_offset, (blob_length,))
+        self._rescore = rescore and self._float32 is not None
+        self._rescore_factor = max(rescore_factor, 1)
+        self._block_rows = max(64, _SCORE_BLOCK_BYTES // max(dimensions * 4, 1))
+
+    def __len__(self) -> int:
+        return self._rows
+
+    @property
+    def dimensions(self) -> int:
+        return self._dimensions
+
+    def _metadata(self, row: int) -> dict[str, Any]:
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(self._blob[start:end].tobytes().decode("utf-8"))
+
+    def _approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Return approximate cosine scores, shape ``(queries, rows)``, computed block-wise."""
+
+        if self._scale is not None and self._low is not None:
+            # x = low + scale * (code + 128), so q.x = q.low + 128 * sum(q * scale) + (q * scale).code
+            weights = queries * self._scale
+            bias = queries @ self._low + 128.0 * weights.sum(axis=1)
+        else:
+            weights, bias = queries, np.zeros(queries.shape[0], dtype=np.float32)
+
+        scores = np.empty((queries.shape[0], self._rows), dtype=np.float32)
+        for start in range(0, self._rows, self._block_rows):
+            block = np.asarray(self._codes[start : start + self._block_rows], dtype=np.float32)
+            scores[:, start : start + block.shape[0]] = weights @ block.T
+        return scores + bias[:, None]
+
+    def _matches(self, query: np.ndarray, scores: np.ndarray, top_k: int, include_metadata: bool) -> list[VectorMatch]:
+        limit = min(max(1, top_k), self._rows)
+        pool = min(limit * self._rescore_factor, self._rows) if self._rescore else limit
+        if pool < self._rows:
+            candidates = np.argpartition(-scores, pool - 1)[:pool]
+        else:
+            candidates = np.arange(self._rows)
+
+        if self._rescore and self._float32 is not None:
+            candidates = np.sort(candidates)  # sequential page access
+            candidate_scores = np.asarray(self._float32[candidates]) @ query
+        else:
+            candidate_scores = scores[candidates]
+        order = np.argsort(-candidate_scores, kind="stable")[:limit]
+        return [
+            VectorMatch(
+                metadata=self._metadata(int(candidates[position])) if include_metadata else {},
+                score=(1.0 + float(candidate_scores[position])) / 2.0,
+            )
+            for position in order.tolist()
+        ]
+
+    def query(
+        self,
+        vector: Sequence[float],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+    ) -> VectorQueryResult:
+        """Return the ``top_k`` most similar snapshot rows to ``vector``."""
+
+        return self.query_many([vector], top_k=top_k, include_metadata=include_metadata)[0]
+
+    def query_many(
+        self,
+        vectors: Sequence[Sequence[float]],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+    ) -> list[VectorQueryResult]:
+        """Scan the quantized matrix once for the whole batch; results follow input order."""
+
+        started = time.perf_counter()
+        queries = [unit_query(vector, self._dimensions) if self._rows else None for vector in vectors]
+        pairs = [(position, query) for position, query in enumerate(queries) if query is not None]
+        valid = [position for position, _ in pairs]
+        matches: list[list[VectorMatch]] = [[] for _ in queries]
+        if pairs:
+            batch = np.stack([query for _, query in pairs])
+            scores = self._approximate_scores(batch)
+            for row, position in enumerate(valid):
+                matches[position] = self._matches(batch[row], scores[row], top_k, include_metadata)
+        share_ms = (time.perf_counter() - started) * 1000 / max(len(queries), 1)
+        return [VectorQueryResult(matches=found, elapsed_ms=share_ms) for found in matches]
+
+    async def aquery(
+        self,
+        vector: Sequence[float],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+    ) -> VectorQueryResult:
+        """Search inline; the scan is CPU-bound and short."""
+
+        return self.query(vector, top_k=top_k, include_metadata=include_metadata)
+
+    async def aquery_many(
+        self,
+        vectors: Sequence[Sequence[float]],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+    ) -> list[VectorQueryResult]:
+        """Async alias of :meth:`query_many`; the batch runs inline."""
+
+        return self.query_many(vectors, top_k=top_k, include_metadata=include_metadata)
+
+
+def resolve_snapshot_path() -> Path:
+    """Return ``VECTOR_SNAPSHOT_PATH`` or the default location under ``data/``."""
+
+    raw_path = get_env("VECTOR_SNAPSHOT_PATH")
+    path = Path(raw_path) if raw_path else DEFAULT_SNAPSHOT_PATH
+    return path if path.is_absolute() else PROJECT_ROOT / path
+
+
+def build_snapshot_vector_store() -> SnapshotVectorStore:
+    """Open the snapshot configured through ``VECTOR_SNAPSHOT_*``."""
+
+    path = resolve_snapshot_path()
+    if not path.exists():
+        raise SystemExit(
+            f"Vector snapshot {path} does not exist. Build it with scripts/build_vector_snapshot.py."
+        )
+    store = SnapshotVectorStore(
+        path,
+        rescore=get_bool_env("VECTOR_SNAPSHOT_RESCORE", True),
+        rescore_factor=get_int_env("VECTOR_SNAPSHOT_RESCORE_FACTOR", DEFAULT_RESCORE_FACTOR)
+        or DEFAULT_RESCORE_FACTOR,
+    )
+    logger.info(
+        "Mapped %s vector snapshot %s (%d rows x %d dimensions).",
+        store.dtype.name,
+        path,
+        len(store),
+        store.dimensions,
+    )
+    return store
+
+
+__all__ = [
+    "SnapshotVectorStore",
+    "build_snapshot_vector_store",
+    "resolve_snapshot_path",
+    "write_vector_snapshot",
+]
@@ -2,17 +2,34 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
+import math
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Sequence
+from typing import Any, Callable, Dict, Mapping, Sequence
 
+from pymongo.asynchronous.collection import AsyncCollection
 from pymongo.collection import Collection
 from pymongo.mongo_client import MongoClient
 
-from sleep_assistant.config import get_env, require_env
+from sleep_assistant.config import get_bool_env, get_env, get_float_env, require_env
+from sleep_assistant.metrics import register_stats_provider
+from sleep_assistant.services.mongodb_client import create_async_mongodb_client
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_QUERY_CONCURRENCY = 8
+DEFAULT_ADAPTIVE_GAP = 0.01
+# Atlas rejects numCandidates above 10,000.
+_MAX_NUM_CANDIDATES = 10_000
+# Stores whose async client is created on first use; the API opens them at startup.
+_DEFERRED_ASYNC_STORES: "weakref.WeakSet[MongoVectorStore]" = weakref.WeakSet()
+
 
 @dataclass
 class VectorMatch:
@@ -24,13 +41,94 @@ class VectorMatch:
 
 @dataclass
 class VectorQueryResult:
-    """Container for matches to mirror the legacy vector store response shape."""
+    """Container for matches to mirror the legacy vector store response shape.
+
+    ``elapsed_ms`` is the search time; batched local searches report each query's
+    share of the batch.
+    """
 
     matches: list[VectorMatch]
+    elapsed_ms: float | None = None
+
+
+class AdaptiveCandidates:
+    """Tune ``numCandidates`` from the score gap between rank k and rank k+1.
+
+    Every search fetches one extra result. A gap below ``target_gap`` means the
+    cut-off is ambiguous and a wider candidate pool may change the top k, so the
+    multiplier grows. A clear gap means the pool can shrink, which lowers latency.
+    """
+
+    def __init__(
+        self,
+        *,
+        target_gap: float = DEFAULT_ADAPTIVE_GAP,
+        initial_multiplier: float = 10.0,
+        min_multiplier: float = 2.0,
+        max_multiplier: float = 50.0,
+        step: float = 1.25,
+    ) -> None:
+        self.target_gap = target_gap
+        self._multiplier = initial_multiplier
+        self._min = min_multiplier
+        self._max = max_multiplier
+        self._step = step
+        self._lock = threading.Lock()
+        self._counts = {"observed": 0, "ambiguous": 0}
+        self._last_gap: float | None = None
+
+    def num_candidates(self, limit: int) -> int:
+        with self._lock:
+            multiplier = self._multiplier
+        return min(_MAX_NUM_CANDIDATES, max(limit, math.ceil(limit * multiplier)))
+
+    def observe(self, scores: Sequence[float | None], top_k: int) -> None:
+        """Adjust the multiplier from a result list holding up to ``top_k + 1`` scores."""
+
+        if len(scores) <= top_k:
+            return
+        kth, next_score = scores[top_k - 1], scores[top_k]
+        if kth is None or next_score is None:
+            return
+        gap = float(kth) - float(next_score)
+        with self._lock:
+            self._counts["observed"] += 1
+            self._last_gap = gap
+            if gap < self.target_gap:
+                self._counts["ambiguous"] += 1
+                self._multiplier = min(self._max, self._multiplier * self._step)
+            else:
+                self._multiplier = max(self._min, self._multiplier / self._step)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current multiplier and how often the rank-k cut-off was ambiguous."""
+
+        with self._lock:
+            return {
+                "multiplier": round(self._multiplier, 3),
+                "target_gap": self.target_gap,
+                "last_gap": self._last_gap,
+                **self._counts,
+            }
 
 
 class MongoVectorStore:
-    """Thin wrapper around a MongoDB collection with a vector search index."""
+    """Thin wrapper around a MongoDB collection with a vector search index.
+
+    Metadata is projected server-side: with ``fields`` only those fields are returned,
+    otherwise every field except the embedding and ``exclude_fields``. The embedding
+    array never leaves the database either way. When ``async_collection`` is given,
+    :meth:`aquery` runs on PyMongo's async driver instead of a worker thread. An
+    ``async_collection_factory`` defers creating that client to :meth:`open_async`
+    or the first :meth:`aquery`, so sync-only callers never open one.
+
+    ``filter`` (per query) and ``default_filter`` (every query) become the
+    ``$vectorSearch`` pre-filter; the fields must be indexed as ``filter`` fields in
+    the Atlas index. The graph's sleep nodes pass no per-query filter, so with this
+    backend only ``default_filter`` (``MONGODB_VECTOR_FILTER``) applies. With
+    ``adaptive`` set, ``numCandidates`` follows :class:`AdaptiveCandidates` instead
+    of the fixed ``num_candidates``.
+    """
 
     def __init__(
         self,
@@ -39,11 +137,92 @@ class MongoVectorStore:
         index_name: str,
         embedding_field: str = "embedding",
         num_candidates: int | None = None,
+        fields: Sequence[str] | None = None,
+        exclude_fields: Sequence[str] = (),
+        query_concurrency: int = DEFAULT_QUERY_CONCURRENCY,
+        async_collection: AsyncCollection | None = None,
+        async_collection_factory: Callable[[], AsyncCollection] | None = None,
+        default_filter: Mapping[str, Any] | None = None,
+        adaptive: AdaptiveCandidates | None = None,
     ) -> None:
         self._collection = collection
+        self._async_collection = async_collection
+        self._async_factory = async_collection_factory if async_collection is None else None
+        self._async_lock = threading.Lock()
+        self._default_filter = dict(default_filter) if default_filter else None
+        self._adaptive = adaptive
         self._index_name = index_name
         self._embedding_field = embedding_field
         self._num_candidates = num_candidates
+        self._query_concurrency = max(1, query_concurrency)
+        self._metadata_stages = _metadata_projection(embedding_field, fields, exclude_fields)
+
+    def _combined_filter(self, query_filter: Mapping[str, Any] | None) -> dict[str, Any] | None:
+        if self._default_filter and query_filter:
+            return {"$and": [self._default_filter, dict(query_filter)]}
+        return dict(query_filter) if query_filter else self._default_filter
+
+    def _pipeline(
+        self,
+        vector: Sequence[float],
+        top_k: int,
+        include_metadata: bool,
+        query_filter: Mapping[str, Any] | None,
+    ) -> list[dict[str, Any]]:
+        limit = max(1, top_k)
+        if self._adaptive is not None:
+            # One extra result exposes the rank k / k+1 score gap.
+            num_candidates = self._adaptive.num_candidates(limit + 1)
+            limit += 1
+        else:
+            num_candidates = self._num_candidates or max(limit * 5, limit)
+        query_vector = [float(value) for value in vector]
+
+        search: dict[str, Any] = {
+            "index": self._index_name,
+            "path": self._embedding_field,
+            "queryVector": query_vector,
+            "numCandidates": num_candidates,
+            "limit": limit,
+        }
+        combined_filter = self._combined_filter(query_filter)
+        if combined_filter:
+            search["filter"] = combined_filter
+        pipeline: list[dict[str, Any]] = [{"$vectorSearch": search}]
+
+        if include_metadata:
+            pipeline.extend(self._metadata_stages)
+        else:
+            pipeline.append({"$project": {"_id": 0, "score": {"$meta": "vectorSearchScore"}}})
+        return pipeline
+
+    def _to_result(
+        self,
+        docs: list[dict[str, Any]],
+        top_k: int,
+        include_metadata: bool,
+        started: float,
+    ) -> VectorQueryResult:
+        limit = max(1, top_k)
+        if self._adaptive is not None:
+            self._adaptive.observe([_coerce_float(doc.get("score")) for doc in docs], limit)
+        matches: list[VectorMatch] = []
+        for doc in docs[:limit]:
+            score = _coerce_float(doc.pop("score", None))
+            metadata: dict[str, Any] = doc if include_metadata else {}
+            matches.append(VectorMatch(metadata=metadata, score=score))
+
+        return VectorQueryResult(matches=matches, elapsed_ms=(time.perf_counter() - started) * 1000)
+
+    def open_async(self) -> AsyncCollection | None:
+        """Return the async collection, creating its client on first call if deferred."""
+
+        if self._async_factory is not None:
+            with self._async_lock:
+                if self._async_factory is not None:
+                    self._async_collection = self._async_factory()
+                    self._async_factory = None
+        return self._async_collection
 
     def query(
         self,
@@ -51,50 +230,111 @@ class MongoVectorStore:
         *,
         top_k: int = 5,
         include_metadata: bool = True,  # kept for signature parity
+        filter: Mapping[str, Any] | None = None,  # noqa: A002 - mirrors the $vectorSearch option
     ) -> VectorQueryResult:
         """Execute a MongoDB Atlas vector search and normalize the result."""
 
+        started = time.perf_counter()
         if not vector:
             logger.warning("Skipping MongoDB vector query because the query vector was empty.")
             return VectorQueryResult(matches=[])
 
-        limit = max(1, top_k)
-        num_candidates = self._num_candidates or max(limit * 5, limit)
-        query_vector = [float(value) for value in vector]
+        docs = list(self._collection.aggregate(self._pipeline(vector, top_k, include_metadata, filter)))
+        return self._to_result(docs, top_k, include_metadata, started)
 
-        pipeline: list[dict[str, Any]] = [
-            {
-                "$vectorSearch": {
-                    "index": self._index_name,
-                    "path": self._embedding_field,
-                    "queryVector": query_vector,
-                    "numCandidates": num_candidates,
-                    "limit": limit,
-                }
-            },
-            {"$addFields": {"score": {"$meta": "vectorSearchScore"}}},
-        ]
+    async def aquery(
+        self,
+        vector: Sequence[float],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+        filter: Mapping[str, Any] | None = None,  # noqa: A002
+    ) -> VectorQueryResult:
+        """Run the vector search without blocking the event loop.
+
+        Uses the async driver when configured. Otherwise PyMongo's synchronous driver
+        releases the GIL while waiting on the socket, so offloading the aggregate to the
+        default executor lets other turns progress.
+        """
+
+        async_collection = self.open_async()
+        if async_collection is not None:
+            started = time.perf_counter()
+            if not vector:
+                logger.warning("Skipping MongoDB vector query because the query vector was empty.")
+                return VectorQueryResult(matches=[])
+            pipeline = self._pipeline(vector, top_k, include_metadata, filter)
+            cursor = await async_collection.aggregate(pipeline)
+            return self._to_result(await cursor.to_list(), top_k, include_metadata, started)
+
+        return await asyncio.to_thread(
+            self.query,
+            vector,
+            top_k=top_k,
+            include_metadata=include_metadata,
+            filter=filter,
+        )
+
+    def query_many(
+        self,
+        vectors: Sequence[Sequence[float]],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+        filter: Mapping[str, Any] | None = None,  # noqa: A002
+    ) -> list[VectorQueryResult]:
+        """Run one search per vector over the connection pool, returning results in input order.
+
+        At most ``query_concurrency`` aggregates are in flight, so a large batch cannot
+        starve interactive turns of pooled connections.
+        """
+
+        if not vectors:
+            return []
+        workers = min(self._query_concurrency, len(vectors))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vector-query") as executor:
+            return list(
+                executor.map(
+                    lambda vector: self.query(vector, top_k=top_k, include_metadata=include_metadata, filter=filter),
+                    vectors,
+                )
+            )
+
+    async def aquery_many(
+        self,
+        vectors: Sequence[Sequence[float]],
+        *,
+        top_k: int = 5,
+        include_metadata: bool = True,
+        filter: Mapping[str, Any] | None = None,  # noqa: A002
+    ) -> list[VectorQueryResult]:
+        """Async variant of :meth:`query_many` with the same concurrency bound."""
 
-        if include_metadata:
-            pipeline.append({"$project": {"_id": 0, "score": 1, "metadata": "$$ROOT"}})
-        else:
-            pipeline.append({"$project": {"_id": 0, "score": 1}})
+        semaphore = asyncio.Semaphore(self._query_concurrency)
 
-        docs = list(self._collection.aggregate(pipeline))
-        matches: list[VectorMatch] = []
-        for doc in docs:
-            score = _coerce_float(doc.get("score"))
-            metadata: dict[str, Any] = {}
-            if include_metadata:
-                raw_metadata = doc.get("metadata")
-                if isinstance(raw_metadata, dict):
-                    metadata = dict(raw_metadata)  # shallow copy
-                    metadata.pop("score", None)
-                    metadata.pop(self._embedding_field, None)
-                    metadata.pop("_id", None)
-            matches.append(VectorMatch(metadata=metadata, score=score))
+        async def _bounded(vector: Sequence[float]) -> VectorQueryResult:
+            async with semaphore:
+                return await self.aquery(vector, top_k=top_k, include_metadata=include_metadata, filter=filter)
 
-        return VectorQueryResult(matches=matches)
+        return list(await asyncio.gather(*(_bounded(vector) for vector in vectors)))
+
+
+def _metadata_projection(
+    embedding_field: str,
+    fields: Sequence[str] | None,
+    exclude_fields: Sequence[str],
+) -> list[dict[str, Any]]:
+    """Return the pipeline stages that shape each match's metadata on the server."""
+
+    score = {"$meta": "vectorSearchScore"}
+    if fields:
+        # The embedding is never returned, even if someone lists it explicitly.
+        included = [name for name in fields if name not in (embedding_field, "_id", "score")]
+        return [{"$project": {"_id": 0, "score": score, **{name: 1 for name in included}}}]
+
+    # Exclusion projections cannot compute fields, so the score is added first.
+    excluded = {"_id": 0, embedding_field: 0, **{name: 0 for name in exclude_fields if name != "score"}}
+    return [{"$addFields": {"score": score}}, {"$project": excluded}]
 
 
 def _coerce_float(value: Any) -> float | None:
@@ -118,32 +358,157 @@ def _read_int_env(name: str) -> int | None:
         raise SystemExit(f"Environment variable {name} must be an integer.") from exc
 
 
-def build_mongo_vector_store(client: MongoClient) -> MongoVectorStore:
-    """Resolve configuration and return a Mongo-backed vector store."""
+def _read_list_env(name: str) -> list[str]:
+    raw_value = get_env(name) or ""
+    return [item.strip() for item in raw_value.split(",") if item.strip()]
 
-    database_name = require_env("MONGODB_DBNAME")
-    collection_name = require_env("MONGODB_COLLECTION")
-    index_name = get_env("MONGODB_VECTOR_INDEX", "vector_index") or "vector_index"
-    embedding_field = get_env("MONGODB_EMBEDDING_FIELD", "embedding") or "embedding"
-    num_candidates = _read_int_env("MONGODB_VECTOR_CANDIDATES")
 
-    collection = client[database_name][collection_name]
+def _read_filter_env(name: str) -> dict[str, Any] | None:
+    raw_value = (get_env(name) or "").strip()
+    if not raw_value:
+        return None
+    try:
+        value = json.loads(raw_value)
+    except json.JSONDecodeError as exc:
+        raise SystemExit(f"{name} must be a JSON object: {exc}") from exc
+    if not isinstance(value, dict):
+        raise SystemExit(f"{name} must be a JSON object.")
+    return value or None
+
+
+@dataclass(frozen=True)
+class VectorStoreSettings:
+    """Collection and projection settings shared by every vector store backend."""
+
+    database_name: str
+    collection_name: str
+    index_name: str
+    embedding_field: str
+    num_candidates: int | None
+    fields: tuple[str, ...]
+    exclude_fields: tuple[str, ...]
+    query_concurrency: int
+    default_filter: Mapping[str, Any] | None = None
+    adaptive_candidates: bool = False
+    adaptive_gap: float = DEFAULT_ADAPTIVE_GAP
+
+    def collection(self, client: MongoClient) -> Collection:
+        return client[self.database_name][self.collection_name]
+
+
+def load_vector_store_settings() -> VectorStoreSettings:
+    """Read the ``MONGODB_*`` vector store configuration from the environment."""
+
+    return VectorStoreSettings(
+        database_name=require_env("MONGODB_DBNAME"),
+        collection_name=require_env("MONGODB_COLLECTION"),
+        index_name=get_env("MONGODB_VECTOR_INDEX", "vector_index") or "vector_index",
+        embedding_field=get_env("MONGODB_EMBEDDING_FIELD", "embedding") or "embedding",
+        num_candidates=_read_int_env("MONGODB_VECTOR_CANDIDATES"),
+        fields=tuple(_read_list_env("MONGODB_VECTOR_FIELDS")),
+        exclude_fields=tuple(_read_list_env("MONGODB_VECTOR_EXCLUDE_FIELDS")),
+        query_concurrency=_read_int_env("MONGODB_QUERY_CONCURRENCY") or DEFAULT_QUERY_CONCURRENCY,
+        default_filter=_read_filter_env("MONGODB_VECTOR_FILTER"),
+        adaptive_candidates=get_bool_env("MONGODB_ADAPTIVE_CANDIDATES", False),
+        adaptive_gap=get_float_env("MONGODB_ADAPTIVE_GAP", DEFAULT_ADAPTIVE_GAP) or DEFAULT_ADAPTIVE_GAP,
+    )
+
+
+def build_mongo_vector_store(
+    client: MongoClient,
+    settings: VectorStoreSettings | None = None,
+) -> MongoVectorStore:
+    """Resolve configuration and return a Mongo-backed vector store."""
+
+    settings = settings or load_vector_store_settings()
     logger.info(
         "Using MongoDB vector collection '%s.%s' with index '%s' (embedding field '%s').",
-        database_name,
-        collection_name,
-        index_name,
-        embedding_field,
+        settings.database_name,
+        settings.collection_name,
+        settings.index_name,
+        settings.embedding_field,
     )
-    if num_candidates:
-        logger.info("MongoDB vector search numCandidates set to %d.", num_candidates)
-
-    return MongoVectorStore(
-        collection,
-        index_name=index_name,
-        embedding_field=embedding_field,
-        num_candidates=num_candidates,
+    adaptive = None
+    if settings.adaptive_candidates:
+        adaptive = AdaptiveCandidates(target_gap=settings.adaptive_gap)
+        register_stats_provider("vector_search", adaptive.stats)
+        logger.info("MongoDB vector search numCandidates adapts to a rank-k score gap of %.3f.", settings.adaptive_gap)
+    elif settings.num_candidates:
+        logger.info("MongoDB vector search numCandidates set to %d.", settings.num_candidates)
+    if settings.default_filter:
+        logger.info("MongoDB vector search pre-filter: %s.", json.dumps(settings.default_filter))
+    if settings.fields:
+        logger.info("MongoDB vector search returns only fields: %s.", ", ".join(settings.fields))
+
+    def open_async_collection() -> AsyncCollection:
+        return create_async_mongodb_client()[settings.database_name][settings.collection_name]
+
+    async_enabled = get_bool_env("MONGODB_ASYNC_ENABLED", True)
+    store = MongoVectorStore(
+        settings.collection(client),
+        index_name=settings.index_name,
+        embedding_field=settings.embedding_field,
+        num_candidates=settings.num_candidates,
+        fields=settings.fields or None,
+        exclude_fields=settings.exclude_fields,
+        query_concurrency=settings.query_concurrency,
+        async_collection_factory=open_async_collection if async_enabled else None,
+        default_filter=settings.default_filter,
+        adaptive=adaptive,
     )
-
-
-__all__ = ["MongoVectorStore", "VectorMatch", "VectorQueryResult", "build_mongo_vector_store"]
+    if async_enabled:
+        _DEFERRED_ASYNC_STORES.add(store)
+    return store
+
+
+def open_async_vector_stores() -> None:
+    """Create the async clients of Mongo vector stores built so far; call from the API startup hook."""
+
+    for store in list(_DEFERRED_ASYNC_STORES):
+        store.open_async()
+
+
+def build_vector_store(client: MongoClient) -> Any:
+    """Return the vector store selected by ``VECTOR_STORE_BACKEND``.
+
+    ``mongodb`` (default) queries Atlas, ``local`` snapshots the collection into memory,
+    ``snapshot`` memory-maps a prebuilt quantized snapshot file and ``ivf`` opens a
+    prebuilt approximate nearest-neighbour index.
+    """
+
+    backend = (get_env("VECTOR_STORE_BACKEND") or "mongodb").strip().lower()
+    if backend in ("snapshot", "ivf") and _read_filter_env("MONGODB_VECTOR_FILTER"):
+        logger.warning(
+            "MONGODB_VECTOR_FILTER is not applied at query time by the %s backend; it only takes effect "
+            "when the file is built. Rebuild it after changing the filter.",
+            backend,
+        )
+    if backend == "snapshot":
+        from sleep_assistant.services.vector_snapshot import build_snapshot_vector_store
+
+        return build_snapshot_vector_store()
+    if backend == "ivf":
+        from sleep_assistant.services.ivf_index import build_ivf_vector_store
+
+        return build_ivf_vector_store()
+    settings = load_vector_store_settings()
+    if backend == "mongodb":
+        return build_mongo_vector_store(client, settings)
+    if backend == "local":
+        from sleep_assistant.services.local_vectorstore import build_local_vector_store
+
+        return build_local_vector_store(client, settings)
+    raise SystemExit(f"Unsupported VECTOR_STORE_BACKEND '{backend}'. Use mongodb, local, snapshot or ivf.")
+
+
+__all__ = [
+    "AdaptiveCandidates",
+    "MongoVectorStore",
+    "VectorMatch",
+    "VectorQueryResult",
+    "VectorStoreSettings",
+    "build_mongo_vector_store",
+    "build_vector_store",
+    "load_vector_store_settings",
+    "open_async_vector_stores",
+]